@@ -0,0 +1,123 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# ================== Synthetic Instance Generator ==================
+# Writes instances in the schema of Dataset/new_1.csv .. new_6.csv (sites, spots, shops,
+# e-commerce orders, O2O orders, couriers), so every solver and evaluate.py can read them.
+
+DATASET_FILES = ("new_1.csv", "new_2.csv", "new_3.csv", "new_4.csv", "new_5.csv", "new_6.csv")
+# Bounding box of the Shanghai instance (lng, lat)
+LNG_RANGE = (121.10, 121.90)
+LAT_RANGE = (30.90, 31.55)
+# O2O pickups fall between 11:30 and 18:30 in the Shanghai instance, each with a 90-minute window
+PICKUP_RANGE = ("11:30", "18:30")
+O2O_WINDOW = 90
+
+
+def scaled_config(n_orders, o2o_share=0.27, window=O2O_WINDOW):
+    """
+    Instance sizes for `n_orders` orders in the proportions of the Shanghai instance
+    (12,631 orders: 124 sites, 9,214 spots, 613 shops, 1,000 couriers, 27% O2O orders).
+    """
+    n_o2o = int(round(n_orders * o2o_share))
+    n_ecommerce = n_orders - n_o2o
+    return {
+        "n_sites": max(1, round(n_orders / 102)),
+        "n_spots": max(1, round(n_orders * 0.73)),
+        "n_shops": max(1, round(n_orders / 20.6)),
+        "n_ecommerce": n_ecommerce,
+        "n_o2o": n_o2o,
+        "n_couriers": max(1, round(n_orders / 12.6)),
+        "window": window,
+    }
+
+
+def generate_instance(out_dir, n_sites, n_spots, n_shops, n_ecommerce, n_o2o, n_couriers,
+                      window=O2O_WINDOW, seed=0, n_hotspots=12):
+    """
+    Write a random instance to out_dir/new_1.csv .. new_6.csv; the same arguments and seed
+    always give the same files.
+    Spots and shops scatter around n_hotspots town centers inside the Shanghai bounding box,
+    sites spread uniformly. window: minutes between an O2O order's pickup time and its
+    delivery deadline (smaller is tighter).
+    Returns the list of written paths.
+    """
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack([rng.uniform(*LNG_RANGE, n_hotspots), rng.uniform(*LAT_RANGE, n_hotspots)])
+
+    def uniform_points(n):
+        return rng.uniform(*LNG_RANGE, n), rng.uniform(*LAT_RANGE, n)
+
+    def clustered_points(n):
+        home = centers[rng.integers(0, n_hotspots, n)]
+        lng = np.clip(home[:, 0] + rng.normal(0, 0.06, n), *LNG_RANGE)
+        lat = np.clip(home[:, 1] + rng.normal(0, 0.05, n), *LAT_RANGE)
+        return lng, lat
+
+    def ids(prefix, n, width):
+        width = max(width, len(str(n)))
+        return [f"{prefix}{k:0{width}d}" for k in range(1, n + 1)]
+
+    site_ids, spot_ids, shop_ids = ids("A", n_sites, 3), ids("B", n_spots, 4), ids("S", n_shops, 3)
+    sites = pd.DataFrame(dict(zip(("Site_id", "Lng", "Lat"), (site_ids, *uniform_points(n_sites)))))
+    spots = pd.DataFrame(dict(zip(("Spot_id", "Lng", "Lat"), (spot_ids, *clustered_points(n_spots)))))
+    shops = pd.DataFrame(dict(zip(("Shop_id", "Lng", "Lat"), (shop_ids, *clustered_points(n_shops)))))
+
+    # E-commerce orders: every site ships to spots, 1-99 packages each
+    ecommerce_orders = pd.DataFrame({
+        "Order_id": ids("F", n_ecommerce, 4),
+        "Spot_id": np.asarray(spot_ids)[rng.integers(0, n_spots, n_ecommerce)],
+        "Site_id": np.asarray(site_ids)[rng.integers(0, n_sites, n_ecommerce)],
+        "Num": rng.integers(1, 100, n_ecommerce),
+    })
+
+    # O2O orders: mostly small (1-3 packages), pickup time uniform in PICKUP_RANGE
+    first, last = (int(t[:2]) * 60 + int(t[3:]) for t in PICKUP_RANGE)
+    pickup = rng.integers(first, last + 1, n_o2o)
+    o2o_orders = pd.DataFrame({
+        "Order_id": ids("E", n_o2o, 4),
+        "Spot_id": np.asarray(spot_ids)[rng.integers(0, n_spots, n_o2o)],
+        "Shop_id": np.asarray(shop_ids)[rng.integers(0, n_shops, n_o2o)],
+        "Pickup_time": _hhmm(pickup),
+        "Delivery_time": _hhmm(pickup + window),
+        "Num": np.minimum(rng.geometric(0.45, n_o2o), 23),
+    })
+    couriers = pd.DataFrame({"Courier_id": ids("D", n_couriers, 4)})
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name, df in zip(DATASET_FILES, (sites, spots, shops, ecommerce_orders, o2o_orders, couriers)):
+        path = os.path.join(out_dir, name)
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def _hhmm(minutes):
+    minutes = np.minimum(minutes, 24 * 60 - 1)
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in minutes.tolist()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic instance in the Dataset/ CSV schema.")
+    parser.add_argument("out_dir", help="directory for new_1.csv .. new_6.csv")
+    parser.add_argument("--orders", type=int, default=1000, help="total number of orders")
+    parser.add_argument("--o2o-share", type=float, default=0.27, help="fraction of O2O orders")
+    parser.add_argument("--window", type=int, default=O2O_WINDOW, help="O2O delivery window in minutes")
+    parser.add_argument("--seed", type=int, default=0)
+    for name in ("sites", "spots", "shops", "couriers"):
+        parser.add_argument(f"--{name}", type=int, help=f"number of {name} (default: scaled with --orders)")
+    args = parser.parse_args(argv)
+
+    config = scaled_config(args.orders, args.o2o_share, args.window)
+    for name in ("sites", "spots", "shops", "couriers"):
+        if getattr(args, name) is not None:
+            config[f"n_{name}"] = getattr(args, name)
+    generate_instance(args.out_dir, seed=args.seed, **config)
+    print(f"✅ Instance with {args.orders} orders written to {args.out_dir}: {config}")
+
+
+if __name__ == '__main__':
+    main()
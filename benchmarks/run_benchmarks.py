@@ -0,0 +1,232 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+from generate_instance import DATASET_FILES, generate_instance, scaled_config
+
+# ================== Scaling Benchmarks ==================
+# For every instance size and O2O window, generate a seeded instance (generate_instance.py) and
+# run each component in a fresh process, so peak RSS belongs to that component alone:
+#   heuristic - main.py pipeline: clustering, initial_solution and local_search (phase times
+#               come from the --profile report), objective = total route time
+#   evaluate  - evaluate.validate on the heuristic's schedule, timing only (objective None):
+#               save_schedule_to_csv writes only the delivery row of an e-commerce order and
+#               orders rows by courier and time, while evaluate.py's rules expect two rows per
+#               order and a running load in file order, so its cost and violation counts on
+#               this schedule would be noise
+#   ga        - ga.Generation.geneEvolve on one tour through the e-commerce spots,
+#               objective = best tour time
+# Results (wall time, peak RSS including child processes, objective) go to a JSON file;
+# --compare prints the ratios against an earlier results file.
+#
+#   python benchmarks/run_benchmarks.py --orders 1000 10000 100000 --windows 90 45
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEURISTIC_DIR = os.path.join(ROOT, "heursitic+localsearch")
+COMPONENTS = ("heuristic", "evaluate", "ga")
+SCHEDULE_FILE = "heuristic+localsearch_schedule.csv"
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process and of its finished child processes."""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+# ================== Components (run in the child process, cwd = instance directory) ==================
+
+def run_heuristic(args):
+    sys.path.insert(0, HEURISTIC_DIR)
+    import main as heuristic
+    from solution import recalc_route_times
+    routes = heuristic.main(full_matrix=False, workers=args.workers, seed=args.seed, headless=True,
+                            time_budget=args.time_budget, profile_path="profile.json")
+    results = [recalc_route_times(route) for route in routes.values()]
+    with open("profile.json") as f:
+        profile = json.load(f)
+    return sum(r[0] for r in results), {
+        "routes": len(routes),
+        "infeasible_routes": sum(not r[1] for r in results),
+        "phases": {name: stats["seconds"] for name, stats in profile["phases"].items()},
+        # Summed over the pool workers (worker-seconds), not wall time
+        "worker_phases": {name: stats["worker_seconds"] for name, stats in profile.get("worker_phases", {}).items()},
+        "counters": profile["counters"],
+    }
+
+def run_evaluate(args):
+    sys.path.insert(0, HEURISTIC_DIR)
+    import evaluate
+    if not os.path.exists(SCHEDULE_FILE):
+        raise FileNotFoundError(f"{SCHEDULE_FILE} not found; run the heuristic component first")
+    instance = evaluate.load_instance("Dataset", DATASET_FILES)
+    schedule = evaluate.read_schedule(SCHEDULE_FILE)
+    evaluate.validate(schedule, instance, workers=args.workers)
+    return None, {"rows": len(schedule)}
+
+_tour = {}
+
+def _tour_aim(pop_array):
+    """Batch aim: fitness 1 / tour time (ga.Generation maximizes), payload the tour time in minutes."""
+    order = pop_array[:, 1:1 + _tour["n"]] - 1
+    lat = np.concatenate([np.broadcast_to(_tour["site"][0], (len(order), 1)), _tour["lat"][order]], axis=1)
+    lng = np.concatenate([np.broadcast_to(_tour["site"][1], (len(order), 1)), _tour["lng"][order]], axis=1)
+    a = (np.sin(np.diff(lat, axis=1) / 2)**2 +
+         np.cos(lat[:, :-1]) * np.cos(lat[:, 1:]) * np.sin(np.diff(lng, axis=1) / 2)**2)
+    minutes = (2 * 6378.137 * np.arcsin(np.sqrt(a))).sum(axis=1) * 4.0  # 15 km/h
+    return 1.0 / np.maximum(minutes, 1e-9), minutes.tolist()
+
+def run_ga(args):
+    sys.path.insert(0, ROOT)
+    import pandas as pd
+    import ga
+    sites, spots, _, ecommerce_orders, _, couriers = (pd.read_csv(os.path.join("Dataset", name))
+                                                      for name in DATASET_FILES)
+    if args.ga_stops:
+        ecommerce_orders = ecommerce_orders.head(args.ga_stops)
+    coords = spots.set_index("Spot_id").loc[ecommerce_orders["Spot_id"], ["Lat", "Lng"]].to_numpy()
+    _tour.update(n=len(coords), lat=np.radians(coords[:, 0]), lng=np.radians(coords[:, 1]),
+                 site=np.radians(sites.loc[0, ["Lat", "Lng"]].to_numpy(dtype=np.float64)))
+    generation = ga.Generation(_tour_aim, groupnum=args.ga_population, generation=args.ga_generations,
+                               var_num=1 + 3 * len(coords), var_minrange=[1], var_maxrange=[len(couriers)],
+                               batch=True, crossover="ox", seed=args.seed)
+    best = generation.geneEvolve()
+    return float(best[2]), {"stops": len(coords), "generations": args.ga_generations,
+                            "population": args.ga_population}
+
+RUNNERS = {"heuristic": run_heuristic, "evaluate": run_evaluate, "ga": run_ga}
+
+def run_component(args):
+    """Child process: run one component and write its measurements to args.result."""
+    start = time.perf_counter()
+    objective, details = RUNNERS[args.run_component](args)
+    result = {"seconds": time.perf_counter() - start, "peak_rss_bytes": peak_rss_bytes(),
+              "objective": objective, "details": details}
+    with open(args.result, "w") as f:
+        json.dump(result, f, indent=2)
+
+
+# ================== Harness (parent process) ==================
+
+def prepare_instance(work_dir, orders, window, seed):
+    """Generate the instance once; the generator is deterministic, so existing files are reused."""
+    directory = os.path.join(work_dir, f"orders{orders}_w{window}_s{seed}")
+    dataset_dir = os.path.join(directory, "Dataset")
+    config = scaled_config(orders, window=window)
+    if not all(os.path.exists(os.path.join(dataset_dir, name)) for name in DATASET_FILES):
+        generate_instance(dataset_dir, seed=seed, **config)
+    return directory, config
+
+def measure(component, directory, args):
+    """Run one component in a child process; returns its record (status ok/failed/timeout/skipped)."""
+    if component == "evaluate" and not os.path.exists(os.path.join(directory, SCHEDULE_FILE)):
+        return {"status": "skipped", "wall_seconds": 0.0}  # no heuristic schedule to check
+    result_path = os.path.join(directory, f"{component}_result.json")
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    command = [sys.executable, os.path.abspath(__file__), "--run-component", component, "--result", result_path,
+               "--seed", str(args.seed), "--workers", str(args.workers),
+               "--ga-generations", str(args.ga_generations), "--ga-population", str(args.ga_population)]
+    if args.time_budget is not None:
+        command += ["--time-budget", str(args.time_budget)]
+    if args.ga_stops:
+        command += ["--ga-stops", str(args.ga_stops)]
+    start = time.perf_counter()
+    with open(os.path.join(directory, f"{component}.log"), "w") as log:
+        try:
+            completed = subprocess.run(command, cwd=directory, stdout=log, stderr=subprocess.STDOUT,
+                                       timeout=args.timeout)
+            status = "ok" if completed.returncode == 0 and os.path.exists(result_path) else "failed"
+        except subprocess.TimeoutExpired:
+            status = "timeout"
+    record = {"status": status, "wall_seconds": time.perf_counter() - start}
+    if status == "ok":
+        with open(result_path) as f:
+            record.update(json.load(f))
+    return record
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def compare(runs, baseline_path):
+    """Print time, memory and objective of each run relative to the matching run of a baseline file."""
+    with open(baseline_path) as f:
+        baseline = {(r["orders"], r["window"], r["component"]): r for r in json.load(f)["runs"]}
+    print(f"\nRelative to {baseline_path} (new / old):")
+    for run in runs:
+        old = baseline.get((run["orders"], run["window"], run["component"]))
+        if old is None or run["status"] != "ok" or old["status"] != "ok":
+            continue
+        ratios = [f"{key} {run[key] / old[key]:.2f}x" if run[key] is not None and old[key] else f"{key} n/a"
+                  for key in ("seconds", "peak_rss_bytes", "objective")]
+        print(f"  {run['orders']:>7} orders  w{run['window']:<4} {run['component']:<10} " + "  ".join(ratios))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmarks on seeded synthetic instances.")
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000, 3000, 10000, 30000, 100000],
+                        help="instance sizes (total orders)")
+    parser.add_argument("--windows", type=int, nargs="+", default=[90],
+                        help="O2O delivery windows in minutes (time-window tightness)")
+    parser.add_argument("--components", nargs="+", choices=COMPONENTS, default=list(COMPONENTS))
+    parser.add_argument("--seed", type=int, default=0, help="instance and solver seed")
+    parser.add_argument("--workers", type=int, default=1, help="processes for the heuristic and evaluate components")
+    parser.add_argument("--time-budget", type=float, help="local search time budget of the heuristic, in seconds")
+    parser.add_argument("--timeout", type=float, help="seconds after which a component run is abandoned")
+    parser.add_argument("--ga-generations", type=int, default=20)
+    parser.add_argument("--ga-population", type=int, default=20)
+    parser.add_argument("--ga-stops", type=int, help="limit the GA tour to the first N e-commerce orders")
+    parser.add_argument("--work-dir", default=os.path.join(ROOT, "benchmarks", "instances"),
+                        help="where instances, schedules and logs are kept")
+    parser.add_argument("--output", help="results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results JSON to compare against")
+    parser.add_argument("--run-component", choices=COMPONENTS, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_component:
+        run_component(args)
+        return
+
+    created = datetime.datetime.now()
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{created:%Y%m%d_%H%M%S}.json")
+    runs = []
+    for orders in args.orders:
+        for window in args.windows:
+            directory, config = prepare_instance(args.work_dir, orders, window, args.seed)
+            for component in args.components:
+                record = measure(component, directory, args)
+                runs.append({"orders": orders, "window": window, "component": component, "config": config, **record})
+                objective = f"{record['objective']:.2f}" if record.get("objective") is not None else "-"
+                rss = f"{record['peak_rss_bytes'] / 2**20:.0f} MiB" if record["status"] == "ok" else "-"
+                print(f"{orders:>7} orders  w{window:<4} {component:<10} {record['status']:<8} "
+                      f"{record['wall_seconds']:>9.2f} s  {rss:>9}  objective {objective}")
+
+    results = {
+        "created": created.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "runs": runs,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved to {output}")
+    if args.compare:
+        compare(runs, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,11 +11,152 @@ import datetime
 import logging
 import json
 import copy
+import bisect
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import pickle
+import queue
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
 import numpy as np
 
 # 假设工作时长为 12 小时，即 720 分钟（从 8:00 至 20:00）
 MAX_WORK_MINUTES = 720
 
+# ================== 进程池辅助函数 ==================
+
+def share_array(array):
+    """
+    将 numpy 数组复制到共享内存，返回 (SharedMemory 对象, 描述符)。
+    描述符可放入 worker_initargs，由子进程通过 attach_shared_array 直接映射（不再逐代 pickle）；
+    父进程用完后应调用 shm.close() 和 shm.unlink()。
+    """
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+_attached_memory = {}
+
+def attach_shared_array(spec):
+    """在子进程中按描述符映射共享内存数组（只读使用）"""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    _attached_memory[name] = shm  # 保持引用，防止映射被回收
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def _call_aim(aim, individual):
+    """子进程中调用逐个体 aim，只返回 (fitness, courier_spots)，省去 route 的回传"""
+    fitness, route, courier_spots = aim(individual)
+    return fitness, courier_spots
+
+class FitnessCache:
+    """
+    适应度缓存：以染色体整数数组的字节串为键，容量满时按 LRU 淘汰最久未使用的条目，
+    并统计命中/未命中次数
+    """
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(chromosome) -> bytes:
+        return np.ascontiguousarray(chromosome, dtype=np.int64).tobytes()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """返回缓存的 (fitness, payload)，未命中返回 None"""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+class HallOfFame:
+    """
+    名人堂：只保留适应度最高的 size 个不同个体，按适应度升序排列，
+    因此 hof[-1] 即为最优个体 (best_fitness, best_chromosome, best_courier_info)
+    """
+    def __init__(self, size: int = 10):
+        self.size = size
+        self._items = []
+        self._fitness = []
+        self._keys = set()
+
+    def append(self, item):
+        fitness, chromosome = item[0], item[1]
+        key = FitnessCache.key(chromosome)
+        if key in self._keys:
+            return
+        if len(self._items) >= self.size and fitness <= self._fitness[0]:
+            return
+        pos = bisect.bisect_right(self._fitness, fitness)
+        self._fitness.insert(pos, fitness)
+        self._items.insert(pos, item)
+        self._keys.add(key)
+        if len(self._items) > self.size:
+            self._fitness.pop(0)
+            dropped = self._items.pop(0)
+            self._keys.discard(FitnessCache.key(dropped[1]))
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+class GenerationStats:
+    """
+    逐代统计（流式）：最近 history_size 代的 (代数, 最优, 平均, 标准差, 最差) 保存在 history，
+    另外累计全程的代数、评估个体数和历史最优适应度，内存占用恒定
+    """
+    def __init__(self, history_size: int = 100):
+        self.history = deque(maxlen=history_size)
+        self.generations = 0
+        self.evaluations = 0
+        self.best = float('-inf')
+
+    def record(self, generation, fitness):
+        fitness = np.asarray(fitness, dtype=float)
+        row = {
+            "generation": generation,
+            "best": float(fitness.max()),
+            "mean": float(fitness.mean()),
+            "std": float(fitness.std()),
+            "worst": float(fitness.min()),
+        }
+        self.history.append(row)
+        self.generations += 1
+        self.evaluations += len(fitness)
+        self.best = max(self.best, row["best"])
+        return row
+
 class Generation:
     def __init__(
         self,
@@ -28,9 +169,22 @@ class Generation:
         var_minrange: list = None,
         var_maxrange: list = None,
         decodemap: dict = None,
+        batch: bool = False,
+        crossover: str = "onepoint",
+        seed: int = None,
+        cache_size: int = 0,
+        workers: int = 1,
+        worker_init=None,
+        worker_initargs: tuple = (),
+        selection: str = "roulette",
+        tournament_size: int = 2,
+        elite: int = 0,
+        hall_of_fame: int = 10,
+        history_size: int = 100,
     ):
         """
-        :param aim:          适应度函数，必须返回三元组 (fitness, route, courier_spots)
+        :param aim:          适应度函数，必须返回三元组 (fitness, route, courier_spots)；
+                             批量模式下见 batch
         :param groupnum:     种群数量
         :param generation:   进化代数
         :param var_num:      染色体长度
@@ -39,6 +193,21 @@ class Generation:
         :param var_minrange: 基因最小值列表
         :param var_maxrange: 基因最大值列表
         :param decodemap:    映射字典(可选)
+        :param batch:        批量模式：aim 一次接收整个种群（形状为 (groupnum, var_num) 的整数数组），
+                             返回二元组 (fitness 向量, 每个个体的附加信息列表)
+        :param crossover:    配送顺序部分的交叉算子："onepoint"（单点交换+修复，原有算子）、
+                             "ox"（顺序交叉）或 "pmx"（部分映射交叉），后两者无需修复
+        :param seed:         随机种子（numpy Generator），None 表示不固定
+        :param cache_size:   适应度缓存容量（FitnessCache，LRU 淘汰），0 表示不缓存
+        :param workers:      >1 时用常驻进程池并行计算适应度（aim 须为可 pickle 的模块级函数）
+        :param worker_init:  进程池初始化函数，每个子进程只调用一次，用于加载问题数据
+                             （距离矩阵、订单表等，可配合 share_array / attach_shared_array）
+        :param worker_initargs: worker_init 的参数
+        :param selection:    选择方式："roulette"（轮盘赌，二分查找累积概率）或 "tournament"（锦标赛）
+        :param tournament_size: 锦标赛规模
+        :param elite:        精英个数：每代适应度最高的 elite 个个体不经交叉变异直接进入下一代
+        :param hall_of_fame: 名人堂容量（self.best 只保留最优的若干个体）
+        :param history_size: self.stats 中保留的逐代统计条数
         """
         if var_minrange is None:
             var_minrange = [1]  # 对于扩展编码，首个基因的最小值（快递员数量）
@@ -58,66 +227,89 @@ class Generation:
         self.var_minrange = var_minrange
         self.var_maxrange = var_maxrange
         self.decodemap = decodemap
+        self.batch = batch
+        if crossover not in ("onepoint", "ox", "pmx"):
+            raise ValueError("crossover must be 'onepoint', 'ox' or 'pmx'")
+        self.crossover = crossover
+        self.rng = np.random.default_rng(seed)
+        self.cache = FitnessCache(cache_size) if cache_size > 0 else None
+        self.workers = workers
+        self.worker_init = worker_init
+        self.worker_initargs = worker_initargs
+        self._pool = None
+        if selection not in ("roulette", "tournament"):
+            raise ValueError("selection must be 'roulette' or 'tournament'")
+        self.selection = selection
+        self.tournament_size = tournament_size
+        self.elite = min(elite, groupnum)
+        self._elites = None
+        self._immigrants = None
+        self.fitness = None
 
-        # 初始化种群：
+        # 初始化种群（二维整数数组，形状 (groupnum, var_num)）：
         # 若 (var_num-1) 能被 3 整除，则认为采用扩展编码（1+3×N 的结构）
-        self.population = []
+        rng = self.rng
+        courier = rng.integers(self.var_minrange[0], self.var_maxrange[0] + 1, size=(groupnum, 1))
         if (self.var_num - 1) % 3 == 0:
             N = (self.var_num - 1) // 3
-            for _ in range(groupnum):
-                # 基因0：快递员数量
-                courier = random.randint(self.var_minrange[0], self.var_maxrange[0])
-                # 基因1～N：配送顺序（对停靠点编号 1～N 的排列）
-                permutation = list(range(1, N + 1))
-                shuffle(permutation)
-                # 基因 N+1～2N：候选到达时间（0～MAX_WORK_MINUTES 内随机）
-                candidate_arrival = [random.randint(0, MAX_WORK_MINUTES) for _ in range(N)]
-                # 基因 2N+1～3N：候选离开时间（保证至少比对应到达时间大 5 分钟）
-                candidate_departure = []
-                for arr in candidate_arrival:
-                    dep = arr + random.randint(5, 30)
-                    if dep > MAX_WORK_MINUTES:
-                        dep = MAX_WORK_MINUTES
-                    candidate_departure.append(dep)
-                chromosome = [courier] + permutation + candidate_arrival + candidate_departure
-                self.population.append(chromosome)
+            # 基因1～N：配送顺序（对停靠点编号 1～N 的排列）
+            permutation = rng.permuted(np.tile(np.arange(1, N + 1), (groupnum, 1)), axis=1)
+            # 基因 N+1～2N：候选到达时间（0～MAX_WORK_MINUTES 内随机）
+            candidate_arrival = rng.integers(0, MAX_WORK_MINUTES + 1, size=(groupnum, N))
+            # 基因 2N+1～3N：候选离开时间（保证至少比对应到达时间大 5 分钟，且不超过 MAX_WORK_MINUTES）
+            candidate_departure = np.minimum(candidate_arrival + rng.integers(5, 31, size=(groupnum, N)), MAX_WORK_MINUTES)
+            self.population = np.hstack([courier, permutation, candidate_arrival, candidate_departure])
         else:
             # 原有的简单初始化（仅适用于纯排列编码）
-            init_list = list(range(1, self.var_num))
-            for _ in range(groupnum):
-                shuffle(init_list)
-                p_tmp = [random.randint(self.var_minrange[0], self.var_maxrange[0])] + copy.copy(init_list)
-                self.population.append(p_tmp)
+            permutation = rng.permuted(np.tile(np.arange(1, self.var_num), (groupnum, 1)), axis=1)
+            self.population = np.hstack([courier, permutation])
+        self.population = self.population.astype(np.int64)
 
-        # self.best 用于记录最优个体，格式：(best_fitness, best_chromosome, best_courier_info)
-        self.best = []
+        # self.best 为名人堂，元素格式：(best_fitness, best_chromosome, best_courier_info)，按适应度升序
+        self.best = HallOfFame(hall_of_fame)
+        self.stats = GenerationStats(history_size)
 
     def repair_permutation(self, perm, N):
         """
-        修复排列 perm，使之为 1~N 的合法排列
-        """
-        missing = set(range(1, N+1)) - set(perm)
-        seen = set()
-        for i in range(len(perm)):
-            if perm[i] in seen:
-                if missing:
-                    perm[i] = missing.pop()
-                    seen.add(perm[i])
-                else:
-                    # 万一 missing 为空，设为1
-                    perm[i] = 1
-            else:
-                seen.add(perm[i])
-        # 若还缺失数字，则依次补充
-        for num in range(1, N+1):
-            if num not in seen:
-                # 替换第一个重复的元素
-                for i in range(len(perm)):
-                    if perm.count(perm[i]) > 1:
-                        perm[i] = num
-                        seen.add(num)
-                        break
-        return perm
+        修复排列 perm，使之为 1~N 的合法排列（O(N)）：
+        保留每个编号的首次出现，重复（或越界）位置按升序填入缺失编号
+        """
+        return self._repair_rows(np.asarray(perm, dtype=np.int64)[None, :], N)[0]
+
+    def _repair_rows(self, block, N, shuffle_missing=False):
+        """
+        批量修复：block 的每一行修复为 1~N 的排列，整体 O(行数×N)。
+        shuffle_missing=True 时缺失编号以随机顺序填入（原纯排列编码交叉的做法）。
+        """
+        block = np.array(block, dtype=np.int64)
+        rows, length = block.shape
+        pos = np.broadcast_to(np.arange(length), block.shape)
+        valid = (block >= 1) & (block <= N)
+        # first[r, v]：编号 v 在第 r 行首次出现的位置（未出现为 length）
+        first = np.full((rows, N + 1), length, dtype=np.int64)
+        row_idx = np.broadcast_to(np.arange(rows)[:, None], block.shape)
+        np.minimum.at(first, (row_idx[valid], block[valid]), pos[valid])
+        dup = ~valid
+        dup[valid] = first[row_idx[valid], block[valid]] != pos[valid]
+        missing = first[:, 1:] == length
+        dup_r, dup_c = np.nonzero(dup)
+        miss_r, miss_v = np.nonzero(missing)
+        miss_v = miss_v + 1
+        if shuffle_missing and len(miss_v):
+            order = np.lexsort((self.rng.random(len(miss_v)), miss_r))
+            miss_v = miss_v[order]
+        if len(dup_r) == len(miss_r):
+            # 每行重复数 = 缺失数，按行优先顺序一一对应
+            block[dup_r, dup_c] = miss_v
+        else:
+            # 行长度与 N 不一致时逐行处理；缺失编号不足的位置设为 1
+            for r in range(rows):
+                d = dup_c[dup_r == r]
+                m = miss_v[miss_r == r]
+                k = min(len(d), len(m))
+                block[r, d[:k]] = m[:k]
+                block[r, d[k:]] = 1
+        return block
 
     def geneDecode(self, pop: list) -> list:
         """
@@ -126,34 +318,116 @@ class Generation:
         """
         return []
 
-    def calcSufficiency(self) -> list:
+    def evaluate(self):
         """
-        计算适应度：对每个个体 pop，调用 self.aim(pop) 并做三元拆包。
-        然后记录最优个体到 self.best。
-        返回存活率列表(轮盘赌用)。
+        计算当前种群的适应度。
+        启用缓存时，只对缓存中没有的（且本代内不重复的）染色体调用 aim。
+        返回 (fitness 列表, 每个个体的附加信息列表)。
         """
+        if self.cache is None:
+            return self._evaluate_rows(self.population)
+
+        results = [None] * len(self.population)
+        pending = {}  # key -> 需要该结果的个体下标列表
+        for i, row in enumerate(self.population):
+            key = FitnessCache.key(row)
+            if key in pending:
+                # 本代内重复的染色体：与首次出现共用一次计算，计为命中
+                pending[key].append(i)
+                self.cache.hits += 1
+                continue
+            value = self.cache.get(key)
+            if value is None:
+                pending[key] = [i]
+            else:
+                results[i] = value
+        if pending:
+            first = [indices[0] for indices in pending.values()]
+            fitness, payloads = self._evaluate_rows(self.population[first])
+            for (key, indices), f, payload in zip(pending.items(), fitness, payloads):
+                self.cache.put(key, (f, payload))
+                for i in indices:
+                    results[i] = (f, payload)
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def _get_pool(self):
+        """进程池在首次使用时创建，之后跨代复用，直到 close()"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=self.worker_init,
+                                             initargs=self.worker_initargs)
+        return self._pool
+
+    def close(self):
+        """关闭进程池"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _evaluate_rows(self, rows):
+        """对给定的若干个体调用 aim，返回 (fitness 列表, 附加信息列表)"""
+        if self.workers > 1 and len(rows) > 1:
+            return self._evaluate_rows_parallel(rows)
+        if self.batch:
+            # 批量模式：一次调用 aim，传入 (个体数, var_num) 的整数数组
+            fitness, payloads = self.aim(np.asarray(rows, dtype=np.int64))
+            return [float(f) for f in fitness], list(payloads)
+
         survival_list = []
-        route_list = []
         courier_spots_list = []
-
-        for individual in self.population:
+        for individual in rows:
             # aim(individual) 返回三元组 (fitness, route, courier_spots)
-            fitness, route, courier_spots = self.aim(individual)
+            fitness, route, courier_spots = self.aim(individual.tolist())
             survival_list.append(fitness)
-            route_list.append(route)
             courier_spots_list.append(courier_spots)
+        return survival_list, courier_spots_list
+
+    def _evaluate_rows_parallel(self, rows):
+        """把个体分成 workers 份，在进程池中计算适应度"""
+        pool = self._get_pool()
+        if self.batch:
+            chunks = [c for c in np.array_split(np.asarray(rows, dtype=np.int64), self.workers) if len(c)]
+            survival_list = []
+            payload_list = []
+            for fitness, payloads in pool.map(self.aim, chunks):
+                survival_list.extend(float(f) for f in fitness)
+                payload_list.extend(payloads)
+            return survival_list, payload_list
+
+        chunksize = max(1, -(-len(rows) // self.workers))
+        results = list(pool.map(partial(_call_aim, self.aim), [row.tolist() for row in rows], chunksize=chunksize))
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def calcSufficiency(self) -> list:
+        """
+        计算适应度：对每个个体 pop，调用 self.aim(pop) 并做三元拆包
+        （批量模式下对整个种群调用一次 aim）。
+        然后记录最优个体到 self.best，并更新逐代统计 self.stats。
+        返回存活率列表(轮盘赌用)。
+        """
+        survival_list, courier_spots_list = self.evaluate()
+        if self._immigrants is not None:
+            survival_list, courier_spots_list = self._accept_immigrants(survival_list, courier_spots_list)
+        self.fitness = np.asarray(survival_list, dtype=float)
+        self.stats.record(self.curiter, self.fitness)
 
         total = float(sum(survival_list)) if survival_list else 1.0
         rate_survival_list = [rate / total for rate in survival_list]
 
         # 找到适应度最高的个体下标
-        index = np.argsort(rate_survival_list)[-1]
+        index = int(np.argmax(self.fitness))
 
         # 记录最优个体到 self.best
         self.best.append(
             (
                 survival_list[index],
-                copy.copy(self.population[index]),
+                self.population[index].tolist(),
                 courier_spots_list[index]
             )
         )
@@ -161,139 +435,377 @@ class Generation:
         self.curiter += 1
         return rate_survival_list
 
+    def immigrate(self, entries, replacement: str = "worst"):
+        """
+        登记一批移民 [(fitness, chromosome, courier_info), ...]（已评估过的个体），
+        在下一次计算适应度后替换本种群的最差（"worst"）或随机（"random"）个体，移民不再重复评估
+        """
+        self._immigrants = (list(entries), replacement)
+
+    def _accept_immigrants(self, survival_list, courier_spots_list):
+        """用登记的移民替换种群中的个体，同时替换其适应度与附加信息"""
+        entries, replacement = self._immigrants
+        self._immigrants = None
+        k = min(len(entries), len(survival_list))
+        if replacement == "worst":
+            targets = np.argsort(np.asarray(survival_list, dtype=float))[:k]
+        else:
+            targets = self.rng.choice(len(survival_list), size=k, replace=False)
+        survival_list = list(survival_list)
+        courier_spots_list = list(courier_spots_list)
+        for target, (fitness, chromosome, courier_spots) in zip(targets, entries):
+            self.population[target] = chromosome
+            survival_list[target] = fitness
+            courier_spots_list[target] = courier_spots
+        return survival_list, courier_spots_list
+
     def choosePopulation(self) -> list:
         """
-        轮盘赌选择，基于存活率选出新的种群
+        选择：轮盘赌（累积存活率上二分查找，O(groupnum·log groupnum)）或锦标赛，
+        精英个体单独保存，在变异后放回种群
         """
         survival_list = self.calcSufficiency()
-        # 累加
-        for i in range(1, len(survival_list)):
-            survival_list[i] += survival_list[i - 1]
-
-        new_population = []
-        for _ in range(self.groupnum):
-            random_rate = random.random()
-            for i, prop in enumerate(survival_list):
-                if random_rate <= prop:
-                    new_population.append(copy.copy(self.population[i]))
-                    break
-        self.population = new_population
-        return new_population
+        fitness = self.fitness
+        if self.elite > 0:
+            self._elites = self.population[np.argsort(fitness)[-self.elite:]].copy()
+
+        if self.selection == "tournament":
+            contestants = self.rng.integers(0, len(fitness), size=(self.groupnum, self.tournament_size))
+            chosen = contestants[np.arange(self.groupnum), np.argmax(fitness[contestants], axis=1)]
+        else:
+            # 累加后二分查找：第一个累积概率 >= 随机数的个体
+            cumulative = np.cumsum(survival_list)
+            chosen = np.searchsorted(cumulative, self.rng.random(self.groupnum) * cumulative[-1], side="left")
+            chosen = np.minimum(chosen, len(cumulative) - 1)
+        # 花式索引返回副本，新种群与旧种群互不影响
+        self.population = self.population[chosen]
+        return self.population
 
     def crossCalc(self) -> list:
         """
-        交叉操作
+        交叉操作（按相邻两个个体配对，对整个种群做数组运算）
         """
         self.choosePopulation()
-        np.random.shuffle(self.population)
+        rng = self.rng
+        rng.shuffle(self.population)
+        pop = self.population
+        n_pairs = self.groupnum // 2
+        if n_pairs == 0:
+            return pop
+        a = pop[0:2 * n_pairs:2]      # 每对中的第一个个体（视图）
+        b = pop[1:2 * n_pairs:2]      # 每对中的第二个个体（视图）
         if (self.var_num - 1) % 3 == 0:
             N = (self.var_num - 1) // 3
-            for i in range(0, self.groupnum - 1, 2):
-                # 对快递员数量基因 (索引0)
-                if random.random() <= self.crossrate:
-                    self.population[i][0], self.population[i+1][0] = self.population[i+1][0], self.population[i][0]
-                # 对配送顺序部分：基因1～N
-                rand_cross_point = random.randint(2, N)
-                temp1 = self.population[i][1:rand_cross_point+1]
-                temp2 = self.population[i+1][1:rand_cross_point+1]
-                self.population[i][1:rand_cross_point+1] = temp2
-                self.population[i+1][1:rand_cross_point+1] = temp1
-                # 修复配送顺序部分，保证为合法排列
-                self.population[i][1:1+N] = self.repair_permutation(self.population[i][1:1+N], N)
-                self.population[i+1][1:1+N] = self.repair_permutation(self.population[i+1][1:1+N], N)
-                # 对候选到达部分：基因 N+1～2N
-                for j in range(N+1, 2*N+1):
-                    if random.random() <= self.crossrate:
-                        self.population[i][j], self.population[i+1][j] = self.population[i+1][j], self.population[i][j]
-                # 对候选离开部分：基因 2N+1～3N
-                for j in range(2*N+1, 3*N+1):
-                    if random.random() <= self.crossrate:
-                        self.population[i][j], self.population[i+1][j] = self.population[i+1][j], self.population[i][j]
+            # 对快递员数量基因 (索引0)
+            self._swap_where(a, b, rng.random((n_pairs, 1)) <= self.crossrate, 0, 1)
+            # 对配送顺序部分：基因1～N
+            self._cross_permutation(a, b, 1, N, np.ones(n_pairs, dtype=bool), prefix_offset=0)
+            # 对候选到达部分：基因 N+1～2N（均匀交叉）
+            self._swap_where(a, b, rng.random((n_pairs, N)) <= self.crossrate, N + 1, 2 * N + 1)
+            # 对候选离开部分：基因 2N+1～3N（均匀交叉）
+            self._swap_where(a, b, rng.random((n_pairs, N)) <= self.crossrate, 2 * N + 1, 3 * N + 1)
         else:
             # 原有交叉方法：仅对除第一个基因外的排列进行交叉
-            for i in range(0, self.groupnum, 2):
-                prop = random.random()
-                rand_cross_point = random.randint(2, self.var_num - 1)
-                if prop <= self.crossrate:
-                    i_set = set(self.population[i+1][1:rand_cross_point])
-                    total_set = set(range(1, self.var_num))
-                    ip1_set = set(self.population[i][1:rand_cross_point])
-
-                    self.population[i][1:rand_cross_point], self.population[i+1][1:rand_cross_point] = (
-                        copy.copy(self.population[i+1][1:rand_cross_point]),
-                        copy.copy(self.population[i][1:rand_cross_point]),
-                    )
-                    for leftpart in range(rand_cross_point, self.var_num):
-                        if self.population[i][leftpart] in i_set:
-                            cur_set = total_set - i_set
-                            self.population[i][leftpart] = list(cur_set)[random.randint(0, len(cur_set) - 1)]
-                        i_set.add(self.population[i][leftpart])
-
-                        if self.population[i+1][leftpart] in ip1_set:
-                            cur_set = total_set - ip1_set
-                            self.population[i+1][leftpart] = list(cur_set)[random.randint(0, len(cur_set) - 1)]
-                        ip1_set.add(self.population[i+1][leftpart])
-        return self.population
+            self._cross_permutation(a, b, 1, self.var_num - 1, rng.random(n_pairs) <= self.crossrate,
+                                    prefix_offset=-1, shuffle_missing=True)
+        return pop
+
+    @staticmethod
+    def _swap_where(a, b, mask, lo, hi):
+        """按掩码交换 a、b 在基因 lo～hi-1 上的取值（a、b 为同形状的视图）"""
+        seg_a = a[:, lo:hi]
+        seg_b = b[:, lo:hi]
+        tmp = np.where(mask, seg_b, seg_a)
+        seg_b[...] = np.where(mask, seg_a, seg_b)
+        seg_a[...] = tmp
+
+    def _cross_permutation(self, a, b, lo, N, active, prefix_offset=0, shuffle_missing=False):
+        """
+        对基因 lo～lo+N-1 的排列部分做交叉，active 为参与交叉的配对掩码。
+        单点交叉时交换前 k+prefix_offset 个基因（k 为 2～N 的随机交叉点）。
+        """
+        rng = self.rng
+        n_pairs = len(a)
+        if N < 2:
+            return
+        if self.crossover == "onepoint":
+            # 交换前缀后修复为合法排列
+            k = rng.integers(2, N + 1, size=n_pairs) + prefix_offset
+            mask = (np.arange(N)[None, :] < k[:, None]) & active[:, None]
+            self._swap_where(a, b, mask, lo, lo + N)
+            rows = np.flatnonzero(active)
+            a[rows, lo:lo + N] = self._repair_rows(a[rows, lo:lo + N], N, shuffle_missing)
+            b[rows, lo:lo + N] = self._repair_rows(b[rows, lo:lo + N], N, shuffle_missing)
+            return
+        op = self._ox if self.crossover == "ox" else self._pmx
+        for r in np.flatnonzero(active):
+            cut1, cut2 = np.sort(rng.choice(N + 1, size=2, replace=False))
+            p1 = a[r, lo:lo + N].copy()
+            p2 = b[r, lo:lo + N].copy()
+            a[r, lo:lo + N] = op(p1, p2, cut1, cut2, N)
+            b[r, lo:lo + N] = op(p2, p1, cut1, cut2, N)
+
+    @staticmethod
+    def _ox(p1, p2, cut1, cut2, N):
+        """
+        顺序交叉 OX：子代保留 p1[cut1:cut2]，其余位置从 cut2 起（循环）按 p2 中的相对顺序填入，O(N)
+        """
+        child = np.empty_like(p1)
+        child[cut1:cut2] = p1[cut1:cut2]
+        in_seg = np.zeros(N + 1, dtype=bool)
+        in_seg[p1[cut1:cut2]] = True
+        donor = np.roll(p2, -cut2)
+        outside = np.roll(np.arange(N), -cut2)[:N - (cut2 - cut1)]
+        child[outside] = donor[~in_seg[donor]]
+        return child
+
+    @staticmethod
+    def _pmx(p1, p2, cut1, cut2, N):
+        """
+        部分映射交叉 PMX：子代保留 p1[cut1:cut2]，其余位置取 p2，
+        冲突编号沿映射 p1[i] -> p2[i] 追溯到段外编号
+        """
+        child = p2.copy()
+        child[cut1:cut2] = p1[cut1:cut2]
+        in_seg = np.zeros(N + 1, dtype=bool)
+        in_seg[p1[cut1:cut2]] = True
+        pos_in_p1 = np.empty(N + 1, dtype=np.int64)
+        pos_in_p1[p1] = np.arange(N)
+        outside = np.r_[0:cut1, cut2:N]
+        values = child[outside]
+        conflict = in_seg[values]
+        while conflict.any():
+            values[conflict] = p2[pos_in_p1[values[conflict]]]
+            conflict = in_seg[values]
+        child[outside] = values
+        return child
+
+    def _swap_mutation(self, lo, N, attempts):
+        """
+        批量交换突变：第 i 个个体尝试 attempts[i] 次、每次以 variationrate 概率
+        交换基因 lo～lo+N-1 中两个不同位置；成功次数服从二项分布，按轮次对整个种群同时交换
+        """
+        if N < 2:
+            return
+        rng = self.rng
+        rows_all = np.arange(self.groupnum)
+        swaps = rng.binomial(attempts, min(max(self.variationrate, 0.0), 1.0))
+        for t in range(int(swaps.max(initial=0))):
+            rows = rows_all[swaps > t]
+            p1 = rng.integers(0, N, size=len(rows))
+            p2 = (p1 + rng.integers(1, N, size=len(rows))) % N
+            c1 = lo + p1
+            c2 = lo + p2
+            v1 = self.population[rows, c1]
+            self.population[rows, c1] = self.population[rows, c2]
+            self.population[rows, c2] = v1
 
     def geneRevolution(self) -> list:
         """
-        基因突变
+        基因突变（对整个种群做数组运算）
         """
         self.crossCalc()
+        rng = self.rng
+        pop = self.population
+        G = self.groupnum
+        # 对快递员数量基因突变
+        mutate = rng.random(G) <= self.variationrate
+        pop[mutate, 0] = rng.integers(self.var_minrange[0], self.var_maxrange[0] + 1, size=int(mutate.sum()))
         if (self.var_num - 1) % 3 == 0:
             N = (self.var_num - 1) // 3
-            for i in range(self.groupnum):
-                # 对快递员数量基因突变
-                if random.random() <= self.variationrate:
-                    self.population[i][0] = random.randint(self.var_minrange[0], self.var_maxrange[0])
-                # 对配送顺序部分：基因1～N
-                for _ in range(random.randint(1, N)):
-                    if random.random() <= self.variationrate:
-                        p1 = random.randint(1, N)
-                        p2 = random.randint(1, N)
-                        while p2 == p1:
-                            p2 = random.randint(1, N)
-                        self.population[i][p1], self.population[i][p2] = self.population[i][p2], self.population[i][p1]
-                # 修复配送顺序部分
-                self.population[i][1:1+N] = self.repair_permutation(self.population[i][1:1+N], N)
-                # 对候选到达部分：基因 N+1～2N
-                for j in range(N+1, 2*N+1):
-                    if random.random() <= self.variationrate:
-                        self.population[i][j] = random.randint(0, MAX_WORK_MINUTES)
-                # 对候选离开部分：基因 2N+1～3N
-                for j in range(2*N+1, 3*N+1):
-                    if random.random() <= self.variationrate:
-                        arr_time = self.population[i][j - N]  # 对应的到达时间
-                        self.population[i][j] = random.randint(arr_time + 5, MAX_WORK_MINUTES) if arr_time + 5 <= MAX_WORK_MINUTES else MAX_WORK_MINUTES
+            # 对配送顺序部分：基因1～N，尝试次数为 1～N 的随机数（交换保持排列合法，无需修复）
+            self._swap_mutation(1, N, rng.integers(1, N + 1, size=G))
+            # 对候选到达部分：基因 N+1～2N
+            arrival = pop[:, N + 1:2 * N + 1]
+            mutate = rng.random((G, N)) <= self.variationrate
+            arrival[mutate] = rng.integers(0, MAX_WORK_MINUTES + 1, size=int(mutate.sum()))
+            # 对候选离开部分：基因 2N+1～3N，取 [到达时间+5, MAX_WORK_MINUTES] 内随机值
+            departure = pop[:, 2 * N + 1:3 * N + 1]
+            mutate = rng.random((G, N)) <= self.variationrate
+            low = np.minimum(arrival[mutate] + 5, MAX_WORK_MINUTES)
+            departure[mutate] = rng.integers(low, MAX_WORK_MINUTES + 1)
         else:
-            # 原有突变：对第一个基因和剩余排列随机交换
-            for i in range(self.groupnum):
-                rand_variation_num = random.randint(1, self.var_num)
-                if random.random() <= self.variationrate:
-                    self.population[i][0] = random.randint(self.var_minrange[0], self.var_maxrange[0])
-                for _ in range(rand_variation_num):
-                    if random.random() <= self.variationrate:
-                        rand_variation_point1 = random.randint(1, self.var_num - 1)
-                        while True:
-                            rand_variation_point2 = random.randint(1, self.var_num - 1)
-                            if rand_variation_point2 != rand_variation_point1:
-                                break
-                        self.population[i][rand_variation_point1], self.population[i][rand_variation_point2] = (
-                            self.population[i][rand_variation_point2],
-                            self.population[i][rand_variation_point1]
-                        )
-        return self.population
+            # 原有突变：对剩余排列随机交换，尝试次数为 1～var_num 的随机数
+            self._swap_mutation(1, self.var_num - 1, rng.integers(1, self.var_num + 1, size=G))
+        if self._elites is not None:
+            # 精英保留：替换前 elite 个（已随机打乱的）个体
+            pop[:len(self._elites)] = self._elites
+            self._elites = None
+        return pop
 
     def geneEvolve(self):
         """
         多代进化后，返回最优个体。
         self.best[-1] = (best_fitness, best_chromosome, best_courier_info)
         """
-        for _ in range(self.generation):
-            self.geneRevolution()
-        self.best.sort(key=lambda kk: kk[0])
+        try:
+            for _ in range(self.generation):
+                self.geneRevolution()
+        finally:
+            # 进程池在所有代之间复用，进化结束后再关闭
+            self.close()
         return self.best[-1]
 
+# ================== 岛屿模型（多进程并行 + 迁移） ==================
+
+class MigrationAborted(RuntimeError):
+    """其他岛屿出错，迁移中断"""
+
+def _picklable(exc):
+    """异常无法 pickle 时改用带原始回溯文本的 RuntimeError，保证能经队列送回主进程"""
+    try:
+        pickle.dumps(exc)
+        return exc
+    except Exception:
+        return RuntimeError("".join(traceback.format_exception(exc)))
+
+def _island_worker(island_id, n_islands, aim, generation_kwargs, seed, generations, interval,
+                   migrants, topology, replacement, topology_seed, inboxes, results):
+    """
+    单个岛屿：独立进化 generations 代，每 interval 代向目标岛屿发送 migrants 个最优染色体
+    （取自名人堂，附带适应度），并接收一批移民替换本岛的个体；最后一轮只进化剩余的代数。
+    无论成功与否都向 results 放入 (island_id, 最优个体或异常, 逐代统计)；出错时向其他岛屿的收件箱放入 None，
+    使等待迁移的岛屿退出
+    """
+    g = None
+    outcome = None
+    epochs = max(1, -(-generations // interval))
+    try:
+        g = Generation(aim, seed=seed, **generation_kwargs)
+        for epoch in range(epochs):
+            for _ in range(min(interval, generations - epoch * interval)):
+                g.geneRevolution()
+            if epoch == epochs - 1 or n_islands == 1:
+                continue
+            if topology == "ring":
+                dest = (island_id + 1) % n_islands
+            else:
+                # 随机拓扑：所有岛屿用相同种子生成本轮的排列，保证每个岛屿恰好收到一批移民
+                dest = int(np.random.default_rng((topology_seed, epoch)).permutation(n_islands)[island_id])
+            inboxes[dest].put(list(g.best)[-migrants:] if migrants > 0 else [])
+            incoming = inboxes[island_id].get()
+            if incoming is None:
+                raise MigrationAborted(f"island {island_id}: a peer island failed")
+            g.immigrate(incoming, replacement)
+        outcome = g.best[-1] if g.best else None
+    except BaseException as exc:
+        outcome = _picklable(exc)
+        for peer, inbox in enumerate(inboxes):
+            if peer != island_id:
+                inbox.put(None)
+    finally:
+        if g is not None:
+            g.close()
+        results.put((island_id, outcome, g.stats if g is not None else None))
+
+class IslandModel:
+    """
+    岛屿模型：在多个进程中运行相互独立的 Generation 种群，
+    每 migration_interval 代按拓扑交换各岛最优染色体。
+    """
+    def __init__(
+        self,
+        aim,
+        islands: int = 4,
+        migration_interval: int = 10,
+        migrants: int = 1,
+        topology: str = "ring",
+        replacement: str = "worst",
+        seed: int = None,
+        poll_interval: float = 1.0,
+        **generation_kwargs,
+    ):
+        """
+        :param aim:                适应度函数（须为可 pickle 的模块级函数），同 Generation
+        :param islands:            岛屿（进程）数量
+        :param migration_interval: 迁移间隔代数 K
+        :param migrants:           每次迁出的最优染色体个数
+        :param topology:           迁移拓扑："ring"（环形）或 "random"（每轮随机排列）
+        :param replacement:        移民替换策略："worst"（替换最差个体）或 "random"
+        :param seed:               随机种子，第 i 个岛屿使用 seed + i
+        :param poll_interval:      等待结果时检查岛屿进程是否存活的间隔（秒）
+        :param generation_kwargs:  传给每个 Generation 的其余参数（groupnum、generation、var_num 等），
+                                   generation 为每个岛屿的总进化代数
+        """
+        if topology not in ("ring", "random"):
+            raise ValueError("topology must be 'ring' or 'random'")
+        if replacement not in ("worst", "random"):
+            raise ValueError("replacement must be 'worst' or 'random'")
+        self.aim = aim
+        self.islands = islands
+        self.migration_interval = max(1, migration_interval)
+        self.migrants = migrants
+        self.topology = topology
+        self.replacement = replacement
+        self.seed = seed
+        self.generation_kwargs = generation_kwargs
+        self.poll_interval = poll_interval
+        self.island_results = {}
+        self.island_stats = {}
+
+    def run(self):
+        """
+        并行运行所有岛屿，返回全局最优个体 (best_fitness, best_chromosome, best_courier_info)；
+        各岛屿的最优个体保存在 self.island_results，逐代统计（GenerationStats）保存在 self.island_stats
+        """
+        generations = self.generation_kwargs.get("generation", 50)
+        kwargs = dict(self.generation_kwargs)
+        kwargs.pop("generation", None)
+        topology_seed = self.seed if self.seed is not None else int(np.random.default_rng().integers(1 << 31))
+
+        inboxes = [mp.Queue() for _ in range(self.islands)]
+        results = mp.Queue()
+        processes = []
+        for i in range(self.islands):
+            seed = None if self.seed is None else self.seed + i
+            p = mp.Process(target=_island_worker,
+                           args=(i, self.islands, self.aim, kwargs, seed, generations, self.migration_interval,
+                                 self.migrants, self.topology, self.replacement, topology_seed, inboxes, results))
+            p.start()
+            processes.append(p)
+        try:
+            self.island_results, self.island_stats = self._collect(results, processes)
+        finally:
+            for p in processes:
+                if p.is_alive():
+                    p.terminate()
+                p.join()
+        finalists = [best for best in self.island_results.values() if best is not None]
+        return max(finalists, key=lambda kk: kk[0])
+
+    def _collect(self, results, processes):
+        """
+        收集各岛屿的 (最优个体, 逐代统计)；岛屿出错时在主进程重新抛出其异常，
+        进程未放入结果就退出（被杀死、崩溃）时抛出 RuntimeError
+        """
+        outcomes = {}
+        stats = {}
+        aborted = None
+        while len(outcomes) < len(processes):
+            try:
+                island_id, outcome, island_stats = results.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # 进程退出前会把队列中的数据写完，再取一次以免与超时竞争
+                try:
+                    island_id, outcome, island_stats = results.get_nowait()
+                except queue.Empty:
+                    dead = [i for i, p in enumerate(processes) if i not in outcomes and not p.is_alive()]
+                    if dead:
+                        i = dead[0]
+                        raise RuntimeError(f"island {i} exited without a result "
+                                           f"(exitcode={processes[i].exitcode})") from aborted
+                    continue
+            if isinstance(outcome, MigrationAborted):
+                # 只是被其他岛屿的错误牵连，继续等待真正出错岛屿的异常
+                aborted = outcome
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            outcomes[island_id] = outcome
+            stats[island_id] = island_stats
+        if aborted is not None:
+            raise aborted
+        return outcomes, stats
+
 if __name__ == '__main__':
     # 示例 aim 函数，返回三元组 (fitness, route, courier_spots)
     def example_aim(pop):
@@ -327,3 +839,23 @@ if __name__ == '__main__':
     )
     best_result = g.geneEvolve()
     print(best_result)
+
+    # 批量模式示例：aim 接收整个种群数组，返回 (fitness 向量, 附加信息列表)
+    def example_batch_aim(pop_array):
+        N = (pop_array.shape[1] - 1) // 3
+        permutation = pop_array[:, 1:1+N]
+        fitness = (permutation**2).sum(axis=1) + pop_array[:, 0]
+        payloads = [{"courier": int(row[0]), "permutation": row[1:1+N].tolist()} for row in pop_array]
+        return fitness, payloads
+
+    g = Generation(
+        example_batch_aim,
+        groupnum=10,
+        generation=5,
+        var_num=chromo_length,
+        var_minrange=[1],
+        var_maxrange=[10],
+        decodemap={},
+        batch=True
+    )
+    print(g.geneEvolve())
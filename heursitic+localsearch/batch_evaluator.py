@@ -0,0 +1,138 @@
+import numpy as np
+from data_structures import StopTable
+from helper_functions import travel_time
+from travel_matrix import haversine_matrix
+
+# ================== Batch Route Evaluation ==================
+# Scores many candidate stop sequences over the rows of one StopTable in a single NumPy pass,
+# with the rules of solution.recalc_route_times: the first stop is left at time 0, a courier
+# waits until `earliest`, and capacity, O2O precedence, time windows and the shift are penalized.
+#
+# With T_k the cumulative travel time and c_k the cumulative service time up to stop k,
+#   arrival_k = max(arrival_{k-1} + service_{k-1} + travel_k, earliest_k)
+# unrolls to arrival_k = T_k + c_{k-1} + A_k with A_k = max_{m<=k}(earliest_m - T_m - c_{m-1}),
+# i.e. one cumulative sum per quantity and one np.maximum.accumulate.
+
+PAD = -1  # fills candidate rows after their last stop
+
+SHOP = StopTable.KINDS.index("shop")
+DELIVERY = StopTable.KINDS.index("delivery")
+
+
+def stop_travel_times(table, travel_times=None):
+    """
+    Dense travel times (minutes) between the rows of a StopTable: a block of the
+    travel_matrix.TravelTimes when every stop has a loc_idx, Haversine otherwise.
+    """
+    if travel_times is not None and len(table) and (table.loc_idx >= 0).all():
+        return travel_times.submatrix(table.loc_idx)
+    lat = np.array([stop.lat for stop in table.stops], dtype=np.float64)
+    lng = np.array([stop.lng for stop in table.stops], dtype=np.float64)
+    return travel_time(haversine_matrix(lat, lng, lat, lng))
+
+
+class BatchEvaluator:
+    """
+    Schedules of candidate sequences over one StopTable. A batch is a 2D int array whose rows
+    are sequences of table rows, each right-padded with PAD; rows may have different lengths.
+    """
+    def __init__(self, table, travel, max_capacity=140, max_work_minutes=720):
+        """travel: (n, n) travel times between table rows, e.g. from stop_travel_times()."""
+        self.table = table
+        self.travel = np.asarray(travel, dtype=np.float64)
+        self.max_capacity = max_capacity
+        self.max_work_minutes = max_work_minutes
+
+    def _columns(self, sequences):
+        sequences = np.atleast_2d(np.asarray(sequences, dtype=np.int64))
+        valid = sequences != PAD
+        rows = np.where(valid, sequences, 0)
+        return sequences, valid, rows
+
+    def schedule(self, sequences):
+        """
+        Returns: (arrival, departure, load) arrays shaped like `sequences`; load is the O2O
+        load after each stop. At padded positions arrival and departure both equal the last
+        stop's departure, and load stays at its value after the last stop.
+        """
+        _, valid, rows = self._columns(sequences)
+        table = self.table
+        legs = np.zeros(rows.shape)
+        legs[:, 1:] = np.where(valid[:, 1:], self.travel[rows[:, :-1], rows[:, 1:]], 0.0)
+        service = np.where(valid, table.service[rows], 0.0)
+        earliest = np.where(valid, table.earliest[rows], -np.inf)
+        # The first stop (the site) is left at time 0
+        service[:, 0] = 0.0
+        earliest[:, 0] = 0.0
+
+        cum_travel = np.cumsum(legs, axis=1)
+        service_before = np.cumsum(service, axis=1) - service
+        wait = np.maximum.accumulate(earliest - cum_travel - service_before, axis=1)
+        arrival = cum_travel + service_before + wait
+        departure = arrival + service
+        load = np.cumsum(np.where(valid, table.load_delta[rows], 0), axis=1)
+        return arrival, departure, load
+
+    def evaluate(self, sequences):
+        """
+        Score every candidate like recalc_route_times.
+        Returns: (total_time, feasible, penalty) arrays with one entry per candidate.
+        """
+        _, valid, rows = self._columns(sequences)
+        arrival, departure, load = self.schedule(sequences)
+        kind = np.where(valid, self.table.kind[rows], 0)
+
+        over = np.where(kind == SHOP, np.maximum(load - self.max_capacity, 0), 0)
+        negative = (kind == DELIVERY) & (load < 0)
+        late = np.maximum(arrival - self.table.latest[rows], 0.0)
+        late[:, 0] = 0.0
+        late[~valid] = 0.0
+        total_time = departure[:, -1]
+        overtime = np.maximum(total_time - self.max_work_minutes, 0.0)
+
+        penalty = (over.sum(axis=1) * 100 + negative.sum(axis=1) * 1000 +
+                   late.sum(axis=1) * 50 + overtime * 100)
+        feasible = ~((over > 0).any(axis=1) | negative.any(axis=1) | (late > 0).any(axis=1) | (overtime > 0))
+        return total_time, feasible, penalty
+
+
+def pad_sequences(sequences):
+    """Stack sequences of different lengths into one PAD-filled batch."""
+    width = max((len(seq) for seq in sequences), default=0)
+    batch = np.full((len(sequences), width), PAD, dtype=np.int64)
+    for r, seq in enumerate(sequences):
+        batch[r, :len(seq)] = seq
+    return batch
+
+# ================== Batch 2-opt Moves ==================
+
+def reversal_moves(order, table):
+    """
+    All 2-opt moves of the sequence `order` (table rows) that keep every O2O pickup before its
+    delivery: pairs (i, j), 1 <= i < j <= len(order) - 2, reversing order[i..j].
+    Returns: (i, j) arrays in scan order (i, then j).
+    """
+    n = len(order)
+    if n < 4:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    position = np.full(len(table), -1, dtype=np.int64)
+    position[order] = np.arange(n)
+    # pickup_pos[k]: position of the pickup of the delivery at position k, -1 if none
+    partner = table.pair[order]
+    partner_pos = position[np.maximum(partner, 0)]
+    pickup_pos = np.where((table.kind[order] == DELIVERY) & (partner >= 0) & (partner_pos < np.arange(n)),
+                          partner_pos, -1)
+    # A reversal [i, j] is blocked once it contains a delivery whose pickup lies at or after i
+    starts = np.arange(n)[:, None]
+    contains_pair = np.triu(pickup_pos[None, :] >= starts)
+    blocked = np.logical_or.accumulate(contains_pair, axis=1)
+    i, j = np.nonzero(np.triu(~blocked, k=1))
+    keep = (i >= 1) & (j <= n - 2)
+    return i[keep], j[keep]
+
+def reversed_sequences(order, i, j):
+    """Batch of `order` with order[i[r]..j[r]] reversed in row r."""
+    k = np.arange(len(order))[None, :]
+    i, j = i[:, None], j[:, None]
+    inside = (k >= i) & (k <= j)
+    return np.asarray(order)[np.where(inside, i + j - k, k)]
@@ -1,30 +1,229 @@
-from sklearn.cluster import KMeans
-import matplotlib.pyplot as plt
+import math
+import os
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
-def cluster_stops(stops, n_clusters=20, random_state=42, save_map=False):
-    delivery_stops = [stop for stop in stops if stop.stop_type in ("ecommerce_delivery", "delivery")]
+def _delivery_stops(stops):
+    return [stop for stop in stops if stop.stop_type in ("ecommerce_delivery", "delivery")]
 
-    coords = [(stop.lat, stop.lng) for stop in delivery_stops]
-    kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
-    labels = kmeans.fit_predict(coords)
+def cluster_stops(stops, n_clusters=20, random_state=42, save_map=False, order_index=None,
+                  method="kmeans", max_stops=None, max_packages=None, init_centers=None, batch_size=1024):
+    """
+    Cluster the delivery stops among `stops` by location and set their cluster_id.
+    method: "kmeans" (plain KMeans), "minibatch" (MiniBatchKMeans, for large order sets) or
+            "balanced" (recursive bisection into clusters of about equal workload, see
+            balanced_partition; uses max_stops / max_packages).
+    init_centers: (k, 2) array of (lat, lng) centers, e.g. from load_centroids(), to warm start
+                  KMeans/MiniBatchKMeans with a single initialization; k replaces n_clusters.
+    With an order_index (order_index.OrderIndex), the pickup of each O2O delivery gets the
+    cluster of its delivery, so both halves of an order are solved together.
+    Returns: (stops, model) where model has cluster_centers_ (lat, lng), labels_ and predict().
+    """
+    delivery_stops = _delivery_stops(stops)
 
+    coords = np.array([(stop.lat, stop.lng) for stop in delivery_stops], dtype=np.float64).reshape(-1, 2)
+    if init_centers is not None:
+        init_centers = np.asarray(init_centers, dtype=np.float64)
+        n_clusters = len(init_centers)
+        init = dict(init=init_centers, n_init=1)
+    else:
+        init = {}
+    if method == "kmeans":
+        model = KMeans(n_clusters=n_clusters, random_state=random_state, **init)
+        labels = model.fit_predict(coords)
+    elif method == "minibatch":
+        model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=batch_size, **init)
+        labels = model.fit_predict(coords)
+    elif method == "balanced":
+        # Workload of a delivery counts its pickup too
+        n_stops = np.array([1 + (order_index is not None and order_index.pickup_of(stop) is not None)
+                            for stop in delivery_stops], dtype=np.float64)
+        packages = np.array([stop.packages for stop in delivery_stops], dtype=np.float64)
+        model = balanced_partition(coords, n_stops, packages, n_clusters, max_stops, max_packages)
+        labels = model.labels_
+    else:
+        raise ValueError("method must be 'kmeans', 'minibatch' or 'balanced'")
+
+    _set_clusters(delivery_stops, labels, order_index)
+
+    if save_map:
+        _plot_clusters(delivery_stops, labels, model.cluster_centers_)
+
+    return stops, model
+
+
+def _set_clusters(delivery_stops, labels, order_index=None):
     # Attach cluster ID to each delivery stop
     for stop, label in zip(delivery_stops, labels):
         stop.cluster_id = label
+    if order_index is not None:
+        for stop in delivery_stops:
+            pickup = order_index.pickup_of(stop)
+            if pickup is not None:
+                pickup.cluster_id = stop.cluster_id
 
-    if save_map:
-        _plot_clusters(delivery_stops, labels, kmeans.cluster_centers_)
+# ================== Incremental Assignment and Persisted Centroids ==================
+
+def assign_stops(stops, model, order_index=None, update=False):
+    """
+    Give new delivery stops the cluster of the nearest existing center (model.predict),
+    without refitting. With update=True a MiniBatchKMeans model first moves its centers
+    towards the new stops (partial_fit), so the clustering follows a growing order set.
+    Returns the labels of the delivery stops among `stops`.
+    """
+    delivery_stops = _delivery_stops(stops)
+    if not delivery_stops:
+        return np.zeros(0, dtype=np.int64)
+    coords = np.array([(stop.lat, stop.lng) for stop in delivery_stops], dtype=np.float64)
+    if update:
+        if not hasattr(model, "partial_fit"):
+            raise ValueError("update=True needs a MiniBatchKMeans model")
+        model.partial_fit(coords)
+    labels = model.predict(coords)
+    _set_clusters(delivery_stops, labels, order_index)
+    return labels
+
+def save_centroids(model, path):
+    """Store the cluster centers (lat, lng) of a fitted model, e.g. for tomorrow's warm start."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.save(path, np.asarray(model.cluster_centers_, dtype=np.float64))
+
+def load_centroids(path):
+    """Cluster centers saved by save_centroids, or None if there are none yet."""
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+# ================== Balanced Partitioning ==================
+
+class Partition:
+    """Result of balanced_partition: labels_ per point and cluster_centers_ (mean lat, lng per cluster)."""
+    def __init__(self, coords, labels):
+        self.labels_ = labels
+        k = int(labels.max()) + 1 if len(labels) else 0
+        counts = np.bincount(labels, minlength=k)[:, None]
+        sums = np.zeros((k, 2))
+        np.add.at(sums, labels, coords)
+        self.cluster_centers_ = sums / np.maximum(counts, 1)
+
+    @property
+    def n_clusters(self):
+        return len(self.cluster_centers_)
+
+    def predict(self, coords):
+        """Nearest cluster center of each (lat, lng)."""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        d = ((coords[:, None, :] - self.cluster_centers_[None, :, :])**2).sum(axis=2)
+        return d.argmin(axis=1)
+
+
+def balanced_partition(coords, n_stops, packages, n_clusters, max_stops=None, max_packages=None):
+    """
+    Recursive coordinate bisection: a group that must become k clusters is cut across its
+    principal axis at the point where ⌊k/2⌋/k of its workload lies on one side, and both sides
+    are split further. The number of clusters is the largest of n_clusters and what max_stops
+    and max_packages require; a cluster still over a cap afterwards is bisected again.
+    Workload is the package count when max_packages is the tighter cap (packages.sum() /
+    max_packages above n_stops.sum() / max_stops, or no max_stops), otherwise the stop count.
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n_stops = np.asarray(n_stops, dtype=np.float64)
+    packages = np.asarray(packages, dtype=np.float64)
+    k = n_clusters
+    if max_stops:
+        k = max(k, math.ceil(n_stops.sum() / max_stops))
+    if max_packages:
+        k = max(k, math.ceil(packages.sum() / max_packages))
+    # Balance on whichever resource is tighter relative to its cap
+    if max_packages and (not max_stops or packages.sum() / max_packages > n_stops.sum() / max_stops):
+        weight = packages
+    else:
+        weight = n_stops
+
+    labels = np.zeros(len(coords), dtype=np.int64)
+    next_label = [0]
+
+    def over_cap(idx):
+        return ((max_stops and n_stops[idx].sum() > max_stops) or
+                (max_packages and packages[idx].sum() > max_packages))
+
+    def split(idx, parts):
+        if parts <= 1 or len(idx) <= 1:
+            if len(idx) > 1 and over_cap(idx):
+                return split(idx, 2)
+            labels[idx] = next_label[0]
+            next_label[0] += 1
+            return
+        left_parts = parts // 2
+        points = coords[idx]
+        centered = points - points.mean(axis=0)
+        # Principal axis (lat and lng are close enough to a square grid at city scale)
+        axis = np.linalg.svd(centered, full_matrices=False)[2][0] if len(idx) > 2 else np.array([1.0, 0.0])
+        order = np.argsort(centered @ axis, kind="stable")
+        cum = np.cumsum(weight[idx][order])
+        # The point whose weight reaches the target share still goes left
+        cut = int(np.searchsorted(cum, cum[-1] * left_parts / parts)) + 1
+        cut = min(max(cut, 1), len(idx) - 1)
+        split(idx[order[:cut]], left_parts)
+        split(idx[order[cut:]], parts - left_parts)
+
+    if len(coords):
+        split(np.arange(len(coords)), k)
+    return Partition(coords, labels)
+
+
+def allocate_couriers(workloads, courier_ids):
+    """
+    Split courier_ids into consecutive blocks, one per cluster, sized in proportion to each
+    cluster's workload (largest remainder; every cluster gets at least one courier while
+    there are enough). workloads: dict cluster_id -> estimated workload.
+    Returns: dict cluster_id -> list of courier ids.
+    """
+    cluster_ids = sorted(workloads, key=lambda c: workloads[c], reverse=True)
+    n = len(courier_ids)
+    total = float(sum(workloads.values()))
+    if not cluster_ids:
+        return {}
+    if total <= 0:
+        shares = {c: n / len(cluster_ids) for c in cluster_ids}
+    else:
+        shares = {c: n * workloads[c] / total for c in cluster_ids}
+    counts = {c: int(shares[c]) for c in cluster_ids}
+    if n >= len(cluster_ids):
+        for c in cluster_ids:
+            counts[c] = max(counts[c], 1)
+    # Hand out (or take back) couriers by largest remainder
+    remaining = n - sum(counts.values())
+    by_remainder = sorted(cluster_ids, key=lambda c: shares[c] - int(shares[c]), reverse=True)
+    i = 0
+    while remaining > 0:
+        counts[by_remainder[i % len(by_remainder)]] += 1
+        remaining -= 1
+        i += 1
+    while remaining < 0:
+        # Take from the cluster with the most couriers per unit of workload
+        c = max((c for c in cluster_ids if counts[c] > 1), key=lambda c: counts[c] - shares[c])
+        counts[c] -= 1
+        remaining += 1
 
-    return stops, kmeans
+    allocation = {}
+    start = 0
+    for c in sorted(cluster_ids):
+        allocation[c] = list(courier_ids[start:start + counts[c]])
+        start += counts[c]
+    return allocation
 
 
 def _plot_clusters(stops, labels, centroids):
+    import matplotlib.pyplot as plt
     x = [stop.lng for stop in stops]
     y = [stop.lat for stop in stops]
     plt.figure(figsize=(10, 8))
     scatter = plt.scatter(x, y, c=labels, cmap="tab20", s=10)
     plt.scatter(centroids[:, 1], centroids[:, 0], c='black', marker='x', label="Centroids")
-    plt.title("K-Means Clustering of Delivery Stops")
+    plt.title("Clustering of Delivery Stops")
     plt.xlabel("Longitude")
     plt.ylabel("Latitude")
     plt.colorbar(scatter, label="Cluster ID")
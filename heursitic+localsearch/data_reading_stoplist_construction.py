@@ -1,6 +1,6 @@
 import pandas as pd
-from helper_functions import time_to_minutes
-from data_structures import Stop
+from instance import ProblemInstance
+from order_index import OrderIndex
 
 # ================== Data Reading and Stop List Construction ==================
 
@@ -22,54 +22,22 @@ def read_data():
     couriers = pd.read_csv("./Dataset/new_6.csv")
     return sites, spots, shops, ecommerce_orders, o2o_orders, couriers
 
-def build_stop_lists(sites, spots, shops, ecommerce_orders, o2o_orders):
+def build_stop_lists(sites, spots, shops, ecommerce_orders, o2o_orders, location_index=None):
     """
     Constructs stops for orders.
       - For e-commerce orders: create a delivery stop (assumes packages are preloaded at the site).
       - For O2O orders: create a pickup stop (from shop) and a delivery stop (to spot).
+    Each stop gets its loc_idx (row in the travel-time matrix); a location_index
+    (travel_matrix.LocationIndex), if given, must number the locations the same way.
+    The tables are compiled column-wise by instance.ProblemInstance; use ProblemInstance.load()
+    directly to skip parsing the CSVs on later runs.
     Returns two lists:
       - ecommerce_stops: list of Stop objects.
       - o2o_stop_pairs: list of tuples (pickup_stop, delivery_stop).
     """
-    # Build lookup dictionaries
-    site_dict = {row['Site_id']: (row['Lat'], row['Lng']) for _, row in sites.iterrows()}
-    spot_dict = {row['Spot_id']: (row['Lat'], row['Lng']) for _, row in spots.iterrows()}
-    shop_dict = {row['Shop_id']: (row['Lat'], row['Lng']) for _, row in shops.iterrows()}
-    
-    ecommerce_stops = []
-    for _, row in ecommerce_orders.iterrows():
-        spot_id = row['Spot_id']
-        lat, lng = spot_dict[spot_id]
-        # Delivery must be done by 20:00 (720 minutes from 08:00)
-        stop = Stop(location_id=spot_id, lat=lat, lng=lng,
-                    stop_type="ecommerce_delivery",
-                    order_id=row['Order_id'],
-                    packages=row['Num'],
-                    earliest=0, latest=720)
-        ecommerce_stops.append(stop)
-    
-    o2o_stop_pairs = []
-    for _, row in o2o_orders.iterrows():
-        # Create pickup stop from shop
-        shop_id = row['Shop_id']
-        shop_lat, shop_lng = shop_dict[shop_id]
-        pickup = Stop(location_id=shop_id, lat=shop_lat, lng=shop_lng,
-                      stop_type="shop",
-                      order_id=row['Order_id'],
-                      packages=row['Num'],
-                      earliest=time_to_minutes(row['Pickup_time']),
-                      latest=720,  # pickup must occur before end of shift
-                      paired_order_id=row['Order_id'])
-        # Create delivery stop to spot
-        spot_id = row['Spot_id']
-        spot_lat, spot_lng = spot_dict[spot_id]
-        delivery = Stop(location_id=spot_id, lat=spot_lat, lng=spot_lng,
-                        stop_type="delivery",
-                        order_id=row['Order_id'],
-                        packages=row['Num'],
-                        earliest=0,
-                        latest=time_to_minutes(row['Delivery_time']),
-                        paired_order_id=row['Order_id'])
-        o2o_stop_pairs.append((pickup, delivery))
-    
-    return ecommerce_stops, o2o_stop_pairs
\ No newline at end of file
+    instance = ProblemInstance.from_tables(sites, spots, shops, ecommerce_orders, o2o_orders)
+    return instance.build_stops(location_index)
+
+def build_order_index(ecommerce_orders, ecommerce_stops, o2o_stop_pairs):
+    """OrderIndex (order id -> stops, site/shop -> orders) over the lists returned by build_stop_lists."""
+    return OrderIndex(ecommerce_stops, o2o_stop_pairs, ecommerce_orders['Site_id'].tolist())
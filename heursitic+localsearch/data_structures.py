@@ -1,13 +1,27 @@
+import numpy as np
+from helper_functions import service_time
+import instrumentation
+
 # ================== Data Structures ==================
 
 class Stop:
+    """
+    A stop is immutable once built and may be shared by any number of routes;
+    the schedule (arrival/departure) of a stop lives on the Route that visits it.
+    Only cluster_id is assigned after construction.
+    """
+    __slots__ = ("location_id", "lat", "lng", "stop_type", "order_id", "packages",
+                 "earliest", "latest", "paired_order_id", "loc_idx", "service", "load_delta",
+                 "cluster_id")
+
     def __init__(self, location_id, lat, lng, stop_type, order_id=None, packages=0,
-                 earliest=0, latest=24*60, paired_order_id=None):
+                 earliest=0, latest=24*60, paired_order_id=None, loc_idx=None):
         """
         stop_type: "site" for starting depot, "ecommerce_delivery" for e-commerce deliveries,
                    "shop" for O2O pickup, "delivery" for O2O delivery.
         earliest, latest: time window in minutes from 08:00.
         paired_order_id: used to link a shop pickup with its delivery.
+        loc_idx: integer id of the location in the travel-time matrix (see travel_matrix.LocationIndex).
         """
         self.location_id = location_id
         self.lat = lat
@@ -18,16 +32,100 @@ class Stop:
         self.earliest = earliest
         self.latest = latest
         self.paired_order_id = paired_order_id  # For O2O orders
-        self.arrival = None
-        self.departure = None
+        self.loc_idx = loc_idx
+        # Derived once: service time and change of the O2O load when the stop is served
+        self.service = service_time(packages) if stop_type in ("delivery", "ecommerce_delivery", "shop") else 0
+        if stop_type == "shop":
+            self.load_delta = packages
+        elif stop_type == "delivery":
+            self.load_delta = -packages
+        else:
+            self.load_delta = 0
         self.cluster_id = None
 
+
+class StopTable:
+    """
+    Struct-of-arrays view of a list of stops for NumPy consumers; row(stop) is its row.
+    Rows are kept in the table, never on the shared Stop objects, so tables over
+    overlapping stops (e.g. a depot shared by many routes) are independent.
+    Columns: loc_idx, kind (index into KINDS), packages, earliest, latest (inf if None),
+    service, load_delta and pair (row of the other half of an O2O order, -1 if none).
+    """
+    KINDS = ("site", "ecommerce_delivery", "shop", "delivery")
+
+    def __init__(self, stops, order_index=None):
+        """order_index: optional order_index.OrderIndex used to pair O2O stops."""
+        self.stops = list(stops)
+        self._rows = {}
+        for i, stop in enumerate(self.stops):
+            self._rows.setdefault(id(stop), i)
+        n = len(self.stops)
+        self.loc_idx = np.fromiter((-1 if s.loc_idx is None else s.loc_idx for s in self.stops), dtype=np.int64, count=n)
+        self.kind = np.fromiter((self.KINDS.index(s.stop_type) for s in self.stops), dtype=np.int8, count=n)
+        self.packages = np.fromiter((s.packages for s in self.stops), dtype=np.int64, count=n)
+        self.earliest = np.fromiter((s.earliest for s in self.stops), dtype=np.float64, count=n)
+        self.latest = np.fromiter((np.inf if s.latest is None else s.latest for s in self.stops), dtype=np.float64, count=n)
+        self.service = np.fromiter((s.service for s in self.stops), dtype=np.float64, count=n)
+        self.load_delta = np.fromiter((s.load_delta for s in self.stops), dtype=np.int64, count=n)
+        self.pair = np.full(n, -1, dtype=np.int64)
+        if order_index is not None:
+            pickup_of = order_index.pickup_of
+        else:
+            pickups = {stop.order_id: stop for stop in self.stops if stop.stop_type == "shop"}
+            pickup_of = lambda stop: pickups.get(stop.order_id)
+        for i, stop in enumerate(self.stops):
+            if stop.stop_type == "delivery":
+                pickup = pickup_of(stop)
+                # The pickup must be a row of this table
+                j = self._rows.get(id(pickup)) if pickup is not None else None
+                if j is not None:
+                    self.pair[i] = j
+                    self.pair[j] = i
+
+    def __len__(self):
+        return len(self.stops)
+
+    def row(self, stop):
+        """Row of `stop` (the first one if it is listed more than once); KeyError if absent."""
+        return self._rows[id(stop)]
+
+    def indices(self, route):
+        """Stop rows visited by `route`, in order."""
+        rows = self._rows
+        return np.fromiter((rows[id(stop)] for stop in route.stops), dtype=np.int64, count=len(route.stops))
+
+
 class Route:
+    """
+    A courier's stop sequence. stops holds references to shared, immutable Stop objects;
+    arrival[k]/departure[k] hold the schedule of stops[k], so copying a route never copies stops.
+    """
     def __init__(self, courier_id, start_stop):
         self.courier_id = courier_id
         self.stops = [start_stop]  # initial depot (site)
-    
+        self.arrival = [0]
+        self.departure = [0]
+        # Cached forward schedule state up to the last stop (kept in sync by
+        # solution.recalc_route_times and solution.append_stops).
+        self.load = 0
+        self.penalty = 0
+        self.feasible = True
+
+    def copy(self):
+        """Independent copy of the sequence and schedule; the Stop objects are shared."""
+        instrumentation.count("route_copies")
+        new_route = Route.__new__(Route)
+        new_route.courier_id = self.courier_id
+        new_route.stops = list(self.stops)
+        new_route.arrival = list(self.arrival)
+        new_route.departure = list(self.departure)
+        new_route.load = self.load
+        new_route.penalty = self.penalty
+        new_route.feasible = self.feasible
+        return new_route
+
     def total_time(self):
-        if self.stops and self.stops[-1].departure is not None:
-            return self.stops[-1].departure
-        return 0
\ No newline at end of file
+        if self.departure:
+            return self.departure[-1]
+        return 0
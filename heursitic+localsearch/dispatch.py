@@ -0,0 +1,223 @@
+import argparse
+import bisect
+import json
+import random
+import time
+import numpy as np
+
+from data_structures import Stop
+from instance import ProblemInstance
+from solution import (initial_solution, leg_time, recalc_route_times, save_schedule_to_csv, set_travel_times,
+                      RouteSchedule, IMPROVEMENT_EPS, _with_stops)
+from spatial_index import TailGrid
+from travel_matrix import TravelTimes
+
+# ================== Online Dispatch ==================
+# O2O orders arrive during the shift. The engine keeps the live routes and their RouteSchedule
+# in memory, advances a simulated clock and inserts each new order into the part of a route
+# the courier has not started yet, scored by RouteSchedule.splice (no re-solving).
+
+class DispatchEngine:
+    """
+    Event-driven insertion of O2O orders into live routes.
+    At clock time `now` a courier has left the stops whose departure <= now and is on the way to
+    the next one, which is therefore fixed; an order can be inserted after it. A courier who has
+    left or finished all their stops waits at the last one and sets off at `now`.
+    Candidates come from a grid over all route stops: the couriers with one of the k stops nearest
+    to the pickup, tried at positions next to those stops and next to the stops nearest to the
+    delivery; only if none is feasible are all couriers tried at the end of their routes.
+    """
+    def __init__(self, routes, k=30):
+        """routes: dict courier_id -> Route, timed (e.g. from initial_solution)."""
+        self.routes = dict(routes)
+        self.schedules = {courier_id: RouteSchedule(route.stops) for courier_id, route in self.routes.items()}
+        self.k = k
+        self.now = 0.0
+        self.grid = TailGrid()  # keys (courier_id, serial number), see _index
+        self.grid_stop = {}  # grid key -> stop
+        self.position = {}  # (courier_id, stop) -> position in the route
+        for courier_id in self.routes:
+            self._index(courier_id)
+        self.assigned = {}  # order_id -> courier_id
+        self.rejected = []
+        self.fallbacks = 0
+
+    def _index(self, courier_id):
+        for pos, stop in enumerate(self.routes[courier_id].stops):
+            key = (courier_id, stop)
+            if key not in self.position:
+                # Stops cannot be compared, so the grid gets sortable keys of its own
+                grid_key = (courier_id, len(self.grid_stop))
+                self.grid_stop[grid_key] = stop
+                self.grid.update(grid_key, stop.lat, stop.lng)
+            self.position[key] = pos
+
+    def advance(self, now):
+        """Move the simulated clock (minutes from 08:00) forward to `now`."""
+        if now < self.now:
+            raise ValueError(f"clock cannot go back from {self.now} to {now}")
+        self.now = now
+
+    def _first_open(self, courier_id):
+        """
+        (q, idle): orders may be inserted after position q or later; idle if the courier
+        has left every stop of the route and waits at the last one.
+        """
+        departed = bisect.bisect_right(self.routes[courier_id].departure, self.now) - 1
+        last = len(self.routes[courier_id].stops) - 1
+        if departed >= last:
+            return last, True
+        return departed + 1, False
+
+    def _from_idle(self, courier_id, pickup):
+        """The pickup for a courier who leaves their last stop at `now`: not reachable before now + travel."""
+        last = self.routes[courier_id].stops[-1]
+        earliest = max(pickup.earliest, self.now + leg_time(last, pickup))
+        return Stop(location_id=pickup.location_id, lat=pickup.lat, lng=pickup.lng, stop_type=pickup.stop_type,
+                    order_id=pickup.order_id, packages=pickup.packages, earliest=earliest, latest=pickup.latest,
+                    paired_order_id=pickup.paired_order_id, loc_idx=pickup.loc_idx)
+
+    def _candidates(self, pickup, delivery):
+        """courier_id -> (pickup positions, delivery positions) of nearby stops."""
+        near = {}
+        for key in self.grid.nearest(pickup.lat, pickup.lng, self.k):
+            courier_id = key[0]
+            near.setdefault(courier_id, (set(), set()))[0].add(self.position[(courier_id, self.grid_stop[key])])
+        for key in self.grid.nearest(delivery.lat, delivery.lng, self.k):
+            courier_id = key[0]
+            if courier_id in near:
+                near[courier_id][1].add(self.position[(courier_id, self.grid_stop[key])])
+        return near
+
+    def _best_insertion(self, courier_id, pickup, delivery, pickup_pos=(), delivery_pos=()):
+        """Cheapest feasible (increase, q1, q2, middle) for the order on this courier, or None."""
+        sched = self.schedules[courier_id]
+        stops = sched.stops
+        last = len(stops) - 1
+        first, idle = self._first_open(courier_id)
+        if idle:
+            options = [(last, last, self._from_idle(courier_id, pickup))]
+        else:
+            q1s = {last} | {max(q, first) for p in pickup_pos for q in (p - 1, p)}
+            options = []
+            for q1 in sorted(q1s):
+                q2s = {q1, last} | {max(q, q1) for p in delivery_pos for q in (p - 1, p)}
+                options.extend((q1, q2, pickup) for q2 in sorted(q2s))
+        cost = self.routes[courier_id].total_time()
+        best = None
+        for q1, q2, pickup_stop in options:
+            middle = [pickup_stop] + stops[q1+1:q2+1] + [delivery]
+            ok, total = sched.splice(q1, middle, q2 + 1)
+            if ok and (best is None or total - cost < best[0] - IMPROVEMENT_EPS):
+                best = (total - cost, q1, q2, middle)
+        return best
+
+    def submit(self, pickup, delivery, release=None):
+        """
+        Insert a new O2O order (its pickup and delivery Stops), known from time `release`
+        (default: now), into the route where it adds the least time.
+        Returns the courier id, or None if no courier can serve it in time.
+        """
+        if release is not None:
+            self.advance(release)
+        best = None
+        for courier_id, (pickup_pos, delivery_pos) in self._candidates(pickup, delivery).items():
+            found = self._best_insertion(courier_id, pickup, delivery, pickup_pos, delivery_pos)
+            if found is not None and (best is None or found[0] < best[1][0]):
+                best = (courier_id, found)
+        if best is None:
+            self.fallbacks += 1
+            for courier_id in self.routes:
+                found = self._best_insertion(courier_id, pickup, delivery)
+                if found is not None and (best is None or found[0] < best[1][0]):
+                    best = (courier_id, found)
+        if best is None:
+            self.rejected.append(delivery.order_id)
+            return None
+        courier_id, (_, q1, q2, middle) = best
+        stops = self.schedules[courier_id].stops
+        new_stops = stops[:q1+1] + middle + stops[q2+1:]
+        self.routes[courier_id] = _with_stops(self.routes[courier_id], new_stops)
+        self.schedules[courier_id] = RouteSchedule(new_stops)
+        self._index(courier_id)
+        self.assigned[delivery.order_id] = courier_id
+        return courier_id
+
+    def replay(self, o2o_stop_pairs, lead=0):
+        """
+        Feed orders in order of pickup time; each becomes known `lead` minutes before its pickup
+        time (never before 08:00). Returns latency (per order, in ms) and throughput statistics.
+        """
+        events = sorted(o2o_stop_pairs, key=lambda pair: pair[0].earliest)
+        latencies = []
+        start = time.perf_counter()
+        for pickup, delivery in events:
+            t0 = time.perf_counter()
+            self.submit(pickup, delivery, release=max(self.now, pickup.earliest - lead))
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - start
+        latencies = np.asarray(latencies)
+        results = [recalc_route_times(route) for route in self.routes.values()]
+        return {
+            "orders": len(events),
+            "assigned": len(events) - len(self.rejected),
+            "rejected": len(self.rejected),
+            "fallbacks": self.fallbacks,
+            "seconds": elapsed,
+            "orders_per_second": len(events) / elapsed if elapsed > 0 else None,
+            "latency_ms": {name: float(np.percentile(latencies, q)) if len(latencies) else None
+                           for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+            "total_time": sum(r[0] for r in results),
+            "infeasible_routes": sum(not r[1] for r in results),
+        }
+
+    @classmethod
+    def from_instance(cls, instance, travel_times, seed=42, k=30, candidate_k=20):
+        """
+        Plan the e-commerce orders (known at 08:00) with initial_solution over all couriers and
+        return the engine with the instance's O2O (pickup, delivery) pairs, still unassigned.
+        """
+        random.seed(seed)
+        np.random.seed(seed)  # sites.sample() draws from NumPy's global generator
+        sites, _, _, _, _, couriers = instance.tables()
+        set_travel_times(travel_times)
+        ecommerce_stops, o2o_stop_pairs = instance.build_stops(travel_times.index)
+        routes = initial_solution(sites, ecommerce_stops, [], couriers, candidate_k=candidate_k)
+        return cls(routes, k), o2o_stop_pairs
+
+# ================== Run Script ==================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the O2O orders of ./Dataset/new_5.csv as a stream "
+                                                 "into routes planned for the e-commerce orders")
+    parser.add_argument("--lead", type=float, default=0, help="minutes before its pickup time an order becomes known")
+    parser.add_argument("--candidates", type=int, default=30, help="nearest route stops searched per order")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--lazy-matrix", action="store_true", help="compute travel times on demand instead of caching the full matrix")
+    parser.add_argument("--json", help="write the replay statistics to this file")
+    parser.add_argument("--schedule", help="save the final routes as a schedule CSV")
+    args = parser.parse_args(argv)
+
+    instance = ProblemInstance.load()
+    location_index = instance.location_index()
+    travel_times = TravelTimes.lazy(location_index) if args.lazy_matrix else TravelTimes.cached(location_index)
+    engine, o2o_stop_pairs = DispatchEngine.from_instance(instance, travel_times, args.seed, args.candidates)
+    print(f"✅ E-commerce routes planned; replaying {len(o2o_stop_pairs)} O2O orders.")
+
+    stats = engine.replay(o2o_stop_pairs, lead=args.lead)
+    latency = stats["latency_ms"]
+    print(f"✅ {stats['assigned']}/{stats['orders']} orders assigned ({stats['rejected']} rejected, "
+          f"{stats['fallbacks']} needed the full scan) in {stats['seconds']:.2f} s "
+          f"({stats['orders_per_second']:.0f} orders/s)")
+    print(f"   Latency per order: p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, "
+          f"p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+    print(f"✅ Total time for all routes: {stats['total_time']:.2f} minutes")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stats, f, indent=2)
+    if args.schedule:
+        save_schedule_to_csv(engine.routes, args.schedule)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,302 +1,410 @@
-    
-import pandas as pd
-import numpy as np
-
-sub_df = pd.read_csv("heuristic+localsearch_schedule.csv", names=["Courier_id", "Addr", "Arrival_time", "Departure", "Amount", "Order_id"])
-
-SPEED = 15*1000.0/60
-site_df = pd.read_csv("eval/1.csv")
-spot_df = pd.read_csv("eval/2.csv")
-shop_df = pd.read_csv("eval/3.csv")
-ds_order_df = pd.read_csv("eval/4.csv")
-o2o_order_df = pd.read_csv("eval/5.csv")
-courier_df = pd.read_csv("eval/6.csv")
-node_lng_dict = {}
-node_lat_dict = {}
-for i, e in site_df.iterrows():
-    node_lng_dict[e.Site_id] = e.Lng
-    node_lat_dict[e.Site_id] = e.Lat
-
-for i, e in spot_df.iterrows():
-    node_lng_dict[e.Spot_id] = e.Lng
-    node_lat_dict[e.Spot_id] = e.Lat
-
-for i, e in shop_df.iterrows():
-    node_lng_dict[e.Shop_id] = e.Lng
-    node_lat_dict[e.Shop_id] = e.Lat
-
-def time2min(time):
-    ts = pd.to_datetime(time, format="%H:%M")
-    return ts.hour*60+ts.minute-480
-
-def cal_distance(node1, node2):
-    global node_lng_dict, node_lat_dict
-    lng1 = node_lng_dict[node1]
-    lat1 = node_lat_dict[node1]
-    lng2 = node_lng_dict[node2]
-    lat2 = node_lat_dict[node2]
-    R = 6378137.0
-    d_lat = (lat1-lat2)/2.0
-    d_lng = (lng1-lng2)/2.0
-    S = 2*R*np.arcsin(np.sqrt(np.power(np.sin(np.pi/180*d_lat),2)+np.cos(np.pi/180*lat1)*np.cos(np.pi/180*lat2)*np.power(np.sin(np.pi/180*d_lng),2)))
-    return S
-
-def cal_cost(node1, node2):
-    global SPEED
-    return np.round(cal_distance(node1, node2)/SPEED)
-
-def cal_proctime(x):
-    return np.round(3*np.sqrt(x)+5)
-
-arranges = []
-for i in range(1, 1001):
-    arrange = sub_df[sub_df.Courier_id==("D%04d"%i)]
-    if len(arrange)==0:
-        continue
-    arranges.append(arrange)
-
-def verify2(arrange):
-    departure = arrange.iloc[0].Departure
-    for i in range(1, len(arrange)):
-        arrival_time = arrange.iloc[i].Arrival_time
-        if arrival_time < departure:
-            return False
-        departure = arrange.iloc[i].Departure
-    return True
-
-def verify3(arrange):
-    for i in range(0, len(arrange)):
-        arrival_time = arrange.iloc[i].Arrival_time
-        departure = arrange.iloc[i].Departure
-        if departure < arrival_time:
-            return False
-    return True
-
-def verify9(arrange, ds_order_df, o2o_order_df):
-    # use the example to verify cal functions
-    #mix_path = ["A083","A083","A083","A083","A083","B5800","B7555","B7182","B8307","B8461","A083","A083","A083","B6528","S245","B3266","B3266","B2337","A083","A083","A083","A083","S294","B1940","B6104","B8926","B9072","B6103"]
-    #orders = ["F6344","F6360","F6358","F6353","F6354","F6344","F6354","F6353","F6358","F6360","F6349","F6325","F6314","F6349","E0895","E0895","F6325","F6314","F6366","F6345","F6346","F6308","E1088","F6308","F6346","E1088","F6366","F6345"]   
-    mix_path = arrange.Addr.tolist()
-    orders = arrange.Order_id.tolist()
-    mix_arrange_df = pd.DataFrame({ "Addr": mix_path, "Order_id": orders})
-    mix_arrange_df["Courier_id"] = arrange.iloc[0].Courier_id
-    mix_arrange_df["Arrival_time"] = arrange.iloc[0].Arrival_time
-    mix_arrange_df["Departure"] = arrange.iloc[0].Departure
-    mix_arrange_df["Amount"] = 0
-    pre_e = mix_arrange_df.iloc[0]
-    pre_addr = pre_e.Addr
-    pre_order = pre_e.Order_id
-    pre_departure = arrange.iloc[0].Departure
-    pre_departure = float(pre_departure)  # Ensure it's a number
-
-    if 'F' in pre_order:
-        amount = ds_order_df[ds_order_df["Order_id"]==pre_order].Num.values[0]
-    elif 'E' in pre_order:
-        amount = o2o_order_df[o2o_order_df["Order_id"]==pre_order].Num.values[0]
-    new_mix_arrange_df = pd.DataFrame({"Courier_id": [arrange.iloc[0].Courier_id], "Addr": [pre_addr], "Arrival_time": [arrange.iloc[0].Arrival_time], "Departure": [arrange.iloc[0].Departure], "Amount": [amount],  "Order_id": [pre_order]})
-    for i in range(1, len(mix_arrange_df)):
-        cur_e = mix_arrange_df.iloc[i]
-        cur_addr = cur_e.Addr
-        cur_order = cur_e.Order_id
-        if 'A' in cur_addr:
-            arrival_time = pre_departure + cal_cost(pre_addr, cur_addr)
-            amount = ds_order_df[ds_order_df["Order_id"]==cur_order].Num.values[0]
-            departure = arrival_time
-        elif 'B' in cur_addr and 'F' in cur_order:
-            arrival_time = pre_departure + cal_cost(pre_addr, cur_addr)
-            amount = -ds_order_df[ds_order_df["Order_id"]==cur_order].Num.values[0]
-            departure = arrival_time + cal_proctime(abs(amount))
-        elif 'B' in cur_addr and 'E' in cur_order:
-            arrival_time = pre_departure + cal_cost(pre_addr, cur_addr)
-            amount = -o2o_order_df[o2o_order_df["Order_id"]==cur_order].Num.values[0]
-            departure = arrival_time + cal_proctime(abs(amount))
-        elif 'S' in cur_addr:
-            arrival_time = pre_departure + cal_cost(pre_addr, cur_addr)
-            amount = o2o_order_df[o2o_order_df["Order_id"]==cur_order].Num.values[0]
-            departure = max(time2min(o2o_order_df[o2o_order_df["Order_id"]==cur_order].Pickup_time.values[0]), arrival_time)
-        new_row = pd.DataFrame({"Courier_id": [arrange.iloc[0].Courier_id], "Addr": [cur_addr], "Arrival_time": [arrival_time], "Departure": [departure], "Amount": [amount],  "Order_id": [cur_order]})
-        new_mix_arrange_df = pd.concat([new_mix_arrange_df, new_row], ignore_index=True)
-        cmp_e = arrange.iloc[i]
-        if cur_addr != cmp_e.Addr or amount != cmp_e.Amount or arrival_time != cmp_e.Arrival_time or departure != cmp_e.Departure:
-            # print("arrange {}".format(i))
-            return False
-        pre_addr = cur_addr
-        pre_departure = departure
-    return True
-
-
-def verify_v5(sub_df, o2o_order_df, ds_order_df):
-    sub_df_sort = sub_df.sort_values(["Order_id", "Departure"], ascending=[1, 1])
-    for i in range(0, len(o2o_order_df)*2, 2):
-        shop_id = sub_df_sort.iloc[i].Addr
-        shop_amount = sub_df_sort.iloc[i].Amount
-        spot_id = sub_df_sort.iloc[i+1].Addr
-        spot_amount = sub_df_sort.iloc[i+1].Amount
-        if shop_id != o2o_order_df.iloc[i//2].Shop_id:
-            print("o2o shop_id {}".format(i))
-            return False
-        if spot_id != o2o_order_df.iloc[i//2].Spot_id:
-            print("o2o spot_id {}".format(i))
-            return False
-        if shop_amount != o2o_order_df.iloc[i//2].Num:
-            print("o2o shop_amount {}".format(i))
-            return False
-        if spot_amount != -o2o_order_df.iloc[i//2].Num:
-            print("o2o spot_amount {}".format(i))
-            return False
-    for i in range(len(o2o_order_df)*2, len(o2o_order_df)*2+len(ds_order_df)*2, 2):
-        site_id = sub_df_sort.iloc[i].Addr
-        site_amount = sub_df_sort.iloc[i].Amount
-        spot_id = sub_df_sort.iloc[i+1].Addr
-        spot_amount = sub_df_sort.iloc[i+1].Amount
-        if site_id != ds_order_df.iloc[i//2-len(o2o_order_df)].Site_id:
-            print("ds site_id {}".format(i))
-            return False
-        if spot_id != ds_order_df.iloc[i//2-len(o2o_order_df)].Spot_id:
-            print("ds spot_id {}".format(i))
-            return False
-        if site_amount != ds_order_df.iloc[i//2-len(o2o_order_df)].Num:
-            print("ds site_amount {}".format(i))
-            return False
-        if spot_amount != -ds_order_df.iloc[i//2-len(o2o_order_df)].Num:
-            print("ds spot_amount {}".format(i))
-            return False
-    return True
-
-def verify_v6(sub_df, o2o_order_df):
-    sub_df_sort = sub_df.sort_values(["Order_id", "Departure"], ascending=[1, 1])
-    for i in range(0, len(o2o_order_df)*2, 2):
-        shop_departure = sub_df_sort.iloc[i].Departure
-        # Convert shop_departure to int if it's a string
-        if isinstance(shop_departure, str):
-            try:
-                shop_departure = int(shop_departure)
-            except ValueError:
-                print(f"Warning: Could not convert shop_departure '{shop_departure}' to integer")
-                return False
-        
-        pickup_time = o2o_order_df.iloc[i//2].Pickup_time
-        pickup_min = time2min(pickup_time)
-        
-        if shop_departure < pickup_min:
-            print("shop_departure {}".format(i))
-            return False
-    return True
-
-def verify_v7(sub_df, o2o_order_df, ds_order_df):
-    sub_df_sort = sub_df.sort_values(["Order_id", "Departure"], ascending=[1, 1])
-    for i in range(0, len(o2o_order_df) * 2, 2):
-        if i + 1 >= len(sub_df_sort):  # Boundary check
-            break
-        shop_num = sub_df_sort.iloc[i].Amount
-        spot_num = sub_df_sort.iloc[i + 1].Amount
-        if shop_num + spot_num != 0:
-            print("shop_num {}".format(i))
-            return False
-
-    for i in range(len(o2o_order_df) * 2, len(o2o_order_df) * 2 + len(ds_order_df) * 2, 2):
-        if i + 1 >= len(sub_df_sort):  # Boundary check
-            break
-        site_num = sub_df_sort.iloc[i].Amount
-        spot_num = sub_df_sort.iloc[i + 1].Amount
-        if site_num + spot_num != 0:
-            print("site_num {}".format(i))
-            return False
-
-    return True
-
-
-
-def verify_v8(sub_df, o2o_order_df, ds_order_df):
-    sub_orders = sub_df.Order_id.drop_duplicates().sort_values().tolist()
-    raw_orders = o2o_order_df.Order_id.tolist() + ds_order_df.Order_id.tolist()
-    return sub_orders == raw_orders
-
-def verify_v10(sub_df):
-    sub_amounts = sub_df.Amount.tolist()
-    sub_total_amounts = pd.Series(np.cumsum(sub_amounts))
-    return len(sub_total_amounts[sub_total_amounts>140]) == 0
-
-def verify_v11(sub_df):
-    sub_df_sort = sub_df.sort_values(["Order_id", "Departure"], ascending=[1, 1])
-    for i in range(0, len(sub_df_sort) - 1, 2):  # Prevents accessing out-of-bounds index
-
-        pick_addr = sub_df_sort.iloc[i].Addr
-        send_addr = sub_df_sort.iloc[i+1].Addr
-        if ('S' not in pick_addr) and ('A' not in pick_addr):
-            return False
-        if ('B' not in send_addr):
-            return False
-    return True
-
-# Make sure all numeric columns are properly converted to numbers
-# This will help prevent type comparison issues
-numeric_cols = ['Arrival_time', 'Departure', 'Amount']
-for col in numeric_cols:
-    if col in sub_df.columns:
-        sub_df[col] = pd.to_numeric(sub_df[col], errors='coerce')
-
-v2 = np.array(list(map(lambda arrange: verify2(arrange), arranges)))
-if len(v2[v2==False])==0:
-    print("pass v2")
-else:
-    print("V2 FAILED")
-
-v3 = np.array(list(map(lambda arrange: verify3(arrange), arranges)))
-if len(v3[v3==False])==0:
-    print("pass v3")
-else:
-    print("V3 FAILED")
-
-if len(sub_df.Order_id) == 2*(len(ds_order_df)+len(o2o_order_df)) and len(sub_df.Order_id.drop_duplicates()) == len(ds_order_df)+len(o2o_order_df):
-    print("pass v4")
-else:
-    print("V4 FAILED")
-
-if verify_v5(sub_df, o2o_order_df, ds_order_df) == True:
-    print("pass v5")
-else:
-    print("V5 FAILED")
-
-if verify_v6(sub_df, o2o_order_df) == True:
-    print("pass v6")
-else:
-    print("V6 FAILED")
-
-if verify_v7(sub_df, o2o_order_df, ds_order_df) == True:
-    print("pass v7")
-else:
-    print("V7 FAILED")
-
-if verify_v8(sub_df, o2o_order_df, ds_order_df) == True:
-    print("pass v8")
-else:
-    print("V8 FAILED")
-
-v9 = np.array(list(map(lambda arrange: verify9(arrange, ds_order_df, o2o_order_df), arranges)))
-if len(v9[v9==False])==0:
-    print("pass v9")
-else:
-    print("V9 FAILED")
-
-if verify_v10(sub_df) == True:
-    print("pass v10")
-else:
-    print("V10 FAILED")
-
-if verify_v11(sub_df) == True:
-    print("pass v11")
-else:
-    print("V11 FAILED")
-    
-sub_df["Departure"] = pd.to_numeric(sub_df["Departure"], errors='coerce')
-result = sum(
-    float(arrange.iloc[-1].Departure) 
-    for arrange in arranges 
-    if not pd.isna(arrange.iloc[-1].Departure)
-)
-
-
-# total costs
-# result = sum(list(map(lambda arrange: arrange.iloc[-1].Departure, arranges)))
-print(result)
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+SPEED = 15*1000.0/60
+CAPACITY = 140
+EVAL_FILES = ["1.csv", "2.csv", "3.csv", "4.csv", "5.csv", "6.csv"]
+SCHEDULE_COLUMNS = ["Courier_id", "Addr", "Arrival_time", "Departure", "Amount", "Order_id"]
+# Header names of solution.save_schedule_to_csv -> SCHEDULE_COLUMNS (its Stop_Type column is not read)
+SOLVER_COLUMNS = {"Location_id": "Addr", "Departure_time": "Departure"}
+VIOLATION_COLUMNS = ["rule", "courier_id", "order_id", "row", "detail"]
+
+# Rule id -> what a violation of it means
+RULES = {
+    "v2": "arrival before the previous departure of the same courier",
+    "v3": "departure before arrival",
+    "v4": "order does not appear exactly twice",
+    "v5": "pickup/delivery address or amount differs from the order",
+    "v6": "O2O pickup leaves before the order's pickup time",
+    "v7": "pickup and delivery amounts do not cancel",
+    "v8": "order missing from the schedule or not in the instance",
+    "v9": "arrival, departure or amount differs from the recomputed schedule",
+    "v10": f"cumulative amount exceeds {CAPACITY}",
+    "v11": "pickup not at a site/shop or delivery not at a spot",
+}
+
+# ================== Instance ==================
+
+def time2min(time):
+    """"HH:MM" -> minutes from 08:00; accepts a single string or a Series."""
+    if isinstance(time, pd.Series):
+        parts = time.astype(str).str.split(":", expand=True).astype(int)
+        return parts[0]*60+parts[1]-480
+    ts = pd.to_datetime(time, format="%H:%M")
+    return ts.hour*60+ts.minute-480
+
+def cal_proctime(x):
+    return np.round(3*np.sqrt(x)+5)
+
+class EvalInstance:
+    """
+    The six instance tables plus the array lookups used by the checks:
+    node_index maps location ids to rows of node_lng/node_lat, order_index maps
+    order ids to rows of the per-order arrays (o2o orders first, then ds orders).
+    """
+    def __init__(self, site_df, spot_df, shop_df, ds_order_df, o2o_order_df, courier_df):
+        self.site_df = site_df
+        self.spot_df = spot_df
+        self.shop_df = shop_df
+        self.ds_order_df = ds_order_df
+        self.o2o_order_df = o2o_order_df
+        self.courier_df = courier_df
+
+        self.node_index = pd.Index(pd.concat([site_df.Site_id, spot_df.Spot_id, shop_df.Shop_id], ignore_index=True))
+        self.node_lng = np.concatenate([site_df.Lng.to_numpy(float), spot_df.Lng.to_numpy(float), shop_df.Lng.to_numpy(float)])
+        self.node_lat = np.concatenate([site_df.Lat.to_numpy(float), spot_df.Lat.to_numpy(float), shop_df.Lat.to_numpy(float)])
+
+        n_o2o = len(o2o_order_df)
+        self.order_index = pd.Index(pd.concat([o2o_order_df.Order_id, ds_order_df.Order_id], ignore_index=True))
+        self.order_num = np.concatenate([o2o_order_df.Num.to_numpy(float), ds_order_df.Num.to_numpy(float)])
+        self.order_is_o2o = np.arange(len(self.order_index)) < n_o2o
+        self.order_pick_addr = np.concatenate([o2o_order_df.Shop_id.astype(str).to_numpy(object), ds_order_df.Site_id.astype(str).to_numpy(object)])
+        self.order_send_addr = np.concatenate([o2o_order_df.Spot_id.astype(str).to_numpy(object), ds_order_df.Spot_id.astype(str).to_numpy(object)])
+        self.order_pickup_min = np.concatenate([time2min(o2o_order_df.Pickup_time).to_numpy(float), np.full(len(ds_order_df), np.nan)])
+
+        self.courier_ids = pd.Index(courier_df.Courier_id.astype(str).str.strip())
+
+    def distance(self, idx1, idx2):
+        """Haversine distance in meters between node rows (arrays)."""
+        lng1, lat1 = self.node_lng[idx1], self.node_lat[idx1]
+        lng2, lat2 = self.node_lng[idx2], self.node_lat[idx2]
+        R = 6378137.0
+        d_lat = (lat1-lat2)/2.0
+        d_lng = (lng1-lng2)/2.0
+        S = 2*R*np.arcsin(np.sqrt(np.power(np.sin(np.pi/180*d_lat),2)+np.cos(np.pi/180*lat1)*np.cos(np.pi/180*lat2)*np.power(np.sin(np.pi/180*d_lng),2)))
+        return S
+
+    def cost(self, idx1, idx2):
+        return np.round(self.distance(idx1, idx2)/SPEED)
+
+def load_instance(data_dir="eval", files=EVAL_FILES):
+    """Read the six instance CSVs (sites, spots, shops, ds orders, o2o orders, couriers)."""
+    tables = [pd.read_csv(os.path.join(data_dir, name)) for name in files]
+    return EvalInstance(*tables)
+
+def read_schedule(path):
+    """
+    Read a schedule CSV. Without a header row the columns are SCHEDULE_COLUMNS in order; with
+    one they are picked by name, so the solver's save_schedule_to_csv output reads as well.
+    """
+    with open(path, encoding="utf-8") as f:
+        first = f.readline().split(",")
+    if first[0].strip() != "Courier_id":
+        return pd.read_csv(path, names=SCHEDULE_COLUMNS)
+    schedule_df = pd.read_csv(path).rename(columns=SOLVER_COLUMNS)
+    missing = [col for col in SCHEDULE_COLUMNS if col not in schedule_df.columns]
+    if missing:
+        raise ValueError(f"schedule {path} has no column {', '.join(missing)}")
+    return schedule_df[SCHEDULE_COLUMNS]
+
+# ================== Checks ==================
+
+def _violations(rule, mask, courier_id, order_id, row, detail):
+    """
+    Violation rows at the positions where mask is True; detail is a string or a per-position
+    _describe(), which is formatted for those positions only.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    n = int(mask.sum())
+    if not isinstance(detail, str):
+        fmt, columns = detail
+        detail = [fmt.format(*values) for values in zip(*(np.asarray(column)[mask] for column in columns))]
+    return pd.DataFrame({
+        "rule": rule,
+        "courier_id": np.full(n, None, dtype=object) if courier_id is None else np.asarray(courier_id, dtype=object)[mask],
+        "order_id": np.asarray(order_id, dtype=object)[mask],
+        "row": np.asarray(row, dtype=np.int64)[mask],
+        "detail": np.full(n, detail, dtype=object) if isinstance(detail, str) else np.asarray(detail, dtype=object),
+    })
+
+def _concat(frames):
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+def _describe(fmt, *columns):
+    """Per-position detail for _violations: fmt filled from the columns, formatted lazily."""
+    return fmt, columns
+
+def courier_checks(arrange_df, instance):
+    """
+    v2, v3 and v9 on rows grouped by courier (consecutive rows of a courier in route order).
+    v9 recomputes every row from the previous row's given departure, so each wrong row is
+    reported on its own rather than only the first one of a route.
+    """
+    courier = arrange_df.Courier_id.to_numpy(object)
+    order = arrange_df.Order_id.fillna("").astype(str)
+    row = arrange_df.row.to_numpy()
+    arrival = arrange_df.Arrival_time.to_numpy(float)
+    departure = arrange_df.Departure.to_numpy(float)
+    amount = arrange_df.Amount.to_numpy(float)
+    same_courier = np.zeros(len(arrange_df), dtype=bool)
+    same_courier[1:] = courier[1:] == courier[:-1]
+    prev_departure = np.concatenate([[np.nan], departure[:-1]])
+
+    v2 = same_courier & (arrival < prev_departure)
+    v3 = departure < arrival
+
+    addr = arrange_df.Addr.astype(str)
+    cur_idx = instance.node_index.get_indexer(addr)
+    prev_idx = np.concatenate([[-1], cur_idx[:-1]])
+    known = (prev_idx >= 0) & (cur_idx >= 0)
+    travel = np.full(len(addr), np.nan)
+    travel[known] = instance.cost(prev_idx[known], cur_idx[known])
+    expected_arrival = prev_departure + travel
+
+    order_pos = instance.order_index.get_indexer(order)
+    found = order_pos >= 0
+    pos = np.maximum(order_pos, 0)
+    num = np.where(found, instance.order_num[pos], np.nan)
+    pickup = np.where(found, instance.order_pickup_min[pos], np.nan)
+    is_o2o = found & instance.order_is_o2o[pos]
+    is_ds = found & ~is_o2o
+    is_site = addr.str.contains("A", regex=False).to_numpy()
+    is_spot = addr.str.contains("B", regex=False).to_numpy()
+    is_shop = addr.str.contains("S", regex=False).to_numpy()
+
+    conditions = [is_site & is_ds, is_spot & is_ds, is_spot & is_o2o, is_shop & is_o2o]
+    expected_amount = np.select(conditions, [num, -num, -num, num], np.nan)
+    expected_departure = np.select(conditions, [expected_arrival,
+                                                expected_arrival + cal_proctime(np.abs(expected_amount)),
+                                                expected_arrival + cal_proctime(np.abs(expected_amount)),
+                                                np.fmax(pickup, expected_arrival)], np.nan)
+    v9 = same_courier & ((expected_amount != amount) | (expected_arrival != arrival) | (expected_departure != departure))
+
+    order = order.to_numpy(object)
+    return _concat([
+        _violations("v2", v2, courier, order, row, _describe("previous departure {}", prev_departure)),
+        _violations("v3", v3, courier, order, row, _describe("arrival {} departure {}", arrival, departure)),
+        _violations("v9", v9, courier, order, row, _describe("expected arrival {} departure {} amount {}",
+                                                              expected_arrival, expected_departure, expected_amount)),
+    ])
+
+def order_checks(schedule_df, instance):
+    """v4-v8 and v11 per order; the earlier (by departure) of an order's rows is its pickup."""
+    order = schedule_df.Order_id.fillna("").astype(str).to_numpy(object)
+    sort_idx = np.lexsort((schedule_df.Departure.to_numpy(float), order))
+    s_order = order[sort_idx]
+    s_courier = schedule_df.Courier_id.to_numpy(object)[sort_idx]
+    s_addr = schedule_df.Addr.astype(str).to_numpy(object)[sort_idx]
+    s_amount = schedule_df.Amount.to_numpy(float)[sort_idx]
+    s_departure = schedule_df.Departure.to_numpy(float)[sort_idx]
+
+    first = np.ones(len(s_order), dtype=bool)
+    first[1:] = s_order[1:] != s_order[:-1]
+    starts = np.flatnonzero(first)
+    counts = np.diff(np.append(starts, len(s_order)))
+    orders = s_order[starts]
+    order_pos = instance.order_index.get_indexer(orders)
+    known = order_pos >= 0
+    present = np.zeros(len(instance.order_index), dtype=bool)
+    present[order_pos[known]] = True
+    missing = instance.order_index.to_numpy(object)[~present]
+    all_missing = np.ones(len(missing), dtype=bool)
+    no_row = np.full(len(missing), -1)
+
+    frames = [
+        # v4: exactly two rows per order
+        _violations("v4", counts != 2, s_courier[starts], orders, sort_idx[starts], _describe("{} rows", counts)),
+        _violations("v4", all_missing, None, missing, no_row, "0 rows"),
+        # v8: same order set as the instance
+        _violations("v8", all_missing, None, missing, no_row, "missing from the schedule"),
+        _violations("v8", ~known, s_courier[starts], orders, sort_idx[starts], "not in the instance"),
+    ]
+
+    # Pickup/delivery pairs of instance orders with at least two rows
+    paired = known & (counts >= 2)
+    p = starts[paired]
+    pos = order_pos[paired]
+    pair_orders = orders[paired]
+    pair_courier = s_courier[p]
+    pair_row = sort_idx[p]
+    pick_addr, send_addr = s_addr[p], s_addr[p+1]
+    pick_amount, send_amount = s_amount[p], s_amount[p+1]
+    num = instance.order_num[pos]
+    o2o = instance.order_is_o2o[pos]
+    kind = np.where(o2o, "o2o", "ds")
+    pickup = instance.order_pickup_min[pos]
+
+    # v5: addresses and amounts match the order
+    for field, fail in [("pickup address", pick_addr != instance.order_pick_addr[pos]),
+                        ("delivery address", send_addr != instance.order_send_addr[pos]),
+                        ("pickup amount", pick_amount != num),
+                        ("delivery amount", send_amount != -num)]:
+        frames.append(_violations("v5", fail, pair_courier, pair_orders, pair_row, _describe("{} " + field, kind)))
+    # v6: O2O pickups leave no earlier than the pickup time
+    frames.append(_violations("v6", o2o & (s_departure[p] < pickup), pair_courier, pair_orders, pair_row,
+                              _describe("departure {} pickup time {}", s_departure[p], pickup)))
+    # v7: amounts cancel
+    frames.append(_violations("v7", pick_amount + send_amount != 0, pair_courier, pair_orders, pair_row,
+                              _describe("{} + {}", pick_amount, send_amount)))
+    # v11: pickup at a site/shop, delivery at a spot
+    pick_ok = np.array([("S" in a) or ("A" in a) for a in pick_addr], dtype=bool)
+    send_ok = np.array(["B" in a for a in send_addr], dtype=bool)
+    frames.append(_violations("v11", ~(pick_ok & send_ok), pair_courier, pair_orders, pair_row,
+                              _describe("{} -> {}", pick_addr, send_addr)))
+    return _concat(frames)
+
+def capacity_check(schedule_df):
+    """v10: running total of Amount over the schedule in file order."""
+    total = np.cumsum(schedule_df.Amount.to_numpy(float))
+    return _violations("v10", total > CAPACITY, schedule_df.Courier_id.to_numpy(object),
+                       schedule_df.Order_id.to_numpy(object), np.arange(len(schedule_df)),
+                       _describe("cumulative amount {}", total))
+
+# ================== Validation ==================
+
+class ValidationReport:
+    """
+    Result of validate(): violations holds one row per violation (rule, courier_id,
+    order_id, row of the schedule or -1, detail); cost is the sum of every courier's
+    last departure; unknown_couriers counts rows whose courier is not in the instance.
+    """
+    def __init__(self, violations, cost, unknown_couriers=0):
+        rank = violations.rule.map(list(RULES).index)
+        self.violations = violations.iloc[np.lexsort((violations.row.to_numpy(), rank.to_numpy()))].reset_index(drop=True)
+        self.cost = cost
+        self.unknown_couriers = unknown_couriers
+
+    @property
+    def passed(self):
+        return len(self.violations) == 0 and self.unknown_couriers == 0
+
+    def counts(self):
+        """Number of violations per rule."""
+        counts = self.violations.rule.value_counts()
+        return {rule: int(counts.get(rule, 0)) for rule in RULES}
+
+    def by_courier(self):
+        """Number of violations per courier (violations not tied to a courier are left out)."""
+        return self.violations.dropna(subset=["courier_id"]).groupby("courier_id").size()
+
+    def summary(self):
+        """pass/FAILED line per rule followed by the total cost."""
+        lines = ["pass {}".format(rule) if n == 0 else "{} FAILED ({})".format(rule.upper(), n)
+                 for rule, n in self.counts().items()]
+        if self.unknown_couriers:
+            lines.append("{} rows of unknown couriers".format(self.unknown_couriers))
+        lines.append(str(self.cost))
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "passed": self.passed,
+            "cost": self.cost,
+            "unknown_courier_rows": self.unknown_couriers,
+            "counts": self.counts(),
+            "violations": [
+                {"rule": v.rule, "courier_id": v.courier_id, "order_id": None if pd.isna(v.order_id) else str(v.order_id),
+                 "row": int(v.row), "detail": v.detail}
+                for v in self.violations.itertuples(index=False)
+            ],
+        }
+
+_worker_instance = None
+
+def _init_worker(instance):
+    global _worker_instance
+    _worker_instance = instance
+
+def _courier_checks_worker(arrange_df):
+    return courier_checks(arrange_df, _worker_instance)
+
+def _make_pool(instance, workers):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(instance,))
+
+def _courier_chunks(arrange_df, n_chunks):
+    """Split rows grouped by courier into at most n_chunks pieces without splitting a courier."""
+    courier = arrange_df.Courier_id.to_numpy(object)
+    starts = np.flatnonzero(np.concatenate([[True], courier[1:] != courier[:-1]])) if len(courier) else np.zeros(0, dtype=int)
+    bounds = [g[0] for g in np.array_split(starts, n_chunks) if len(g)] + [len(arrange_df)]
+    return [arrange_df.iloc[bounds[i]:bounds[i+1]] for i in range(len(bounds) - 1)]
+
+def _prepare(schedule_df, instance):
+    """Numeric columns as floats; rows of known couriers grouped by courier in file order."""
+    schedule_df = schedule_df.reset_index(drop=True).copy()
+    for col in ["Arrival_time", "Departure", "Amount"]:
+        schedule_df[col] = pd.to_numeric(schedule_df[col], errors="coerce")
+    schedule_df["Courier_id"] = schedule_df.Courier_id.astype(str).str.strip()
+    schedule_df["row"] = np.arange(len(schedule_df))
+    rank = instance.courier_ids.get_indexer(schedule_df.Courier_id)
+    arrange_df = schedule_df[rank >= 0].assign(courier_rank=rank[rank >= 0])
+    arrange_df = arrange_df.sort_values("courier_rank", kind="stable").reset_index(drop=True)
+    return schedule_df, arrange_df, int((rank < 0).sum())
+
+def validate(schedule_df, instance, workers=1, pool=None):
+    """
+    Check a schedule (columns as SCHEDULE_COLUMNS) against an EvalInstance and return a
+    ValidationReport listing every violation. The per-courier checks (v2, v3, v9) are split
+    by courier across `workers` processes; pass `pool` (see validate_many) to reuse one.
+    """
+    schedule_df, arrange_df, unknown = _prepare(schedule_df, instance)
+    if workers > 1:
+        own_pool = pool is None
+        if own_pool:
+            pool = _make_pool(instance, workers)
+        try:
+            futures = [pool.submit(_courier_checks_worker, chunk) for chunk in _courier_chunks(arrange_df, 4 * workers)]
+            frames = [future.result() for future in futures]
+        finally:
+            if own_pool:
+                pool.shutdown()
+    else:
+        frames = [courier_checks(arrange_df, instance)]
+    frames.append(order_checks(schedule_df, instance))
+    frames.append(capacity_check(schedule_df))
+
+    last_departure = arrange_df.drop_duplicates("Courier_id", keep="last").Departure
+    cost = float(last_departure.dropna().sum())
+    return ValidationReport(_concat(frames), cost, unknown)
+
+def validate_many(schedules, instance, workers=1):
+    """
+    Validate several schedules (DataFrames or CSV paths) with one shared process pool.
+    Returns the ValidationReports in input order.
+    """
+    pool = _make_pool(instance, workers) if workers > 1 else None
+    try:
+        reports = []
+        for schedule in schedules:
+            schedule_df = schedule if isinstance(schedule, pd.DataFrame) else read_schedule(schedule)
+            reports.append(validate(schedule_df, instance, workers=workers, pool=pool))
+        return reports
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+# ================== CLI ==================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate schedules against an instance and report their total cost")
+    parser.add_argument("schedules", nargs="*", default=["heuristic+localsearch_schedule.csv"], help="schedule CSV files")
+    parser.add_argument("--eval-dir", default="eval", help="directory holding the instance files 1.csv .. 6.csv")
+    parser.add_argument("--workers", type=int, default=1, help="processes running the per-courier checks")
+    parser.add_argument("--json", help="write every report, with all violations, to this file")
+    parser.add_argument("--verbose", action="store_true", help="print every violation")
+    args = parser.parse_args(argv)
+
+    instance = load_instance(args.eval_dir)
+    reports = validate_many(args.schedules, instance, workers=args.workers)
+    for path, report in zip(args.schedules, reports):
+        if len(args.schedules) > 1:
+            print("== {}".format(path))
+        print(report.summary())
+        if args.verbose and len(report.violations):
+            print(report.violations.to_string(index=False))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({path: report.to_dict() for path, report in zip(args.schedules, reports)}, f, indent=2)
+    return 0 if all(report.passed for report in reports) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+import numpy as np
+from tqdm import tqdm
+from helper_functions import travel_time
+from travel_matrix import haversine_matrix
+from solution import RouteSchedule, IMPROVEMENT_EPS, _expired, _with_stops
+import instrumentation
+
+# ================== Neighbor Lists ==================
+
+def neighbor_lists(stops, k=20, travel_times=None, block=512):
+    """
+    The k nearest other stops of every stop (rows of an (n, k) array, nearest first), by the
+    travel_matrix.TravelTimes when every stop has a loc_idx, by Haversine otherwise.
+    Distances are computed `block` rows at a time, so memory stays O(block * n).
+    """
+    n = len(stops)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64)
+    loc_idx = [stop.loc_idx for stop in stops]
+    use_matrix = travel_times is not None and all(loc is not None for loc in loc_idx)
+    if use_matrix:
+        loc_idx = np.asarray(loc_idx, dtype=np.int64)
+        travel_times.prefetch(loc_idx.tolist())
+    else:
+        lat = np.array([stop.lat for stop in stops], dtype=np.float64)
+        lng = np.array([stop.lng for stop in stops], dtype=np.float64)
+
+    neighbors = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        if use_matrix:
+            dist = np.stack([np.asarray(travel_times.row(loc), dtype=np.float64)[loc_idx]
+                             for loc in loc_idx[rows].tolist()])
+        else:
+            dist = travel_time(haversine_matrix(lat[rows], lng[rows], lat, lng))
+        dist[np.arange(len(rows)), rows] = np.inf  # a stop is not its own neighbor
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(dist, nearest, axis=1), axis=1, kind="stable")
+        neighbors[rows] = np.take_along_axis(nearest, order, axis=1)
+    return neighbors
+
+# ================== Granular Local Search ==================
+
+class GranularSearch:
+    """
+    Inter- and intra-route local search restricted to arcs between nearby stops (granular
+    neighborhoods): a stop u is only moved next to one of its k nearest neighbors v.
+      - relocate: move the order of u (both stops of an O2O order) into another route, next to v
+      - exchange: swap the e-commerce stops u and the successor/predecessor of v between two routes
+      - 2-opt*:   cut two routes after u and before v and swap their tails (u is followed by v);
+                  cuts are only made where no O2O order is on board
+      - Or-opt:   move a segment of 1-3 stops starting at u next to v within its route
+    Every move is scored by delta evaluation on the RouteSchedule of each route
+    (splice/join), so only the changed part of a route is timed and nothing is copied until
+    a move is applied. Only moves that keep all routes feasible and lower the total route
+    time are applied.
+    """
+    OR_OPT_LENGTHS = (1, 2, 3)
+
+    def __init__(self, routes, k=20, travel_times=None, order_index=None):
+        """
+        routes: dict courier_id -> Route (timed, e.g. by local_search).
+        order_index: optional order_index.OrderIndex used to pair O2O stops.
+        """
+        self.routes = dict(routes)
+        self.schedules = {courier_id: RouteSchedule(route.stops) for courier_id, route in self.routes.items()}
+        self.stops = [stop for route in self.routes.values() for stop in route.stops[1:]]
+        self.row = {stop: r for r, stop in enumerate(self.stops)}
+        self.neighbors = [[self.stops[v] for v in row] for row in neighbor_lists(self.stops, k, travel_times).tolist()]
+        if order_index is not None:
+            pickup_of = order_index.pickup_of
+        else:
+            pickups = {stop.order_id: stop for stop in self.stops if stop.stop_type == "shop"}
+            pickup_of = lambda stop: pickups.get(stop.order_id)
+        # Stops that move together: (stop,) for e-commerce orders, (pickup, delivery) for O2O orders
+        self.unit = {}
+        for stop in self.stops:
+            if stop.stop_type == "delivery":
+                pickup = pickup_of(stop)
+                if pickup is not None and pickup in self.row:
+                    self.unit[pickup] = self.unit[stop] = (pickup, stop)
+            self.unit.setdefault(stop, (stop,))
+        self.position = {}
+        for courier_id in self.routes:
+            self._index(courier_id)
+        self.evaluated = self.accepted = 0
+
+    def _index(self, courier_id):
+        for pos, stop in enumerate(self.routes[courier_id].stops):
+            if pos:
+                self.position[stop] = (courier_id, pos)
+
+    def _cost(self, courier_id):
+        route = self.routes[courier_id]
+        return route.total_time() + route.penalty
+
+    def _apply(self, changes):
+        """changes: dict courier_id -> new stop list."""
+        for courier_id, stops in changes.items():
+            self.routes[courier_id] = _with_stops(self.routes[courier_id], stops)
+            self.schedules[courier_id] = RouteSchedule(stops)
+            self._index(courier_id)
+        self.accepted += 1
+
+    def _near(self, stop):
+        """(neighbor, courier_id, position) of the neighbors of `stop`."""
+        for v in self.neighbors[self.row[stop]]:
+            courier_id, pos = self.position[v]
+            yield v, courier_id, pos
+
+    # ---------- Moves: each returns (delta, changes) of its best improving move, or None ----------
+
+    def relocate(self, u):
+        unit = self.unit[u]
+        if u is not unit[0]:
+            return None  # an O2O order is handled from its pickup
+        a, p = self.position[unit[0]]
+        sched_a = self.schedules[a]
+        stops_a = sched_a.stops
+        if len(unit) == 1:
+            ok, new_a = sched_a.splice(p - 1, [], p + 1)
+        else:
+            d = self.position[unit[1]][1]
+            ok, new_a = sched_a.splice(p - 1, stops_a[p+1:d], d + 1)
+        if not ok:
+            return None
+        gain_a = self._cost(a) - new_a
+        best = None
+        for _, b, q in self._near(u):
+            if b == a:
+                continue
+            sched_b = self.schedules[b]
+            stops_b = sched_b.stops
+            cost_b = self._cost(b)
+            for q1 in (q - 1, q):
+                if len(unit) == 1:
+                    candidates = [(q1, [u])]
+                else:
+                    # The delivery goes right after the pickup or next to one of its own neighbors
+                    q2s = {q1} | {q2 for _, c, w in self._near(unit[1]) if c == b for q2 in (w - 1, w) if q2 >= q1}
+                    candidates = [(q2, [unit[0]] + stops_b[q1+1:q2+1] + [unit[1]]) for q2 in sorted(q2s)]
+                for q2, middle in candidates:
+                    self.evaluated += 1
+                    ok, new_b = sched_b.splice(q1, middle, q2 + 1)
+                    if not ok:
+                        continue
+                    delta = new_b - cost_b - gain_a
+                    if delta < -IMPROVEMENT_EPS and (best is None or delta < best[0]):
+                        best = (delta, (b, q1, q2, middle))
+        if best is None:
+            return None
+        delta, (b, q1, q2, middle) = best
+        stops_b = self.schedules[b].stops
+        new_stops_a = [stop for stop in stops_a if stop not in unit]
+        return delta, {a: new_stops_a, b: stops_b[:q1+1] + middle + stops_b[q2+1:]}
+
+    def exchange(self, u):
+        if len(self.unit[u]) != 1:
+            return None
+        a, p = self.position[u]
+        sched_a = self.schedules[a]
+        cost_a = self._cost(a)
+        best = None
+        for _, b, q in self._near(u):
+            if b == a:
+                continue
+            sched_b = self.schedules[b]
+            for w_pos in (q - 1, q + 1):
+                if w_pos < 1 or w_pos >= len(sched_b.stops):
+                    continue
+                w = sched_b.stops[w_pos]
+                if len(self.unit[w]) != 1:
+                    continue
+                self.evaluated += 1
+                ok_a, new_a = sched_a.splice(p - 1, [w], p + 1)
+                if not ok_a:
+                    continue
+                ok_b, new_b = sched_b.splice(w_pos - 1, [u], w_pos + 1)
+                if not ok_b:
+                    continue
+                delta = new_a + new_b - cost_a - self._cost(b)
+                if delta < -IMPROVEMENT_EPS and (best is None or delta < best[0]):
+                    best = (delta, (b, w_pos, w))
+        if best is None:
+            return None
+        delta, (b, w_pos, w) = best
+        stops_a, stops_b = list(sched_a.stops), list(self.schedules[b].stops)
+        stops_a[p], stops_b[w_pos] = w, u
+        return delta, {a: stops_a, b: stops_b}
+
+    def two_opt_star(self, u):
+        a, p = self.position[u]
+        sched_a = self.schedules[a]
+        if sched_a.load[p] != 0:
+            return None  # an O2O order would be split between two couriers
+        cost_a = self._cost(a)
+        best = None
+        for _, b, q in self._near(u):
+            if b == a:
+                continue
+            sched_b = self.schedules[b]
+            if sched_b.load[q-1] != 0:
+                continue
+            self.evaluated += 1
+            ok_a, new_a = sched_a.join(p, sched_b, q)
+            if not ok_a:
+                continue
+            ok_b, new_b = sched_b.join(q - 1, sched_a, p + 1)
+            if not ok_b:
+                continue
+            delta = new_a + new_b - cost_a - self._cost(b)
+            if delta < -IMPROVEMENT_EPS and (best is None or delta < best[0]):
+                best = (delta, (b, q))
+        if best is None:
+            return None
+        delta, (b, q) = best
+        stops_a, stops_b = sched_a.stops, self.schedules[b].stops
+        return delta, {a: stops_a[:p+1] + stops_b[q:], b: stops_b[:q] + stops_a[p+1:]}
+
+    def or_opt(self, u):
+        a, p = self.position[u]
+        sched = self.schedules[a]
+        stops = sched.stops
+        n = len(stops)
+        cost_a = self._cost(a)
+        best = None
+        for length in self.OR_OPT_LENGTHS:
+            end = p + length - 1
+            if end >= n:
+                break
+            segment = stops[p:end+1]
+            for _, b, v_pos in self._near(u):
+                if b != a:
+                    continue
+                for q in (v_pos - 1, v_pos):
+                    if p - 1 <= q <= end:
+                        continue  # v inside the segment, or the segment would not move
+                    if q > end:
+                        # Forward: no pickup of the segment may have its delivery in stops[end+1..q]
+                        if any(end < sched.delivery_pos[k] <= q for k in range(p, end + 1)):
+                            continue
+                        middle = stops[end+1:q+1] + segment
+                        i, j = p - 1, q + 1
+                    else:
+                        # Backward: no delivery of the segment may have its pickup in stops[q+1..p-1]
+                        if any(q < sched.pickup_pos[k] < p for k in range(p, end + 1)):
+                            continue
+                        middle = segment + stops[q+1:p]
+                        i, j = q, end + 1
+                    self.evaluated += 1
+                    ok, new_a = sched.splice(i, middle, j)
+                    if not ok:
+                        continue
+                    delta = new_a - cost_a
+                    if delta < -IMPROVEMENT_EPS and (best is None or delta < best[0]):
+                        best = (delta, (i, middle, j))
+        if best is None:
+            return None
+        delta, (i, middle, j) = best
+        return delta, {a: stops[:i+1] + middle + stops[j:]}
+
+    # ---------- Driver ----------
+
+    def run(self, deadline=None, max_passes=None):
+        """
+        Apply the best improving move of each kind around every stop, pass after pass, until a
+        pass finds no improvement, max_passes is reached or the deadline (time.monotonic())
+        expires. Returns: dict courier_id -> Route.
+        """
+        moves = (self.relocate, self.exchange, self.two_opt_star, self.or_opt)
+        passes = 0
+        improved = True
+        while improved and not _expired(deadline) and (max_passes is None or passes < max_passes):
+            improved = False
+            passes += 1
+            for u in tqdm(self.stops, desc=f"Granular search pass {passes}"):
+                if _expired(deadline):
+                    break
+                for move in moves:
+                    found = move(u)
+                    if found is not None:
+                        self._apply(found[1])
+                        improved = True
+        instrumentation.count("moves_evaluated", self.evaluated)
+        instrumentation.count("moves_accepted", self.accepted)
+        return self.routes
+
+
+def granular_search(routes, k=20, travel_times=None, order_index=None, deadline=None, max_passes=None):
+    """Improve `routes` with GranularSearch (relocate, exchange, 2-opt*, Or-opt over k-nearest-neighbor lists)."""
+    return GranularSearch(routes, k, travel_times, order_index).run(deadline, max_passes)
@@ -0,0 +1,177 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from data_structures import Stop
+from order_index import OrderIndex
+from travel_matrix import LocationIndex, dataset_hash
+
+# ================== Problem Instance ==================
+
+DATASET_FILES = ("new_1.csv", "new_2.csv", "new_3.csv", "new_4.csv", "new_5.csv", "new_6.csv")
+SHIFT_END = 720  # 20:00 in minutes from 08:00
+
+def minutes_column(times):
+    """Vectorized helper_functions.time_to_minutes over a column of "HH:MM" strings."""
+    parts = pd.Series(times).astype(str).str.split(":", expand=True).astype(np.int64)
+    return (parts[0] * 60 + parts[1] - 8 * 60).to_numpy(dtype=np.int64)
+
+
+class ProblemInstance:
+    """
+    The six dataset tables compiled into flat NumPy arrays.
+    Locations are numbered sites first, then spots, then shops (the travel-matrix order, see
+    travel_matrix.build_location_index): location_ids, lat, lng.
+    E-commerce orders: ec_order_ids, ec_site, ec_spot (location numbers), ec_num.
+    O2O orders: o2o_order_ids, o2o_shop, o2o_spot, o2o_num, o2o_pickup, o2o_delivery (minutes
+    from 08:00); row k of the o2o arrays is one order, i.e. the pickup/delivery pairing.
+    """
+    ARRAYS = ("location_ids", "lat", "lng", "n_sites", "n_spots", "n_shops",
+              "ec_order_ids", "ec_site", "ec_spot", "ec_num",
+              "o2o_order_ids", "o2o_shop", "o2o_spot", "o2o_num", "o2o_pickup", "o2o_delivery",
+              "courier_ids")
+
+    def __init__(self, arrays, path=None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.path = path
+
+    @classmethod
+    def from_tables(cls, sites, spots, shops, ecommerce_orders, o2o_orders, couriers=None):
+        """Compile the instance from the DataFrames returned by read_data()."""
+        frames = [(sites, "Site_id"), (spots, "Spot_id"), (shops, "Shop_id")]
+        location_ids = np.concatenate([df[col].to_numpy(dtype=str) for df, col in frames])
+        n_sites, n_spots = len(sites), len(spots)
+        # Ids are looked up within their own table, so a spot and a shop may share an id.
+        site_pos = pd.Index(sites["Site_id"].astype(str))
+        spot_pos = pd.Index(spots["Spot_id"].astype(str))
+        shop_pos = pd.Index(shops["Shop_id"].astype(str))
+        arrays = {
+            "location_ids": location_ids,
+            "lat": np.concatenate([df["Lat"].to_numpy(dtype=np.float64) for df, _ in frames]),
+            "lng": np.concatenate([df["Lng"].to_numpy(dtype=np.float64) for df, _ in frames]),
+            "n_sites": np.int64(n_sites),
+            "n_spots": np.int64(n_spots),
+            "n_shops": np.int64(len(shops)),
+            "ec_order_ids": ecommerce_orders["Order_id"].to_numpy(dtype=str),
+            "ec_site": _lookup(site_pos, ecommerce_orders["Site_id"], "Site_id"),
+            "ec_spot": n_sites + _lookup(spot_pos, ecommerce_orders["Spot_id"], "Spot_id"),
+            "ec_num": ecommerce_orders["Num"].to_numpy(dtype=np.int64),
+            "o2o_order_ids": o2o_orders["Order_id"].to_numpy(dtype=str),
+            "o2o_shop": n_sites + n_spots + _lookup(shop_pos, o2o_orders["Shop_id"], "Shop_id"),
+            "o2o_spot": n_sites + _lookup(spot_pos, o2o_orders["Spot_id"], "Spot_id"),
+            "o2o_num": o2o_orders["Num"].to_numpy(dtype=np.int64),
+            "o2o_pickup": minutes_column(o2o_orders["Pickup_time"]),
+            "o2o_delivery": minutes_column(o2o_orders["Delivery_time"]),
+            "courier_ids": (couriers["Courier_id"].to_numpy(dtype=str) if couriers is not None
+                            else np.zeros(0, dtype=str)),
+        }
+        return cls(arrays)
+
+    @classmethod
+    def from_csv(cls, data_dir="./Dataset", files=DATASET_FILES):
+        return cls.from_tables(*(pd.read_csv(os.path.join(data_dir, name)) for name in files))
+
+    @classmethod
+    def load(cls, data_dir="./Dataset", cache_dir="./cache", files=DATASET_FILES):
+        """
+        Load the compiled instance from its .npz snapshot in `cache_dir`, compiling it from the
+        CSVs first if no snapshot exists for their current contents.
+        """
+        path = os.path.join(cache_dir, f"instance_{dataset_hash(data_dir, files)}.npz")
+        if not os.path.exists(path):
+            instance = cls.from_csv(data_dir, files)
+            os.makedirs(cache_dir, exist_ok=True)
+            # A private temporary file per writer: concurrent processes never share one
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix="instance_", suffix=".tmp.npz")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, **{name: getattr(instance, name) for name in cls.ARRAYS})
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        with np.load(path) as data:
+            return cls({name: data[name] for name in cls.ARRAYS}, path)
+
+    def __getstate__(self):
+        # An instance loaded from a snapshot is re-read from it instead of being pickled.
+        if self.path is None:
+            return dict(self.__dict__)
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        if "location_ids" in state:
+            self.__dict__.update(state)
+            return
+        with np.load(state["path"]) as data:
+            self.__init__({name: data[name] for name in self.ARRAYS}, state["path"])
+
+    # ---------- Views ----------
+
+    def location_index(self):
+        return LocationIndex(self.location_ids, self.lat, self.lng)
+
+    def tables(self):
+        """The DataFrames of read_data(): sites, spots, shops, ecommerce_orders, o2o_orders, couriers."""
+        ids, lat, lng = self.location_ids, self.lat, self.lng
+        s, p = int(self.n_sites), int(self.n_sites) + int(self.n_spots)
+        sites = pd.DataFrame({"Site_id": ids[:s], "Lng": lng[:s], "Lat": lat[:s]})
+        spots = pd.DataFrame({"Spot_id": ids[s:p], "Lng": lng[s:p], "Lat": lat[s:p]})
+        shops = pd.DataFrame({"Shop_id": ids[p:], "Lng": lng[p:], "Lat": lat[p:]})
+        ecommerce_orders = pd.DataFrame({"Order_id": self.ec_order_ids, "Spot_id": ids[self.ec_spot],
+                                         "Site_id": ids[self.ec_site], "Num": self.ec_num})
+        o2o_orders = pd.DataFrame({"Order_id": self.o2o_order_ids, "Spot_id": ids[self.o2o_spot],
+                                   "Shop_id": ids[self.o2o_shop],
+                                   "Pickup_time": _hhmm(self.o2o_pickup), "Delivery_time": _hhmm(self.o2o_delivery),
+                                   "Num": self.o2o_num})
+        couriers = pd.DataFrame({"Courier_id": self.courier_ids})
+        return sites, spots, shops, ecommerce_orders, o2o_orders, couriers
+
+    def build_stops(self, location_index=None):
+        """
+        Stop objects for all orders, as build_stop_lists() returns them:
+        (ecommerce_stops, o2o_stop_pairs). loc_idx is the instance's own location number, which
+        stays distinct when a spot and a shop share an id. A `location_index` given for the
+        travel-time matrix must number the same locations in the same order.
+        """
+        if location_index is not None and [str(loc) for loc in location_index.location_ids] != self.location_ids.tolist():
+            raise ValueError("location_index does not number the instance's locations in order")
+        ids = self.location_ids.tolist()
+        lat = self.lat.tolist()
+        lng = self.lng.tolist()
+
+        ecommerce_stops = [
+            # Delivery must be done by 20:00 (720 minutes from 08:00)
+            Stop(location_id=ids[spot], lat=lat[spot], lng=lng[spot], stop_type="ecommerce_delivery",
+                 order_id=order_id, packages=num, earliest=0, latest=SHIFT_END, loc_idx=spot)
+            for order_id, spot, num in zip(self.ec_order_ids.tolist(), self.ec_spot.tolist(), self.ec_num.tolist())
+        ]
+        o2o_stop_pairs = [
+            (Stop(location_id=ids[shop], lat=lat[shop], lng=lng[shop], stop_type="shop",
+                  order_id=order_id, packages=num, earliest=pickup, latest=SHIFT_END,
+                  paired_order_id=order_id, loc_idx=shop),
+             Stop(location_id=ids[spot], lat=lat[spot], lng=lng[spot], stop_type="delivery",
+                  order_id=order_id, packages=num, earliest=0, latest=delivery,
+                  paired_order_id=order_id, loc_idx=spot))
+            for order_id, shop, spot, num, pickup, delivery in zip(
+                self.o2o_order_ids.tolist(), self.o2o_shop.tolist(), self.o2o_spot.tolist(),
+                self.o2o_num.tolist(), self.o2o_pickup.tolist(), self.o2o_delivery.tolist())
+        ]
+        return ecommerce_stops, o2o_stop_pairs
+
+    def build_order_index(self, ecommerce_stops, o2o_stop_pairs):
+        """OrderIndex over the stops returned by build_stops()."""
+        return OrderIndex(ecommerce_stops, o2o_stop_pairs, self.location_ids[self.ec_site].tolist())
+
+
+def _lookup(index, ids, column):
+    """Positions of `ids` in `index`; raises KeyError like a dict lookup for unknown ids."""
+    pos = index.get_indexer(ids.astype(str))
+    if (pos < 0).any():
+        raise KeyError(f"unknown {column}: {ids[pos < 0].iloc[0]}")
+    return pos.astype(np.int64)
+
+def _hhmm(minutes):
+    minutes = np.asarray(minutes, dtype=np.int64) + 8 * 60
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in minutes.tolist()]
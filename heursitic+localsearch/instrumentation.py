@@ -0,0 +1,131 @@
+import json
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+# ================== Opt-in Instrumentation ==================
+# Hot paths call count()/phase() unconditionally; both do nothing unless a Profiler is active
+# (see activate()), so an ordinary run only pays for one global lookup per call.
+
+class Profiler:
+    """
+    Phase timers, event counters and (with trace_memory) the tracemalloc peak of each phase.
+    Phases may nest; a phase's peak includes the peaks of the phases inside it.
+    Phases merged from other profilers (pool workers) are kept apart from this process's
+    wall-clock phases: they ran concurrently, so their times add up to worker-seconds.
+    """
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.counters = Counter()
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.peak_bytes = {}
+        self.worker_seconds = defaultdict(float)
+        self.worker_max_seconds = defaultdict(float)
+        self.worker_calls = Counter()
+        self.worker_peak_bytes = {}
+        self.merged_reports = 0
+        self._stack = []  # [name, start time, peak so far]
+        self._started_tracing = False
+        self._t0 = time.perf_counter()
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    @contextmanager
+    def phase(self, name):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append([name, time.perf_counter(), 0])
+        try:
+            yield
+        finally:
+            name, start, peak = self._stack.pop()
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+            if tracing:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], peak)
+
+    def merge(self, report):
+        """
+        Add a report() of another profiler, e.g. one returned by a pool worker. Its phases go
+        to the worker phases: summed seconds, the longest single report and the largest peak.
+        """
+        for name, stats in report["phases"].items():
+            self.worker_seconds[name] += stats["seconds"]
+            self.worker_max_seconds[name] = max(self.worker_max_seconds[name], stats["seconds"])
+            self.worker_calls[name] += stats["calls"]
+            if stats.get("peak_bytes") is not None:
+                self.worker_peak_bytes[name] = max(self.worker_peak_bytes.get(name, 0), stats["peak_bytes"])
+        for name, stats in report.get("worker_phases", {}).items():
+            self.worker_seconds[name] += stats["worker_seconds"]
+            self.worker_max_seconds[name] = max(self.worker_max_seconds[name], stats["max_seconds"])
+            self.worker_calls[name] += stats["calls"]
+            if stats.get("peak_bytes") is not None:
+                self.worker_peak_bytes[name] = max(self.worker_peak_bytes.get(name, 0), stats["peak_bytes"])
+        self.counters.update(report["counters"])
+        self.merged_reports += 1 + report.get("merged_reports", 0)
+
+    def report(self):
+        """
+        phases: wall-clock seconds of this process. worker_phases (only after merge()):
+        worker_seconds summed over all merged reports (CPU-seconds of the workers, which may
+        exceed the wall time of the phase that ran them) and max_seconds of a single report.
+        """
+        report = {
+            "total_seconds": time.perf_counter() - self._t0,
+            "phases": {name: {"seconds": self.seconds[name], "calls": self.calls[name],
+                              "peak_bytes": self.peak_bytes.get(name)}
+                       for name in self.seconds},
+            "counters": dict(self.counters),
+        }
+        if self.merged_reports:
+            report["merged_reports"] = self.merged_reports
+            report["worker_phases"] = {
+                name: {"worker_seconds": self.worker_seconds[name], "max_seconds": self.worker_max_seconds[name],
+                       "calls": self.worker_calls[name], "peak_bytes": self.worker_peak_bytes.get(name)}
+                for name in self.worker_seconds}
+        return report
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+_active = None
+
+def activate(profiler):
+    """Make `profiler` (or None) receive count()/phase() calls; returns the previously active one."""
+    global _active
+    previous, _active = _active, profiler
+    return previous
+
+def active():
+    return _active
+
+def count(name, n=1):
+    if _active is not None:
+        _active.counters[name] += n
+
+def phase(name):
+    if _active is None:
+        return nullcontext()
+    return _active.phase(name)
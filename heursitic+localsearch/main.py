@@ -1,84 +1,259 @@
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-import matplotlib.pyplot as plt
 from collections import defaultdict
+import numpy as np
 import pandas as pd
 
-from data_reading_stoplist_construction import read_data, build_stop_lists
-from solution import initial_solution, recalc_route_times, local_search, save_schedule_to_csv
-from clustering import cluster_stops
+from instance import ProblemInstance
+from solution import initial_solution, recalc_route_times, local_search, save_schedule_to_csv, set_travel_times
+from travel_matrix import TravelTimes
+from clustering import cluster_stops, allocate_couriers, load_centroids, save_centroids
+from granular_search import granular_search
+from order_index import OrderIndex
+import instrumentation
+
+# ================== Per-Cluster Solve ==================
+
+def solve_cluster(cluster_id, sites, ecommerce_stops, o2o_stop_pairs, cluster_courier_ids, seed, travel_times,
+                  deadline=None, profile=False, granular_k=None, candidate_k=None, batch=False):
+    """
+    Build and improve the routes of one cluster (its e-commerce stops and O2O (pickup, delivery)
+    pairs). Runs in the main process or in a pool worker;
+    the seed makes the result independent of where and in which order clusters are solved.
+    deadline: time.monotonic() value at which the improvement phases stop (the clock is shared by
+              the processes of one host); construction always completes, and a cluster whose
+              construction ends after the deadline returns the constructed routes unimproved.
+    profile: in a worker, record the construction and local-search phases with a fresh Profiler
+             and return its report (in the main process they go to the active profiler).
+    granular_k: after local search, move orders between the cluster's routes with
+                granular_search over each stop's granular_k nearest neighbors, pairing O2O stops
+                through an OrderIndex of the cluster's own stops (in a worker these are copies,
+                so an index of the main process's stops would not match them).
+    candidate_k: construction tries each order only on the candidate_k couriers whose route
+                 ends nearest to it (see solution.initial_solution); None tries every courier.
+    batch: score 2-opt moves with the NumPy batch evaluator (see solution.local_search).
+    Returns: (cluster_id, routes, profile report or None)
+    """
+    profiler = None
+    if profile and instrumentation.active() is None:
+        profiler = instrumentation.Profiler().start()
+        instrumentation.activate(profiler)
+    try:
+        random.seed(seed)
+        np.random.seed(seed)  # sites.sample() draws from NumPy's global generator
+        set_travel_times(travel_times)
+        with instrumentation.phase("construction"):
+            o2o_stops = [stop for pair in o2o_stop_pairs for stop in pair]
+            travel_times.prefetch([stop.loc_idx for stop in ecommerce_stops + o2o_stops] + list(range(len(sites))))
+            cluster_couriers_df = pd.DataFrame({'Courier_id': cluster_courier_ids})
+            cluster_routes = initial_solution(sites, ecommerce_stops, o2o_stop_pairs, cluster_couriers_df, visualize=False,
+                                              candidate_k=candidate_k)
+        improved_routes = cluster_routes
+        # A cluster that waited in the pool past the deadline skips the improvement phases
+        if deadline is None or time.monotonic() < deadline:
+            with instrumentation.phase("local_search"):
+                improved_routes = local_search(cluster_routes, deadline=deadline, batch=batch)
+            if granular_k:
+                with instrumentation.phase("granular_search"):
+                    order_index = OrderIndex(ecommerce_stops, o2o_stop_pairs)
+                    improved_routes = granular_search(improved_routes, granular_k, travel_times,
+                                                      order_index=order_index, deadline=deadline)
+    finally:
+        if profiler is not None:
+            instrumentation.activate(None)
+            profiler.stop()
+    return cluster_id, improved_routes, profiler.report() if profiler is not None else None
 
 # ================== Main Function ==================
 
-def main():
-    # 1. Read Data
-    sites, spots, shops, ecommerce_orders, o2o_orders, couriers = read_data()
+def main(full_matrix=True, workers=1, seed=42, headless=False, cluster_method="kmeans", max_stops=None, max_packages=None,
+         courier_allocation="equal", centroids_path=None, time_budget=None, profile_path=None, granular_k=None,
+         candidate_k=None, batch=False):
+    """
+    full_matrix: use the full disk-cached travel-time matrix (False: compute rows lazily per cluster).
+    workers: number of processes solving clusters in parallel (1 solves them one after another).
+    seed: base seed; cluster c is solved with seed + c.
+    headless: skip the cluster map, so matplotlib is never imported.
+    cluster_method: "kmeans", "minibatch" or "balanced" (clusters of about equal workload, at most
+                    max_stops stops / max_packages packages each; see clustering.balanced_partition).
+    courier_allocation: "equal" (round robin, the default for every cluster_method) or
+                        "proportional" (to each cluster's workload, see clustering.allocate_couriers).
+    time_budget: seconds for solving all clusters; local and granular search stop when it runs out
+                 and the best routes found so far are kept (clusters still waiting then keep
+                 their constructed routes).
+    centroids_path: .npy file of cluster centers; KMeans/MiniBatchKMeans warm start from it when
+                    it exists, and the new centers are saved back to it.
+    profile_path: write a JSON report of phase times, tracemalloc peaks and hot-path counters
+                  (see instrumentation.Profiler) to this file.
+    granular_k: also run the inter-route granular search (relocate, exchange, 2-opt*, Or-opt)
+                with this many nearest neighbors per stop; None skips it.
+    candidate_k: during construction, try each order only on the couriers whose routes end
+                 among its candidate_k nearest; None tries every courier of the cluster.
+    batch: score local search's 2-opt moves in NumPy batches (batch_evaluator.BatchEvaluator).
+    """
+    profiler = None
+    if profile_path is not None:
+        profiler = instrumentation.Profiler().start()
+        instrumentation.activate(profiler)
+    try:
+        final_routes = _solve(full_matrix, workers, seed, headless, cluster_method, max_stops, max_packages,
+                              courier_allocation, centroids_path, time_budget, profiler is not None, granular_k,
+                              candidate_k, batch)
+    finally:
+        if profiler is not None:
+            instrumentation.activate(None)
+            profiler.stop()
+            profiler.save(profile_path)
+            print(f"✅ Profile saved to {profile_path}")
+    return final_routes
+
+def _solve(full_matrix, workers, seed, headless, cluster_method, max_stops, max_packages,
+           courier_allocation, centroids_path, time_budget, profile, granular_k, candidate_k, batch):
+    # 1. Read Data (compiled instance, loaded from its snapshot in ./cache after the first run)
+    with instrumentation.phase("read"):
+        instance = ProblemInstance.load()
+        sites, spots, shops, ecommerce_orders, o2o_orders, couriers = instance.tables()
     print("✅ Data reading completed.")
+
+    # 1b. Travel-time matrix: full and cached on disk, or lazily computed per cluster
+    with instrumentation.phase("travel_matrix"):
+        location_index = instance.location_index()
+        travel_times = TravelTimes.cached(location_index) if full_matrix else TravelTimes.lazy(location_index)
+        set_travel_times(travel_times)
+    print("✅ Travel-time matrix ready.")
     
     # 2. Build Stop Lists
-    ecommerce_stops, o2o_stop_pairs = build_stop_lists(sites, spots, shops, ecommerce_orders, o2o_orders)
+    with instrumentation.phase("stop_build"):
+        ecommerce_stops, o2o_stop_pairs = instance.build_stops(location_index)
+        order_index = instance.build_order_index(ecommerce_stops, o2o_stop_pairs)
     print("✅ Stop lists constructed.")
     
     # 3. Combine delivery stops for clustering
     delivery_stops = ecommerce_stops + [pair[1] for pair in o2o_stop_pairs]
 
     # 4. Cluster delivery stops (e.g., 20 clusters)
-    clustered_stops, kmeans_model = cluster_stops(delivery_stops, n_clusters=8, save_map=True)
-    print("✅ Clustering completed and cluster map saved.")
+    with instrumentation.phase("clustering"):
+        init_centers = None
+        if centroids_path is not None and cluster_method != "balanced":
+            init_centers = load_centroids(centroids_path)
+        clustered_stops, cluster_model = cluster_stops(delivery_stops, n_clusters=8, save_map=not headless,
+                                                       order_index=order_index, method=cluster_method,
+                                                       max_stops=max_stops, max_packages=max_packages,
+                                                       init_centers=init_centers)
+        if centroids_path is not None:
+            save_centroids(cluster_model, centroids_path)
+    print("✅ Clustering completed." if headless else "✅ Clustering completed and cluster map saved.")
     
-    # 5. Group all stops by cluster ID
+    # 5. Group orders by cluster ID: e-commerce stops and O2O (pickup, delivery) pairs
     stops_by_cluster = defaultdict(list)
-    stop_lookup = {stop.order_id: stop for stop in delivery_stops}
-    
+    pairs_by_cluster = defaultdict(list)
     for stop in clustered_stops:
-        cluster_id = stop.cluster_id
-        stops_by_cluster[cluster_id].append(stop)
-        
-        # If O2O delivery, include its pickup stop
         if stop.stop_type == "delivery":
-            # Find the matching pickup
-            pickup_stop = next((p for p, d in o2o_stop_pairs if d.order_id == stop.order_id), None)
-            if pickup_stop:
-                stops_by_cluster[cluster_id].append(pickup_stop)
+            pairs_by_cluster[stop.cluster_id].append(order_index.stops(stop.order_id))
+        else:
+            stops_by_cluster[stop.cluster_id].append(stop)
 
-    # 6. Assign couriers per cluster (for now, assign equally)
-    cluster_ids = list(stops_by_cluster.keys())
+    # 6. Assign couriers per cluster: equally, or in proportion to the estimated workload (total service time).
+    # Construction spreads orders over every courier it is given, so extra couriers also add route time.
+    cluster_ids = sorted(set(stops_by_cluster) | set(pairs_by_cluster))
     courier_ids = couriers['Courier_id'].tolist()
-    num_clusters = len(cluster_ids)
-    couriers_by_cluster = {
-        cluster_id: [cid for i, cid in enumerate(courier_ids) if i % num_clusters == cluster_id]
-        for cluster_id in cluster_ids
-    }
+    if courier_allocation == "proportional":
+        workloads = {cluster_id: sum(stop.service for stop in stops_by_cluster[cluster_id]) +
+                                 sum(p.service + d.service for p, d in pairs_by_cluster[cluster_id])
+                     for cluster_id in cluster_ids}
+        couriers_by_cluster = allocate_couriers(workloads, courier_ids)
+    else:
+        num_clusters = len(cluster_ids)
+        couriers_by_cluster = {
+            cluster_id: [cid for i, cid in enumerate(courier_ids) if i % num_clusters == k]
+            for k, cluster_id in enumerate(cluster_ids)
+        }
 
-    # 7. Solve each cluster individually
+    # 7. Solve each cluster individually, largest clusters first
+    cluster_size = {cluster_id: len(stops_by_cluster[cluster_id]) + 2 * len(pairs_by_cluster[cluster_id])
+                    for cluster_id in cluster_ids}
+    cluster_ids.sort(key=lambda cluster_id: cluster_size[cluster_id], reverse=True)
+    tasks = [(cluster_id, sites, stops_by_cluster[cluster_id], pairs_by_cluster[cluster_id], couriers_by_cluster[cluster_id],
+              seed + int(cluster_id), travel_times) for cluster_id in cluster_ids]
     final_routes = {}
-    for cluster_id in cluster_ids:
-        stops_in_cluster = stops_by_cluster[cluster_id]
-        cluster_courier_ids = couriers_by_cluster[cluster_id]
-        cluster_couriers_df = pd.DataFrame({'Courier_id': cluster_courier_ids})
-        cluster_routes = initial_solution(sites, stops_in_cluster, [], cluster_couriers_df, visualize=False)
-        improved_cluster_routes = local_search(cluster_routes)
-        final_routes.update(improved_cluster_routes)
-        print(f"✅ Cluster {cluster_id}: routes optimized with {len(cluster_courier_ids)} couriers.")
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    with instrumentation.phase("solve"):
+        if workers > 1:
+            # Every cluster may use the time left until the common deadline.
+            # Forked workers must not inherit this process's profiler; they report their own.
+            with ProcessPoolExecutor(max_workers=workers, initializer=instrumentation.activate, initargs=(None,)) as pool:
+                futures = [pool.submit(solve_cluster, *task, deadline, profile, granular_k, candidate_k, batch) for task in tasks]
+                for future in as_completed(futures):
+                    cluster_id, improved_cluster_routes, report = future.result()
+                    final_routes.update(improved_cluster_routes)
+                    if report is not None:
+                        instrumentation.active().merge(report)
+                    print(f"✅ Cluster {cluster_id}: routes optimized with {len(couriers_by_cluster[cluster_id])} couriers.")
+        else:
+            remaining_size = sum(cluster_size.values())
+            for task in tasks:
+                # Share of the remaining time in proportion to the cluster's size
+                cluster_deadline = None
+                if deadline is not None:
+                    now = time.monotonic()
+                    cluster_deadline = now + max(deadline - now, 0) * cluster_size[task[0]] / max(remaining_size, 1)
+                    remaining_size -= cluster_size[task[0]]
+                cluster_id, improved_cluster_routes, _ = solve_cluster(*task, cluster_deadline, profile, granular_k,
+                                                                        candidate_k, batch)
+                final_routes.update(improved_cluster_routes)
+                print(f"✅ Cluster {cluster_id}: routes optimized with {len(couriers_by_cluster[cluster_id])} couriers.")
 
     # 8. Evaluate and print summary of routes
-    total_time = 0
-    for courier_id, route in tqdm(final_routes.items(), desc="Evaluating routes"):
-        t_time, feasible, penalty = recalc_route_times(route)
-        print(f"Courier {courier_id}: Total Time = {t_time:.2f} min, Feasible: {feasible}, Penalty: {penalty}")
-        total_time += t_time
+    with instrumentation.phase("evaluation"):
+        total_time = 0
+        for courier_id, route in tqdm(final_routes.items(), desc="Evaluating routes"):
+            t_time, feasible, penalty = recalc_route_times(route)
+            print(f"Courier {courier_id}: Total Time = {t_time:.2f} min, Feasible: {feasible}, Penalty: {penalty}")
+            total_time += t_time
     print(f"✅ Total time for all routes: {total_time:.2f} minutes")
     
     # 9. Save final schedule to CSV
-    save_schedule_to_csv(final_routes)
+    with instrumentation.phase("save_csv"):
+        save_schedule_to_csv(final_routes)
+    return final_routes
 
 # ================== Run Script ==================
 
 if __name__ == "__main__":
-    plt.ion()  # Enable interactive mode for live updates
-    try:
-        main()
-    except KeyboardInterrupt:
-        print("❌ Program interrupted. Closing plot...")
-    finally:
-        plt.ioff()
-        plt.close('all')
+    parser = argparse.ArgumentParser(description="Cluster-first heuristic + local search for the VRP instance in ./Dataset")
+    parser.add_argument("--workers", type=int, default=1, help="processes solving clusters in parallel")
+    parser.add_argument("--seed", type=int, default=42, help="base random seed (cluster c uses seed + c)")
+    parser.add_argument("--lazy-matrix", action="store_true", help="compute travel times per cluster instead of caching the full matrix")
+    parser.add_argument("--headless", action="store_true", help="no plotting: skip the cluster map and never import matplotlib")
+    parser.add_argument("--cluster-method", choices=("kmeans", "minibatch", "balanced"), default="kmeans", help="how delivery stops are partitioned into clusters")
+    parser.add_argument("--time-budget", type=float, help="seconds for solving the clusters; local search returns its best routes when they run out")
+    parser.add_argument("--granular", type=int, metavar="K", help="after local search, move orders between routes using each stop's K nearest neighbors")
+    parser.add_argument("--candidate-k", type=int, metavar="K", help="construction: try each order only on the K couriers whose routes end nearest to it")
+    parser.add_argument("--batch", action="store_true", help="local search: score 2-opt moves in NumPy batches")
+    parser.add_argument("--profile", metavar="PATH", help="write a JSON profiling report (phase times, memory peaks, counters) to PATH")
+    parser.add_argument("--centroids", help="cluster centers file (.npy): warm start from it if present, save the new centers to it")
+    parser.add_argument("--max-stops", type=int, help="balanced clustering: at most this many stops per cluster")
+    parser.add_argument("--max-packages", type=int, help="balanced clustering: at most this many packages per cluster")
+    parser.add_argument("--courier-allocation", choices=("equal", "proportional"), default="equal", help="couriers per cluster: round robin (default) or in proportion to each cluster's workload")
+    args = parser.parse_args()
+
+    options = dict(full_matrix=not args.lazy_matrix, workers=args.workers, seed=args.seed,
+                   cluster_method=args.cluster_method, max_stops=args.max_stops, max_packages=args.max_packages,
+                   courier_allocation=args.courier_allocation, centroids_path=args.centroids,
+                   time_budget=args.time_budget, profile_path=args.profile, granular_k=args.granular,
+                   candidate_k=args.candidate_k, batch=args.batch)
+    if args.headless:
+        main(headless=True, **options)
+    else:
+        import matplotlib.pyplot as plt
+        plt.ion()  # Enable interactive mode for live updates
+        try:
+            main(**options)
+        except KeyboardInterrupt:
+            print("❌ Program interrupted. Closing plot...")
+        finally:
+            plt.ioff()
+            plt.close('all')
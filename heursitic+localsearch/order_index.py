@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+# ================== Order Index ==================
+
+class OrderIndex:
+    """
+    Lookup tables over the stops of all orders, built once next to the stop lists
+    (see ProblemInstance.build_order_index) so no caller has to scan the stop lists:
+      - stops_by_order[order_id]: (delivery,) for e-commerce orders, (pickup, delivery) for O2O orders
+      - orders_by_site[site_id]: e-commerce order ids shipped from a site
+      - orders_by_shop[shop_id]: O2O order ids picked up at a shop
+    """
+    def __init__(self, ecommerce_stops, o2o_stop_pairs, ecommerce_site_ids=None):
+        """
+        ecommerce_site_ids: site id of each e-commerce stop (same order as ecommerce_stops);
+        without it orders_by_site stays empty.
+        """
+        self.stops_by_order = {}
+        self.orders_by_site = defaultdict(list)
+        self.orders_by_shop = defaultdict(list)
+        for stop in ecommerce_stops:
+            self.stops_by_order[stop.order_id] = (stop,)
+        if ecommerce_site_ids is not None:
+            for stop, site_id in zip(ecommerce_stops, ecommerce_site_ids):
+                self.orders_by_site[site_id].append(stop.order_id)
+        for pickup, delivery in o2o_stop_pairs:
+            self.stops_by_order[delivery.order_id] = (pickup, delivery)
+            self.orders_by_shop[pickup.location_id].append(delivery.order_id)
+
+    def __len__(self):
+        return len(self.stops_by_order)
+
+    def __contains__(self, order_id):
+        return order_id in self.stops_by_order
+
+    def stops(self, order_id):
+        """All stops of an order, pickup first."""
+        return self.stops_by_order[order_id]
+
+    def delivery(self, order_id):
+        return self.stops_by_order[order_id][-1]
+
+    def pickup_of(self, stop):
+        """The shop pickup of an O2O order's stop, None for e-commerce orders."""
+        stops = self.stops_by_order.get(stop.order_id)
+        if stops is None or len(stops) < 2:
+            return None
+        return stops[0]
+
+    def delivery_of(self, stop):
+        stops = self.stops_by_order.get(stop.order_id)
+        return None if stops is None else stops[-1]
+
+    def pairs(self):
+        """(pickup, delivery) of every O2O order."""
+        return [stops for stops in self.stops_by_order.values() if len(stops) == 2]
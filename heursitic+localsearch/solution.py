@@ -1,13 +1,13 @@
 import random
-import copy
 import csv
+import time
 from tqdm import tqdm
-import contextily as ctx
-import matplotlib.pyplot as plt
 import numpy as np
-import imageio
-from data_structures import Route, Stop
-from helper_functions import travel_time, service_time, compute_distance
+from data_structures import Route, Stop, StopTable
+from batch_evaluator import BatchEvaluator, stop_travel_times, reversal_moves, reversed_sequences
+from helper_functions import travel_time, compute_distance
+from spatial_index import TailGrid
+import instrumentation
 
 # ================== Parameters ==================
 SPEED = 15  # km/h
@@ -15,78 +15,99 @@ SPEED = SPEED / 60.0  # km/min, e.g., 0.25 km/min
 MAX_CAPACITY = 140  # Maximum capacity for O2O orders (packages)
 MAX_WORK_MINUTES = 720  # Courier shift: 12 hours (from 08:00 to 20:00)
 
-# ================== Visualization Function ==================
+# Precomputed travel times (travel_matrix.TravelTimes); None falls back to per-leg haversine.
+_travel_times = None
+
+def set_travel_times(travel_times):
+    """Use a precomputed travel-time matrix for all route evaluations (None to disable)."""
+    global _travel_times
+    _travel_times = travel_times
+
+def leg_time(prev, stop):
+    """Travel time in minutes from stop `prev` to stop `stop`."""
+    if _travel_times is not None and prev.loc_idx is not None and stop.loc_idx is not None:
+        return _travel_times.get(prev.loc_idx, stop.loc_idx)
+    return travel_time(compute_distance(prev.lat, prev.lng, stop.lat, stop.lng))
+
+def _location_idx(location_id):
+    if _travel_times is None:
+        return None
+    return _travel_times.index.get(location_id)
+
+# ================== Visualization ==================
 def visualize_routes(routes, title="Current Routes"):
-    plt.clf()  # Clear current figure
-    ax = plt.gca()
-    
-    # Plot each route with small markers and lines
-    for route in routes.values():
-        lats = [stop.lat for stop in route.stops]
-        lngs = [stop.lng for stop in route.stops]
-        ax.plot(lngs, lats, marker='o', linestyle='-', linewidth=1, markersize=3, alpha=0.5)
-    
-    ax.set_xlabel("Longitude")
-    ax.set_ylabel("Latitude")
-    ax.set_title(title)
-    
-    # Determine plot extents from all stops to ensure the basemap covers the area
-    all_lats = []
-    all_lngs = []
-    for route in routes.values():
-        all_lats.extend([stop.lat for stop in route.stops])
-        all_lngs.extend([stop.lng for stop in route.stops])
-    if all_lats and all_lngs:
-        margin = 0  # Adjust as needed for a small border around the points
-        ax.set_xlim(min(all_lngs) - margin, max(all_lngs) + margin)
-        ax.set_ylim(min(all_lats) - margin, max(all_lats) + margin)
-    
-    # Add a clean background map using CartoDB Positron style.
-    # The crs parameter tells contextily that our data is in EPSG:4326.
-    try:
-        ctx.add_basemap(ax, crs="EPSG:4326", source=ctx.providers.CartoDB.Positron)
-    except Exception as e:
-        print("Error adding basemap:", e)
-    
-    plt.pause(0.1)  # Pause briefly to update the figure
+    """Draw the routes over a basemap; the plotting plugin is only imported on the first call."""
+    from visualization import plot_routes_basemap
+    plot_routes_basemap(routes, title)
 
 # ================== Initial Solution Construction ==================
-def initial_solution(sites, ecommerce_stops, o2o_stop_pairs, couriers, visualize=False):
+def _best_route(candidates, new_stops):
+    """Cheapest route among `candidates` that can feasibly append `new_stops` (None if none can)."""
+    best_route = None
+    best_increase = float('inf')
+    for route in candidates:
+        instrumentation.count("insertions_evaluated")
+        total_time, feasible, penalty = evaluate_append(route, new_stops)
+        cost = total_time + penalty
+        if feasible and cost < best_increase:
+            best_increase = cost
+            best_route = route
+    return best_route
+
+def _insert(routes, new_stops, tails=None, candidate_k=None):
+    """
+    Append `new_stops` to the cheapest feasible route.
+    With a TailGrid of route tails, only the candidate_k couriers whose last stop is
+    nearest to the first new stop are tried; all routes are scanned only if none of them fits.
+    """
+    best_route = None
+    if tails is not None:
+        first = new_stops[0]
+        nearby = tails.nearest(first.lat, first.lng, candidate_k)
+        best_route = _best_route((routes[courier_id] for courier_id in nearby), new_stops)
+    if best_route is None:
+        best_route = _best_route(routes.values(), new_stops)
+    if best_route is not None:
+        append_stops(best_route, new_stops)
+        if tails is not None:
+            last = new_stops[-1]
+            tails.update(best_route.courier_id, last.lat, last.lng)
+    return best_route
+
+def initial_solution(sites, ecommerce_stops, o2o_stop_pairs, couriers, visualize=False, candidate_k=None):
     """
     Constructs an initial solution using a greedy insertion method.
       - Each courier starts at a randomly chosen site.
       - Ecommerce orders (delivery stops) are appended if feasible.
       - O2O orders (pickup then delivery) are appended as a pair.
+    candidate_k: if set, each order is only tried on the candidate_k couriers whose route ends
+                 closest to it (falling back to all couriers when none is feasible).
     Incorporates a progress bar (tqdm) and live visualization.
     """
     routes = {}
+    depots = {}  # one shared (immutable) start stop per site
     # Assign each courier a starting site (depot)
     for _, row in couriers.iterrows():
         courier_id = row['Courier_id']
         site_row = sites.sample(1).iloc[0]
-        lat, lng = site_row['Lat'], site_row['Lng']
-        start_stop = Stop(location_id=site_row['Site_id'], lat=lat, lng=lng,
-                          stop_type="site", order_id=None, packages=0,
-                          earliest=0, latest=720)
-        start_stop.arrival = 0
-        start_stop.departure = 0
-        routes[courier_id] = Route(courier_id, start_stop)
+        site_id = site_row['Site_id']
+        if site_id not in depots:
+            depots[site_id] = Stop(location_id=site_id, lat=site_row['Lat'], lng=site_row['Lng'],
+                                   stop_type="site", order_id=None, packages=0,
+                                   earliest=0, latest=720,
+                                   loc_idx=_location_idx(site_id))
+        routes[courier_id] = Route(courier_id, depots[site_id])
+
+    tails = None
+    if candidate_k:
+        tails = TailGrid()
+        for courier_id, route in routes.items():
+            tails.update(courier_id, route.stops[0].lat, route.stops[0].lng)
     
     # Ecommerce orders insertion with progress bar and visualization
     count = 0
     for order_stop in tqdm(ecommerce_stops, desc="Inserting ecommerce orders"):
-        best_route = None
-        best_increase = float('inf')
-        for route in routes.values():
-            candidate = copy.deepcopy(route)
-            candidate.stops.append(copy.deepcopy(order_stop))
-            total_time, feasible, penalty = recalc_route_times(candidate)
-            cost = total_time + penalty
-            if feasible and cost < best_increase:
-                best_increase = cost
-                best_route = route
-        if best_route is not None:
-            best_route.stops.append(order_stop)
+        _insert(routes, (order_stop,), tails, candidate_k)
         count += 1
 
         if visualize:
@@ -97,20 +118,7 @@ def initial_solution(sites, ecommerce_stops, o2o_stop_pairs, couriers, visualize
     # O2O orders insertion with progress bar and visualization
     count = 0
     for pickup_stop, delivery_stop in tqdm(o2o_stop_pairs, desc="Inserting O2O orders"):
-        best_route = None
-        best_increase = float('inf')
-        for route in routes.values():
-            candidate = copy.deepcopy(route)
-            candidate.stops.append(copy.deepcopy(pickup_stop))
-            candidate.stops.append(copy.deepcopy(delivery_stop))
-            total_time, feasible, penalty = recalc_route_times(candidate)
-            cost = total_time + penalty
-            if feasible and cost < best_increase:
-                best_increase = cost
-                best_route = route
-        if best_route is not None:
-            best_route.stops.append(pickup_stop)
-            best_route.stops.append(delivery_stop)
+        _insert(routes, (pickup_stop, delivery_stop), tails, candidate_k)
         count += 1
 
         if visualize:
@@ -126,60 +134,103 @@ def initial_solution(sites, ecommerce_stops, o2o_stop_pairs, couriers, visualize
 
 # ================== Route Evaluation and Feasibility ==================
 
-def recalc_route_times(route):
+def _visit(departure, load, prev, stop):
     """
-    Recalculate arrival and departure times along the route.
-    Simulate load changes and check for constraint violations.
-    Returns: (total_time, feasible, penalty)
+    Serve `stop` after leaving `prev` at time `departure` with `load` packages on board.
+    Returns: (arrival, departure, load, feasible, penalty) for this stop alone.
     """
-    current_load = 0
     feasible = True
     penalty = 0
-    # Initialize first stop (site)
-    route.stops[0].arrival = 0
-    route.stops[0].departure = 0
-    for i in range(1, len(route.stops)):
-        prev = route.stops[i-1]
-        stop = route.stops[i]
-        # Compute travel time
-        d = compute_distance(prev.lat, prev.lng, stop.lat, stop.lng)
-        t_time = travel_time(d)
-        arrival = prev.departure + t_time
-        # If arriving before earliest, wait
-        if arrival < stop.earliest:
-            arrival = stop.earliest
-        stop.arrival = arrival
-        # Service time depends on stop type
-        if stop.stop_type in ["delivery", "ecommerce_delivery", "shop"]:
-            s_time = service_time(stop.packages)
-        else:
-            s_time = 0
-        stop.departure = arrival + s_time
-        
-        # Update load for O2O orders:
-        if stop.stop_type == "shop":
-            current_load += stop.packages
-            if current_load > MAX_CAPACITY:
-                feasible = False
-                penalty += (current_load - MAX_CAPACITY) * 100
-        elif stop.stop_type == "delivery":
-            # For O2O, ensure pickup happened first; then reduce load.
-            current_load -= stop.packages
-            if current_load < 0:
-                feasible = False
-                penalty += 1000
-        
-        # Check time window violation
-        if stop.latest is not None and stop.arrival > stop.latest:
+    # Travel time (matrix lookup when available)
+    arrival = departure + leg_time(prev, stop)
+    # If arriving before earliest, wait
+    if arrival < stop.earliest:
+        arrival = stop.earliest
+    # Service time depends on stop type (precomputed on the stop)
+    departure = arrival + stop.service
+
+    # Update load for O2O orders:
+    if stop.stop_type == "shop":
+        load += stop.packages
+        if load > MAX_CAPACITY:
             feasible = False
-            penalty += (stop.arrival - stop.latest) * 50
-    
-    total_time = route.stops[-1].departure
+            penalty += (load - MAX_CAPACITY) * 100
+    elif stop.stop_type == "delivery":
+        # For O2O, ensure pickup happened first; then reduce load.
+        load -= stop.packages
+        if load < 0:
+            feasible = False
+            penalty += 1000
+
+    # Check time window violation
+    if stop.latest is not None and arrival > stop.latest:
+        feasible = False
+        penalty += (arrival - stop.latest) * 50
+    return arrival, departure, load, feasible, penalty
+
+def _close_route(total_time, feasible, penalty):
+    """Apply the shift-length constraint to a finished schedule."""
     if total_time > MAX_WORK_MINUTES:
         feasible = False
         penalty += (total_time - MAX_WORK_MINUTES) * 100
     return total_time, feasible, penalty
 
+def recalc_route_times(route):
+    """
+    Recalculate arrival and departure times along the route.
+    Simulate load changes and check for constraint violations.
+    Also refreshes the route's cached schedule state (load, penalty, feasible).
+    Returns: (total_time, feasible, penalty)
+    """
+    instrumentation.count("recalc_route_times")
+    current_load = 0
+    feasible = True
+    penalty = 0
+    n = len(route.stops)
+    arrivals = [0] * n
+    departures = [0] * n
+    # First stop (site) is left at time 0
+    for i in range(1, n):
+        arrivals[i], departures[i], current_load, ok, p = _visit(departures[i-1], current_load,
+                                                               route.stops[i-1], route.stops[i])
+        feasible = feasible and ok
+        penalty += p
+
+    route.arrival = arrivals
+    route.departure = departures
+    route.load = current_load
+    route.penalty = penalty
+    route.feasible = feasible
+    return _close_route(departures[-1], feasible, penalty)
+
+def evaluate_append(route, new_stops):
+    """
+    Score appending `new_stops` to the end of `route` without copying or modifying it.
+    Starts from the route's cached schedule state, so the cost is O(len(new_stops))
+    and the result equals recalc_route_times on the extended route.
+    Returns: (total_time, feasible, penalty)
+    """
+    prev = route.stops[-1]
+    departure = route.departure[-1]
+    load, feasible, penalty = route.load, route.feasible, route.penalty
+    for stop in new_stops:
+        _, departure, load, ok, p = _visit(departure, load, prev, stop)
+        feasible = feasible and ok
+        penalty += p
+        prev = stop
+    return _close_route(departure, feasible, penalty)
+
+def append_stops(route, new_stops):
+    """Commit `new_stops` to the end of `route`, timing only the new stops."""
+    for stop in new_stops:
+        arrival, departure, route.load, ok, p = _visit(route.departure[-1], route.load, route.stops[-1], stop)
+        route.feasible = route.feasible and ok
+        route.penalty += p
+        route.stops.append(stop)
+        route.arrival.append(arrival)
+        route.departure.append(departure)
+    return _close_route(route.departure[-1], route.feasible, route.penalty)
+
 def route_cost(route):
     """Compute route cost as total time plus any penalties."""
     total_time, _, penalty = recalc_route_times(route)
@@ -190,72 +241,292 @@ def is_feasible_route(route):
     _, feasible, _ = recalc_route_times(route)
     return feasible
 
+# ================== Delta Evaluation: Prefix/Suffix Schedules ==================
+
+# Minimum cost decrease for accepting a local-search move (guards against float noise).
+IMPROVEMENT_EPS = 1e-9
+
+def _load_ok(stop, load):
+    if stop.stop_type == "shop":
+        return load <= MAX_CAPACITY
+    if stop.stop_type == "delivery":
+        return load >= 0
+    return True
+
+class RouteSchedule:
+    """
+    Precomputed schedule of a stop sequence, used to score local-search moves without copying.
+    A move keeps stops[0..i], replaces the stops in between by `middle` and resumes at stops[j];
+    splice() times only `middle` and evaluates the untouched suffix in O(1):
+      - dep[k], load[k], ok[k]: departure and load after stop k, and whether stops 0..k meet all constraints.
+      - Arriving (before waiting) at stop k at time a, the suffix k.. ends at max(a + dur[k], floor[k]).
+        It stays feasible iff a <= latest_arr[k] and the load entering k is unchanged (load_ok[k]).
+      - pickup_pos[k] / delivery_pos[k]: position of the other half of an O2O order, -1 if none.
+    """
+    def __init__(self, stops):
+        self.stops = stops = list(stops)
+        n = len(stops)
+        self.dep = [0.0] * n
+        self.load = [0] * n
+        self.ok = [True] * n
+        for k in range(1, n):
+            _, self.dep[k], self.load[k], ok, _ = _visit(self.dep[k-1], self.load[k-1], stops[k-1], stops[k])
+            self.ok[k] = self.ok[k-1] and ok
+
+        self.dur = [0.0] * n
+        self.floor = [0.0] * n
+        self.latest_arr = [float('-inf')] * n
+        self.load_ok = [True] * (n + 1)
+        for k in range(n - 1, 0, -1):
+            stop = stops[k]
+            s_time = stop.service
+            latest = stop.latest if stop.latest is not None else float('inf')
+            if k == n - 1:
+                self.dur[k] = s_time
+                self.floor[k] = stop.earliest + s_time
+                bound = min(latest, MAX_WORK_MINUTES - s_time)
+            else:
+                t_time = leg_time(stop, stops[k+1])
+                self.dur[k] = s_time + t_time + self.dur[k+1]
+                self.floor[k] = max(stop.earliest + self.dur[k], self.floor[k+1])
+                bound = min(latest, self.latest_arr[k+1] - s_time - t_time)
+            if stop.earliest <= bound:
+                self.latest_arr[k] = bound
+            self.load_ok[k] = self.load_ok[k+1] and _load_ok(stop, self.load[k])
+
+        self.pickup_pos = [-1] * n
+        self.delivery_pos = [-1] * n
+        pickups = {}
+        for k, stop in enumerate(stops):
+            if stop.paired_order_id is None:
+                continue
+            if stop.stop_type == "shop":
+                pickups[stop.order_id] = k
+            elif stop.stop_type == "delivery" and stop.order_id in pickups:
+                p = pickups[stop.order_id]
+                self.pickup_pos[k] = p
+                self.delivery_pos[p] = k
+
+    def splice(self, i, middle, j):
+        """
+        Score the sequence stops[:i+1] + middle + stops[j:].
+        Returns: (feasible, total_time); total_time is None when infeasible.
+        """
+        if not self.ok[i]:
+            return False, None
+        prev = self.stops[i]
+        departure = self.dep[i]
+        load = self.load[i]
+        for stop in middle:
+            _, departure, load, ok, _ = _visit(departure, load, prev, stop)
+            if not ok:
+                return False, None
+            prev = stop
+        if j == len(self.stops):
+            return departure <= MAX_WORK_MINUTES, departure
+        if load != self.load[j-1] or not self.load_ok[j]:
+            return False, None
+        arrival = departure + leg_time(prev, self.stops[j])
+        if arrival > self.latest_arr[j]:
+            return False, None
+        return True, max(arrival + self.dur[j], self.floor[j])
+
+    def join(self, i, other, j):
+        """
+        Score the sequence stops[:i+1] + other.stops[j:] (the head of this route followed by the
+        tail of another one), in O(1). The load leaving stop i must equal the load entering other's stop j.
+        Returns: (feasible, total_time); total_time is None when infeasible.
+        """
+        if not self.ok[i]:
+            return False, None
+        departure = self.dep[i]
+        if j == len(other.stops):
+            return departure <= MAX_WORK_MINUTES, departure
+        if self.load[i] != other.load[j-1] or not other.load_ok[j]:
+            return False, None
+        arrival = departure + leg_time(self.stops[i], other.stops[j])
+        if arrival > other.latest_arr[j]:
+            return False, None
+        return True, max(arrival + other.dur[j], other.floor[j])
+
+def _with_stops(route, stops):
+    """New Route for the same courier visiting `stops`, with timings recalculated."""
+    instrumentation.count("route_copies")
+    new_route = Route(route.courier_id, stops[0])
+    new_route.stops = list(stops)
+    recalc_route_times(new_route)
+    return new_route
+
 # ================== Local Search: 2-opt and Swap Moves ==================
 
-def two_opt(route):
+def _expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+def two_opt(route, strategy="first", deadline=None, batch=False):
     """
     Apply 2-opt moves to a route.
     Reverse segments and accept the move if it reduces cost and keeps feasibility.
+    strategy: "first" applies each improving reversal as soon as it is found,
+              "best" applies the best reversal of a full scan; both repeat until no improvement.
+    deadline: time.monotonic() value after which the search stops and returns the best route so far.
+    batch: score all reversals of a scan together with batch_evaluator (see _two_opt_batch).
+    Moves are scored by RouteSchedule.splice, the route is only copied if a move is accepted.
     """
-    best_route = copy.deepcopy(route)
-    best_cost = route_cost(best_route)
+    if _expired(deadline):
+        return route
+    if batch:
+        return _two_opt_batch(route, strategy, deadline)
+    best_cost = route_cost(route)
+    sched = RouteSchedule(route.stops)
+    changed = False
     improved = True
-    while improved:
+    evaluated = accepted = 0
+    while improved and not _expired(deadline):
         improved = False
-        n = len(best_route.stops)
+        best_move = None
+        n = len(sched.stops)
         for i in range(1, n - 2):
+            if _expired(deadline):
+                break
             for j in range(i + 1, n - 1):
-                candidate = copy.deepcopy(best_route)
-                candidate.stops[i:j+1] = list(reversed(candidate.stops[i:j+1]))
-                if is_feasible_route(candidate):
-                    cand_cost = route_cost(candidate)
-                    if cand_cost < best_cost:
-                        best_route = candidate
-                        best_cost = cand_cost
-                        improved = True
+                # A delivery whose pickup lies in [i, j] would precede it; longer segments contain it too.
+                if sched.pickup_pos[j] >= i:
+                    break
+                middle = sched.stops[j:i-1:-1]
+                evaluated += 1
+                feasible, cand_cost = sched.splice(i - 1, middle, j + 1)
+                if feasible and cand_cost < best_cost - IMPROVEMENT_EPS:
+                    best_cost = cand_cost
+                    if strategy == "first":
+                        sched = RouteSchedule(sched.stops[:i] + middle + sched.stops[j+1:])
+                        accepted += 1
+                        changed = improved = True
+                    else:
+                        best_move = (i, j)
+        if best_move is not None:
+            i, j = best_move
+            sched = RouteSchedule(sched.stops[:i] + sched.stops[j:i-1:-1] + sched.stops[j+1:])
+            accepted += 1
+            changed = improved = True
         # Loop until no improvement is found
-    return best_route
+    instrumentation.count("moves_evaluated", evaluated)
+    instrumentation.count("moves_accepted", accepted)
+    return _with_stops(route, sched.stops) if changed else route
 
-def intra_route_swap(route):
+def _two_opt_batch(route, strategy="first", deadline=None, max_cells=1 << 20):
+    """
+    two_opt with every reversal of a scan scored in one BatchEvaluator pass (in blocks of at
+    most max_cells stops). After a move the scan restarts from the front, so "first" takes the
+    first improving reversal of each scan rather than continuing the scan with the new route.
+    """
+    if _expired(deadline):
+        return route
+    best_cost = route_cost(route)
+    table = StopTable(route.stops)
+    evaluator = BatchEvaluator(table, stop_travel_times(table, _travel_times), MAX_CAPACITY, MAX_WORK_MINUTES)
+    order = np.arange(len(table))
+    changed = False
+    evaluated = accepted = 0
+    while not _expired(deadline):
+        i, j = reversal_moves(order, table)
+        block = max(1, max_cells // len(order))
+        best_move = None
+        for start in range(0, len(i), block):
+            if _expired(deadline):
+                break
+            block_i, block_j = i[start:start + block], j[start:start + block]
+            total_time, feasible, _ = evaluator.evaluate(reversed_sequences(order, block_i, block_j))
+            evaluated += len(block_i)
+            improving = np.flatnonzero(feasible & (total_time < best_cost - IMPROVEMENT_EPS))
+            if len(improving) == 0:
+                continue
+            k = improving[0] if strategy == "first" else improving[np.argmin(total_time[improving])]
+            best_cost = total_time[k]
+            best_move = (block_i[k], block_j[k])
+            if strategy == "first":
+                break
+        if best_move is None:
+            break
+        i, j = best_move
+        order[i:j+1] = order[i:j+1][::-1]
+        accepted += 1
+        changed = True
+    instrumentation.count("moves_evaluated", evaluated)
+    instrumentation.count("moves_accepted", accepted)
+    return _with_stops(route, [table.stops[r] for r in order]) if changed else route
+
+def intra_route_swap(route, strategy="first", deadline=None):
     """
     Try swapping two stops (except the start) and accept if it improves the cost.
     Also check that pickup-delivery precedence is maintained.
+    strategy: "first" applies improving swaps during one scan, "best" applies the best swap of the scan.
+    deadline: as in two_opt; the scan stops early and keeps what it has found.
     """
-    best_route = copy.deepcopy(route)
-    best_cost = route_cost(best_route)
-    n = len(best_route.stops)
+    if _expired(deadline):
+        return route
+    best_cost = route_cost(route)
+    sched = RouteSchedule(route.stops)
+    best_move = None
+    changed = False
+    evaluated = accepted = 0
+    n = len(sched.stops)
     for i in range(1, n):
+        if _expired(deadline):
+            break
         for j in range(i + 1, n):
-            candidate = copy.deepcopy(best_route)
-            candidate.stops[i], candidate.stops[j] = candidate.stops[j], candidate.stops[i]
-            # Check that for each O2O order, the shop (pickup) comes before its delivery.
-            valid = True
-            order_positions = {}
-            for idx, stop in enumerate(candidate.stops):
-                if stop.order_id is not None and stop.paired_order_id is not None:
-                    if stop.stop_type == "shop":
-                        order_positions[stop.order_id] = idx
-                    elif stop.stop_type == "delivery":
-                        if stop.order_id in order_positions and idx < order_positions[stop.order_id]:
-                            valid = False
-                            break
-            if not valid:
+            # The shop (pickup) of an O2O order must stay before its delivery.
+            if 0 <= sched.delivery_pos[i] <= j or sched.pickup_pos[j] >= i:
                 continue
-            if is_feasible_route(candidate):
-                cand_cost = route_cost(candidate)
-                if cand_cost < best_cost:
-                    best_route = candidate
-                    best_cost = cand_cost
-    return best_route
+            stops = sched.stops
+            middle = [stops[j]] + stops[i+1:j] + [stops[i]]
+            evaluated += 1
+            feasible, cand_cost = sched.splice(i - 1, middle, j + 1)
+            if feasible and cand_cost < best_cost - IMPROVEMENT_EPS:
+                best_cost = cand_cost
+                if strategy == "first":
+                    sched = RouteSchedule(stops[:i] + middle + stops[j+1:])
+                    accepted += 1
+                    changed = True
+                else:
+                    best_move = (i, j)
+    if best_move is not None:
+        i, j = best_move
+        stops = sched.stops
+        sched = RouteSchedule(stops[:i] + [stops[j]] + stops[i+1:j] + [stops[i]] + stops[j+1:])
+        accepted += 1
+        changed = True
+    instrumentation.count("moves_evaluated", evaluated)
+    instrumentation.count("moves_accepted", accepted)
+    return _with_stops(route, sched.stops) if changed else route
+
+def improvement_potential(route):
+    """
+    Time of a route not spent serving stops (travel and waiting), the part moves can reduce.
+    Uses the cached schedule, so the route must be timed (recalc_route_times / append_stops).
+    """
+    return route.total_time() - sum(stop.service for stop in route.stops)
 
-def local_search(routes):
+def local_search(routes, strategy="first", deadline=None, time_budget=None, batch=False):
     """
     Apply local search moves (2-opt and intra-route swap) to each route.
+    strategy: "first" or "best" improvement, see two_opt.
+    batch: score 2-opt moves with the NumPy batch evaluator (two_opt(..., batch=True)).
+    Anytime mode: with a deadline (time.monotonic() value) or a time_budget (seconds from now),
+    routes are improved in order of improvement_potential, largest first, and the search stops
+    at the deadline; routes not finished keep the best sequence found so far.
     """
-    improved_routes = {}
-    for courier_id, route in tqdm(list(routes.items()), desc="Local search on routes"):
-        new_route = two_opt(route)
-        new_route = intra_route_swap(new_route)
+    if time_budget is not None:
+        budget_deadline = time.monotonic() + time_budget
+        deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+    items = list(routes.items())
+    if deadline is not None:
+        items.sort(key=lambda item: improvement_potential(item[1]), reverse=True)
+    improved_routes = dict(routes)
+    for courier_id, route in tqdm(items, desc="Local search on routes"):
+        if _expired(deadline):
+            break
+        new_route = two_opt(route, strategy, deadline, batch)
+        new_route = intra_route_swap(new_route, strategy, deadline)
         improved_routes[courier_id] = new_route
     return improved_routes
 
@@ -265,9 +536,10 @@ def save_schedule_to_csv(routes, filename="heuristic+localsearch_schedule.csv"):
         writer.writerow(["Courier_id", "Location_id", "Stop_Type", "Arrival_time", "Departure_time", "Amount", "Order_id"])
         for courier_id, route in routes.items():
             # Sort stops by arrival time for clarity
-            route.stops.sort(key=lambda s: s.arrival if s.arrival is not None else float('inf'))
-            for stop in route.stops:
-                arr = int(round(stop.arrival)) if stop.arrival is not None else 0
-                dep = int(round(stop.departure)) if stop.departure is not None else 0
+            order = sorted(range(len(route.stops)), key=lambda k: route.arrival[k])
+            for k in order:
+                stop = route.stops[k]
+                arr = int(round(route.arrival[k]))
+                dep = int(round(route.departure[k]))
                 writer.writerow([courier_id, stop.location_id, stop.stop_type, arr, dep, stop.packages, stop.order_id])
     print(f"Schedule saved to {filename}")
\ No newline at end of file
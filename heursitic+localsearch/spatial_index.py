@@ -0,0 +1,87 @@
+import math
+from collections import defaultdict
+
+# ================== Spatial Index over Route Tails ==================
+
+class TailGrid:
+    """
+    Uniform grid over the current tail (last stop) of each route, used to find
+    the couriers closest to a new order without scanning all routes.
+    Coordinates are projected to (lat, lng * cos(ref_lat)) so cells are roughly square;
+    cell_size is in degrees of latitude (0.01 ~ 1.1 km).
+    """
+    def __init__(self, cell_size=0.01, ref_lat=31.2):
+        self.cell_size = cell_size
+        self.lng_scale = math.cos(math.radians(ref_lat))
+        self.cells = defaultdict(set)
+        self.position = {}  # key -> (y, x, cell)
+
+    def __len__(self):
+        return len(self.position)
+
+    def _project(self, lat, lng):
+        return lat, lng * self.lng_scale
+
+    def _cell(self, y, x):
+        return int(math.floor(y / self.cell_size)), int(math.floor(x / self.cell_size))
+
+    def update(self, key, lat, lng):
+        """Insert `key` at (lat, lng) or move it there."""
+        y, x = self._project(lat, lng)
+        cell = self._cell(y, x)
+        old = self.position.get(key)
+        if old is not None and old[2] != cell:
+            self.cells[old[2]].discard(key)
+            if not self.cells[old[2]]:
+                del self.cells[old[2]]
+        self.cells[cell].add(key)
+        self.position[key] = (y, x, cell)
+
+    def remove(self, key):
+        old = self.position.pop(key, None)
+        if old is not None:
+            self.cells[old[2]].discard(key)
+            if not self.cells[old[2]]:
+                del self.cells[old[2]]
+
+    def nearest(self, lat, lng, k):
+        """Keys of the (at most) k entries closest to (lat, lng), nearest first."""
+        if k <= 0 or not self.position:
+            return []
+        y, x = self._project(lat, lng)
+        cy, cx = self._cell(y, x)
+        found = []  # (squared distance, key)
+        seen = 0
+        r = 0
+        while True:
+            if (2 * r + 1)**2 > 4 * len(self.cells):
+                # Rings now cover far more cells than are occupied: finish with a direct scan.
+                found = [((ky - y)**2 + (kx - x)**2, key) for key, (ky, kx, _) in self.position.items()]
+                break
+            for cell in self._ring(cy, cx, r):
+                for key in self.cells.get(cell, ()):
+                    ky, kx, _ = self.position[key]
+                    found.append(((ky - y)**2 + (kx - x)**2, key))
+                    seen += 1
+            # Everything not scanned yet is at least r cells away.
+            if seen == len(self.position):
+                break
+            if len(found) >= k:
+                found.sort()
+                if found[k-1][0] <= (r * self.cell_size)**2:
+                    break
+            r += 1
+        found.sort()
+        return [key for _, key in found[:k]]
+
+    @staticmethod
+    def _ring(cy, cx, r):
+        if r == 0:
+            yield (cy, cx)
+            return
+        for dx in range(-r, r + 1):
+            yield (cy - r, cx + dx)
+            yield (cy + r, cx + dx)
+        for dy in range(-r + 1, r):
+            yield (cy + dy, cx - r)
+            yield (cy + dy, cx + r)
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import numpy as np
+from helper_functions import travel_time
+import instrumentation
+
+# ================== Location Index ==================
+
+# The travel-time matrix only depends on the coordinates of sites, spots and shops.
+LOCATION_FILES = ("new_1.csv", "new_2.csv", "new_3.csv")
+
+
+class LocationIndex:
+    """
+    Gives every site, spot and shop an integer id (its row in the travel-time matrix).
+    location_ids[i] is the original id (e.g. "A001", "B0006", "S002"); lat[i], lng[i] its coordinates.
+    """
+    def __init__(self, location_ids, lats, lngs):
+        self.location_ids = list(location_ids)
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lng = np.asarray(lngs, dtype=np.float64)
+        self.id_to_idx = {loc: i for i, loc in enumerate(self.location_ids)}
+
+    def __len__(self):
+        return len(self.location_ids)
+
+    def __getitem__(self, location_id):
+        return self.id_to_idx[location_id]
+
+    def get(self, location_id, default=None):
+        return self.id_to_idx.get(location_id, default)
+
+
+def build_location_index(sites, spots, shops):
+    """Build a LocationIndex from the site, spot and shop DataFrames (sites first, then spots, then shops)."""
+    frames = [(sites, "Site_id"), (spots, "Spot_id"), (shops, "Shop_id")]
+    ids = np.concatenate([df[col].to_numpy() for df, col in frames])
+    lats = np.concatenate([df["Lat"].to_numpy(dtype=np.float64) for df, _ in frames])
+    lngs = np.concatenate([df["Lng"].to_numpy(dtype=np.float64) for df, _ in frames])
+    return LocationIndex(ids, lats, lngs)
+
+# ================== Vectorized Haversine ==================
+
+def haversine_matrix(lat1, lng1, lat2, lng2):
+    """Pairwise Haversine distances (in km) between points (lat1, lng1) and points (lat2, lng2)."""
+    R = 6378.137
+    lat1_rad = np.radians(np.asarray(lat1, dtype=np.float64))[:, None]
+    lng1_rad = np.radians(np.asarray(lng1, dtype=np.float64))[:, None]
+    lat2_rad = np.radians(np.asarray(lat2, dtype=np.float64))[None, :]
+    lng2_rad = np.radians(np.asarray(lng2, dtype=np.float64))[None, :]
+    a = np.sin((lat2_rad - lat1_rad) / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin((lng2_rad - lng1_rad) / 2)**2
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def travel_time_rows(index, rows):
+    """Travel times (in minutes) from the locations in `rows` to every location of the index."""
+    rows = np.asarray(rows, dtype=np.int64)
+    return travel_time(haversine_matrix(index.lat[rows], index.lng[rows], index.lat, index.lng))
+
+def dataset_hash(data_dir="./Dataset", files=LOCATION_FILES):
+    """SHA-1 over the contents of the given CSV files, used as the cache key."""
+    h = hashlib.sha1()
+    for name in files:
+        with open(os.path.join(data_dir, name), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+# ================== Travel-Time Matrix ==================
+
+class TravelTimes:
+    """
+    Travel-time lookups between location indices.
+    Either backed by a full (memory-mapped) matrix, see TravelTimes.cached(),
+    or lazy: rows are computed with vectorized haversine the first time they are needed.
+    """
+    def __init__(self, index, matrix=None, path=None):
+        self.index = index
+        self.matrix = matrix
+        self.path = path
+        self._rows = {}
+
+    @classmethod
+    def lazy(cls, index):
+        return cls(index)
+
+    @classmethod
+    def cached(cls, index, data_dir="./Dataset", cache_dir="./cache", dtype=np.float32, block=512):
+        """
+        Load the full matrix from `cache_dir`, building it first if no cache exists for the
+        current location CSVs. The file is memory-mapped, so later runs start instantly.
+        """
+        dtype = np.dtype(dtype)
+        path = os.path.join(cache_dir, f"travel_times_{dataset_hash(data_dir)}_{dtype.name}.npy")
+        if not os.path.exists(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            n = len(index)
+            tmp_path = path + ".tmp"
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(n, n))
+            for start in range(0, n, block):
+                out[start:start + block] = travel_time_rows(index, np.arange(start, min(start + block, n)))
+            out.flush()
+            del out
+            os.replace(tmp_path, path)
+        return cls(index, np.load(path, mmap_mode="r"), path)
+
+    def __getstate__(self):
+        # A memory-mapped matrix is re-opened from its file instead of being pickled.
+        state = dict(self.__dict__)
+        if self.path is not None:
+            state["matrix"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.path is not None:
+            self.matrix = np.load(self.path, mmap_mode="r")
+
+    def prefetch(self, loc_indices):
+        """Compute the rows of the given locations in one vectorized call (lazy mode only)."""
+        if self.matrix is not None:
+            return
+        missing = [i for i in set(loc_indices) if i not in self._rows]
+        instrumentation.count("travel_rows_computed", len(missing))
+        if missing:
+            for i, row in zip(missing, travel_time_rows(self.index, missing)):
+                self._rows[i] = row
+
+    def row(self, i):
+        if self.matrix is not None:
+            return self.matrix[i]
+        row = self._rows.get(i)
+        if row is None:
+            instrumentation.count("travel_rows_computed")
+            row = travel_time_rows(self.index, [i])[0]
+            self._rows[i] = row
+        else:
+            instrumentation.count("travel_row_cache_hits")
+        return row
+
+    def get(self, i, j):
+        """Travel time in minutes from location index i to location index j."""
+        if self.matrix is not None:
+            return float(self.matrix[i, j])
+        return float(self.row(i)[j])
+
+    def submatrix(self, loc_indices):
+        """Dense travel-time block between the given locations (rows and columns in the given order)."""
+        loc_indices = np.asarray(loc_indices, dtype=np.int64)
+        if self.matrix is not None:
+            return np.asarray(self.matrix[np.ix_(loc_indices, loc_indices)], dtype=np.float64)
+        self.prefetch(loc_indices.tolist())
+        return np.stack([self._rows[i][loc_indices] for i in loc_indices.tolist()]) if len(loc_indices) else np.zeros((0, 0))
@@ -1,18 +1,32 @@
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.io.img_tiles as cimgt
 import atexit
+import matplotlib.pyplot as plt
+
+# ================== Visualization Plugin ==================
+# Only imported when visualization is requested (e.g. initial_solution(..., visualize=True)),
+# so the solver itself never loads matplotlib, contextily or cartopy.
+# The basemap libraries are imported on first use as well.
 
-# Create a tile source for the basemap
-tiler = cimgt.Stamen('terrain-background')  # Other options: 'toner', 'watercolor'
-# Use a global axis with a PlateCarree projection (for lat/lon)
-proj = ccrs.PlateCarree()
+_tiler = None
+_proj = None
+
+def _cartopy():
+    """Tile source and PlateCarree projection, created on first use."""
+    global _tiler, _proj
+    if _tiler is None:
+        import cartopy.crs as ccrs
+        import cartopy.io.img_tiles as cimgt
+        # Create a tile source for the basemap
+        _tiler = cimgt.Stamen('terrain-background')  # Other options: 'toner', 'watercolor'
+        # Use a global axis with a PlateCarree projection (for lat/lon)
+        _proj = ccrs.PlateCarree()
+    return _tiler, _proj
 
 def visualize_routes(routes, title="Current Routes"):
+    tiler, proj = _cartopy()
     # Create a new figure with Cartopy projection
     fig = plt.figure(figsize=(8, 6))
     ax = plt.axes(projection=proj)
-    
+
     # Collect all longitudes and latitudes for determining extent
     all_lngs, all_lats = [], []
     for route in routes.values():
@@ -20,16 +34,16 @@ def visualize_routes(routes, title="Current Routes"):
         lats = [stop.lat for stop in route.stops]
         all_lngs.extend(lngs)
         all_lats.extend(lats)
-    
+
     if all_lngs and all_lats:
         margin = 0.05
         min_lng, max_lng = min(all_lngs), max(all_lngs)
         min_lat, max_lat = min(all_lats), max(all_lats)
         ax.set_extent([min_lng - margin, max_lng + margin, min_lat - margin, max_lat + margin], crs=proj)
-    
+
     # Add the basemap image
     ax.add_image(tiler, 12)  # Zoom level 12 (adjust as needed)
-    
+
     # Plot each route on top of the basemap
     for route in routes.values():
         lngs = [stop.lng for stop in route.stops]
@@ -42,11 +56,47 @@ def visualize_routes(routes, title="Current Routes"):
         #     for idx, stop in enumerate(route.stops[1:], start=1):
         #         label = str(stop.order_id) if stop.order_id is not None else ""
         #         ax.text(lngs[idx], lats[idx], label, fontsize=8, transform=proj)
-    
+
     plt.title(title)
     plt.pause(0.1)
     plt.draw()
     plt.show(block=False)  # Non-blocking show
 
+def plot_routes_basemap(routes, title="Current Routes"):
+    """Redraw the routes on the current figure over a CartoDB basemap (contextily)."""
+    import contextily as ctx
+    plt.clf()  # Clear current figure
+    ax = plt.gca()
+
+    # Plot each route with small markers and lines
+    for route in routes.values():
+        lats = [stop.lat for stop in route.stops]
+        lngs = [stop.lng for stop in route.stops]
+        ax.plot(lngs, lats, marker='o', linestyle='-', linewidth=1, markersize=3, alpha=0.5)
+
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.set_title(title)
+
+    # Determine plot extents from all stops to ensure the basemap covers the area
+    all_lats = []
+    all_lngs = []
+    for route in routes.values():
+        all_lats.extend([stop.lat for stop in route.stops])
+        all_lngs.extend([stop.lng for stop in route.stops])
+    if all_lats and all_lngs:
+        margin = 0  # Adjust as needed for a small border around the points
+        ax.set_xlim(min(all_lngs) - margin, max(all_lngs) + margin)
+        ax.set_ylim(min(all_lats) - margin, max(all_lats) + margin)
+
+    # Add a clean background map using CartoDB Positron style.
+    # The crs parameter tells contextily that our data is in EPSG:4326.
+    try:
+        ctx.add_basemap(ax, crs="EPSG:4326", source=ctx.providers.CartoDB.Positron)
+    except Exception as e:
+        print("Error adding basemap:", e)
+
+    plt.pause(0.1)  # Pause briefly to update the figure
+
 # Register an exit handler to close all figures when the program exits
 atexit.register(plt.close, 'all')
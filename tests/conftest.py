@@ -0,0 +1,110 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "heursitic+localsearch"))
+
+from data_structures import Route, Stop
+from solution import recalc_route_times, set_travel_times
+from travel_matrix import LocationIndex, TravelTimes
+
+# ================== Seeded Random Instances ==================
+
+class RandomInstance:
+    """
+    Sites, spots and shops scattered around one city center, numbered like the travel matrix
+    (sites, then spots, then shops), with e-commerce stops and O2O (pickup, delivery) pairs.
+    A share of the O2O delivery windows is tight, so random routes are often infeasible.
+    """
+    def __init__(self, seed, n_sites=3, n_spots=40, n_shops=10, n_ecommerce=30, n_o2o=12):
+        rng = np.random.default_rng(seed)
+        ids = ([f"A{i:03d}" for i in range(n_sites)] + [f"B{i:04d}" for i in range(n_spots)] +
+               [f"S{i:03d}" for i in range(n_shops)])
+        n = len(ids)
+        lat = 31.2 + rng.uniform(-0.02, 0.02, n)
+        lng = 121.4 + rng.uniform(-0.02, 0.02, n)
+        self.index = LocationIndex(ids, lat, lng)
+        self.sites = pd.DataFrame({"Site_id": ids[:n_sites], "Lng": lng[:n_sites], "Lat": lat[:n_sites]})
+        self.depots = [self._stop(i, "site", latest=720) for i in range(n_sites)]
+        spots = n_sites + rng.integers(0, n_spots, n_ecommerce + n_o2o)
+        shops = n_sites + n_spots + rng.integers(0, n_shops, n_o2o)
+        self.ecommerce_stops = [
+            self._stop(int(spot), "ecommerce_delivery", order_id=f"E{k:04d}", packages=int(rng.integers(1, 12)),
+                       latest=720)
+            for k, spot in enumerate(spots[:n_ecommerce])
+        ]
+        self.o2o_stop_pairs = []
+        for k, (shop, spot) in enumerate(zip(shops, spots[n_ecommerce:])):
+            order_id = f"O{k:04d}"
+            packages = int(rng.integers(1, 50))
+            pickup = int(rng.integers(0, 240))
+            delivery = pickup + int(rng.choice([120, 360, 600]))
+            self.o2o_stop_pairs.append((
+                self._stop(int(shop), "shop", order_id=order_id, packages=packages, earliest=pickup,
+                           latest=720, paired_order_id=order_id),
+                self._stop(int(spot), "delivery", order_id=order_id, packages=packages, latest=delivery,
+                           paired_order_id=order_id),
+            ))
+        self.rng = rng
+
+    def _stop(self, loc, stop_type, **kwargs):
+        return Stop(location_id=self.index.location_ids[loc], lat=float(self.index.lat[loc]),
+                    lng=float(self.index.lng[loc]), stop_type=stop_type, loc_idx=loc, **kwargs)
+
+    def couriers(self, n):
+        return pd.DataFrame({"Courier_id": [f"D{i:03d}" for i in range(n)]})
+
+    def random_sequence(self, n_ecommerce, n_o2o):
+        """A random stop order after a depot, every pickup before its delivery."""
+        rng = self.rng
+        units = [(self.ecommerce_stops[k],) for k in rng.choice(len(self.ecommerce_stops), n_ecommerce, replace=False)]
+        units += [self.o2o_stop_pairs[k] for k in rng.choice(len(self.o2o_stop_pairs), n_o2o, replace=False)]
+        slots = [stop for unit in units for stop in unit]
+        order = rng.permutation(len(slots))
+        # Positions of each unit, sorted, so the pickup gets the earlier one
+        placed = [None] * len(slots)
+        start = 0
+        for unit in units:
+            positions = sorted(order[start:start + len(unit)])
+            for pos, stop in zip(positions, unit):
+                placed[pos] = stop
+            start += len(unit)
+        return [self.depots[int(rng.integers(len(self.depots)))]] + placed
+
+    def random_route(self, courier_id, n_ecommerce, n_o2o):
+        stops = self.random_sequence(n_ecommerce, n_o2o)
+        return make_route(courier_id, stops)
+
+
+def make_route(courier_id, stops):
+    """A timed Route visiting `stops` (the first one is the depot)."""
+    route = Route(courier_id, stops[0])
+    route.stops = list(stops)
+    recalc_route_times(route)
+    return route
+
+
+@pytest.fixture(autouse=True)
+def no_global_travel_times():
+    """Tests start with per-leg haversine; a test that installs a travel matrix gets it removed again."""
+    set_travel_times(None)
+    yield
+    set_travel_times(None)
+
+
+@pytest.fixture(params=[0, 1, 2])
+def instance(request):
+    return RandomInstance(request.param)
+
+
+@pytest.fixture
+def travel_times(instance):
+    """Lazy travel-time matrix over the instance's locations, installed for route evaluation."""
+    travel_times = TravelTimes.lazy(instance.index)
+    set_travel_times(travel_times)
+    return travel_times
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from batch_evaluator import BatchEvaluator, pad_sequences, reversal_moves, reversed_sequences, stop_travel_times
+from conftest import make_route
+from data_structures import StopTable
+from solution import MAX_CAPACITY, MAX_WORK_MINUTES, recalc_route_times
+
+# ================== BatchEvaluator vs recalc_route_times ==================
+
+def _table(sequences):
+    """StopTable over the distinct stops of `sequences` and each sequence as table rows."""
+    stops = list({id(stop): stop for seq in sequences for stop in seq}.values())
+    table = StopTable(stops)
+    return table, [[table.row(stop) for stop in seq] for seq in sequences]
+
+
+@pytest.mark.parametrize("matrix", [False, True])
+def test_evaluate_matches_recalc(instance, request, matrix):
+    travel_times = request.getfixturevalue("travel_times") if matrix else None
+    rng = instance.rng
+    sequences = [instance.random_sequence(int(rng.integers(0, 12)), int(rng.integers(0, 5))) for _ in range(60)]
+    table, rows = _table(sequences)
+    evaluator = BatchEvaluator(table, stop_travel_times(table, travel_times), MAX_CAPACITY, MAX_WORK_MINUTES)
+    total_time, feasible, penalty = evaluator.evaluate(pad_sequences(rows))
+    expected = [recalc_route_times(make_route("D000", seq)) for seq in sequences]
+    assert total_time == pytest.approx([e[0] for e in expected], abs=1e-6)
+    assert feasible.tolist() == [e[1] for e in expected]
+    assert penalty == pytest.approx([e[2] for e in expected], abs=1e-6)
+    assert 0 < feasible.sum() < len(sequences)
+
+
+def test_schedule_matches_route_and_pads_with_last_departure(instance):
+    sequences = [instance.random_sequence(6, 2), instance.random_sequence(2, 1), instance.random_sequence(9, 3)]
+    table, rows = _table(sequences)
+    batch = pad_sequences(rows)
+    width = batch.shape[1]
+    arrival, departure, load = BatchEvaluator(table, stop_travel_times(table)).schedule(batch)
+    for r, seq in enumerate(sequences):
+        route = make_route("D000", seq)
+        n = len(seq)
+        assert arrival[r, :n] == pytest.approx(route.arrival)
+        assert departure[r, :n] == pytest.approx(route.departure)
+        assert load[r, n - 1] == route.load
+        assert arrival[r, n:] == pytest.approx(np.full(width - n, departure[r, n - 1]))
+        assert departure[r, n:] == pytest.approx(np.full(width - n, departure[r, n - 1]))
+        assert (load[r, n:] == load[r, n - 1]).all()
+
+# ================== Batch 2-opt Moves ==================
+
+def _keeps_precedence(table, order):
+    position = {row: pos for pos, row in enumerate(order.tolist())}
+    return all(position[pickup] < position[row]
+               for row, pickup in enumerate(table.pair.tolist())
+               if pickup >= 0 and table.stops[row].stop_type == "delivery" and row in position and pickup in position)
+
+
+def test_reversal_moves_are_exactly_the_precedence_keeping_ones(instance):
+    for _ in range(20):
+        table, (order,) = _table([instance.random_sequence(6, 4)])
+        order = np.asarray(order)
+        n = len(order)
+        i, j = reversal_moves(order, table)
+        expected = [(a, b) for a in range(1, n - 1) for b in range(a + 1, n - 1)
+                    if _keeps_precedence(table, reversed_sequences(order, np.array([a]), np.array([b]))[0])]
+        assert list(zip(i.tolist(), j.tolist())) == expected
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from clustering import allocate_couriers, assign_stops, balanced_partition, cluster_stops, load_centroids, save_centroids
+from order_index import OrderIndex
+
+# ================== Balanced Partition ==================
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    coords = np.column_stack([31.2 + rng.uniform(-0.05, 0.05, n), 121.4 + rng.uniform(-0.05, 0.05, n)])
+    return coords, np.ones(n), rng.integers(1, 50, n).astype(np.float64)
+
+
+@pytest.mark.parametrize("max_stops,max_packages", [(None, None), (37, None), (None, 900), (60, 700)])
+def test_partition_respects_the_caps(max_stops, max_packages):
+    coords, n_stops, packages = _points(500)
+    model = balanced_partition(coords, n_stops, packages, 6, max_stops, max_packages)
+    labels = model.labels_
+    assert len(labels) == len(coords)
+    assert sorted(set(labels.tolist())) == list(range(model.n_clusters))
+    assert model.n_clusters >= 6
+    for c in range(model.n_clusters):
+        if max_stops:
+            assert n_stops[labels == c].sum() <= max_stops
+        if max_packages:
+            assert packages[labels == c].sum() <= max_packages
+        assert model.cluster_centers_[c] == pytest.approx(coords[labels == c].mean(axis=0))
+    assert (model.predict(model.cluster_centers_) == np.arange(model.n_clusters)).all()
+
+
+def test_partition_balances_the_workload():
+    coords, n_stops, packages = _points(600, seed=1)
+    for k in (2, 5, 8):
+        counts = np.bincount(balanced_partition(coords, n_stops, packages, k).labels_)
+        assert len(counts) == k
+        assert counts.max() - counts.min() <= 1
+    weights = np.bincount(balanced_partition(coords, n_stops, packages, 4, max_packages=packages.sum() / 4 + 50).labels_,
+                          weights=packages)
+    assert weights.max() - weights.min() <= 2 * packages.max()
+
+
+def test_partition_of_no_points_is_empty():
+    model = balanced_partition(np.zeros((0, 2)), [], [], 3)
+    assert len(model.labels_) == 0 and model.n_clusters == 0
+
+# ================== Courier Allocation ==================
+
+def _check(allocation, workloads, courier_ids):
+    assert allocation.keys() == workloads.keys()
+    handed_out = [cid for c in sorted(allocation) for cid in allocation[c]]
+    assert handed_out == list(courier_ids)  # every courier exactly once, in consecutive blocks
+
+
+def test_allocation_is_proportional_to_workload():
+    workloads = {0: 10.0, 1: 30.0, 2: 60.0}
+    courier_ids = [f"D{i:03d}" for i in range(20)]
+    allocation = allocate_couriers(workloads, courier_ids)
+    _check(allocation, workloads, courier_ids)
+    assert {c: len(ids) for c, ids in allocation.items()} == {0: 2, 1: 6, 2: 12}
+
+
+@pytest.mark.parametrize("n_couriers", [5, 6, 7, 13])
+def test_every_cluster_gets_a_courier(n_couriers):
+    workloads = {0: 1000.0, 1: 1.0, 2: 2.0, 3: 0.5, 4: 3.0}
+    courier_ids = [f"D{i:03d}" for i in range(n_couriers)]
+    allocation = allocate_couriers(workloads, courier_ids)
+    _check(allocation, workloads, courier_ids)
+    assert min(len(ids) for ids in allocation.values()) == 1
+    assert len(allocation[0]) == n_couriers - 4
+
+
+def test_allocation_with_fewer_couriers_than_clusters_or_no_workload():
+    workloads = {0: 5.0, 1: 3.0, 2: 1.0}
+    allocation = allocate_couriers(workloads, ["D000", "D001"])
+    _check(allocation, workloads, ["D000", "D001"])
+    assert [len(allocation[c]) for c in (0, 1, 2)] == [1, 1, 0]
+
+    allocation = allocate_couriers({0: 0.0, 1: 0.0}, ["D000", "D001", "D002", "D003"])
+    assert [len(allocation[c]) for c in (0, 1)] == [2, 2]
+    assert allocate_couriers({}, ["D000"]) == {}
+
+# ================== Warm Starts and Incremental Assignment ==================
+
+def _deliveries(instance):
+    return instance.ecommerce_stops + [delivery for _, delivery in instance.o2o_stop_pairs]
+
+
+@pytest.mark.parametrize("method", ["kmeans", "minibatch"])
+def test_centroids_round_trip_and_warm_start(instance, tmp_path, method):
+    stops, model = cluster_stops(_deliveries(instance), n_clusters=4, method=method)
+    labels = [stop.cluster_id for stop in stops]
+    assert sorted(set(labels)) == [0, 1, 2, 3]
+    path = str(tmp_path / "centroids" / "centers.npy")
+    assert load_centroids(path) is None
+    save_centroids(model, path)
+    centers = load_centroids(path)
+    assert centers == pytest.approx(model.cluster_centers_)
+
+    # Centers replace n_clusters, and converged centers give the same partition again
+    _, warm = cluster_stops(_deliveries(instance), n_clusters=9, method=method, init_centers=centers)
+    assert len(warm.cluster_centers_) == 4
+    if method == "kmeans":
+        assert [stop.cluster_id for stop in stops] == labels
+        assert warm.cluster_centers_ == pytest.approx(centers)
+
+
+def test_new_stops_join_the_nearest_cluster(instance):
+    old_pairs, new_pairs = instance.o2o_stop_pairs[:6], instance.o2o_stop_pairs[6:]
+    _, model = cluster_stops(instance.ecommerce_stops + [d for _, d in old_pairs], n_clusters=3, method="minibatch")
+    new_stops = [stop for pair in new_pairs for stop in pair]
+    labels = assign_stops(new_stops, model, order_index=OrderIndex([], new_pairs))
+    coords = np.array([(d.lat, d.lng) for _, d in new_pairs])
+    nearest = ((coords[:, None, :] - model.cluster_centers_[None, :, :])**2).sum(axis=2).argmin(axis=1)
+    assert labels.tolist() == nearest.tolist()
+    for (pickup, delivery), label in zip(new_pairs, labels):
+        assert pickup.cluster_id == delivery.cluster_id == label
+
+    before = model.cluster_centers_.copy()
+    assign_stops(new_stops, model, update=True)
+    assert (model.cluster_centers_ != before).any()  # partial_fit moved the centers
+    _, kmeans = cluster_stops(_deliveries(instance), n_clusters=3)
+    with pytest.raises(ValueError):
+        assign_stops(new_stops, kmeans, update=True)
+    assert len(assign_stops([], model)) == 0
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_route
+from data_structures import Stop
+from solution import _insert, append_stops, evaluate_append, initial_solution, recalc_route_times
+from spatial_index import TailGrid
+
+# ================== Insertion Scoring vs recalc_route_times ==================
+
+def _state(route):
+    return list(route.stops), list(route.arrival), list(route.departure), route.load, route.penalty, route.feasible
+
+
+@pytest.mark.parametrize("matrix", [False, True])
+def test_append_scores_match_recalc(instance, request, matrix):
+    if matrix:
+        request.getfixturevalue("travel_times")
+    feasible = 0
+    for _ in range(20):
+        stops = instance.random_sequence(6, 3)
+        for cut in range(1, len(stops)):
+            route = make_route("D000", stops[:cut])
+            before = _state(route)
+            fresh = make_route("D000", stops)
+            total_time, ok, penalty = recalc_route_times(fresh)
+
+            scored = evaluate_append(route, stops[cut:])
+            assert _state(route) == before  # scoring leaves the route as it was
+            assert scored[1] == ok
+            assert scored[0] == pytest.approx(total_time, abs=1e-9)
+            assert scored[2] == pytest.approx(penalty, abs=1e-9)
+
+            appended = append_stops(route, stops[cut:])
+            assert appended[1] == ok
+            assert appended[0] == pytest.approx(total_time, abs=1e-9)
+            assert route.stops == fresh.stops
+            assert route.arrival == pytest.approx(fresh.arrival)
+            assert route.departure == pytest.approx(fresh.departure)
+            assert (route.load, route.feasible) == (fresh.load, fresh.feasible)
+            assert route.penalty == pytest.approx(fresh.penalty)
+            feasible += ok
+    assert feasible > 0
+
+# ================== Candidate Couriers ==================
+
+def test_candidate_k_falls_back_to_every_courier(instance):
+    stop = instance.ecommerce_stops[0]
+    # D000 ends right at the new order but only after its window closes; D001 is idle further away
+    busy = Stop(stop.location_id, stop.lat, stop.lng, "ecommerce_delivery", order_id="busy", packages=1,
+                earliest=650, latest=720)
+    near = make_route("D000", [instance.depots[0], busy])
+    far = make_route("D001", [Stop("A999", stop.lat + 0.03, stop.lng + 0.03, "site", latest=720)])
+    new = Stop(stop.location_id, stop.lat + 0.001, stop.lng, "ecommerce_delivery", order_id="new", packages=1,
+               latest=600)
+    tails = TailGrid()
+    for route in (near, far):
+        tails.update(route.courier_id, route.stops[-1].lat, route.stops[-1].lng)
+    assert tails.nearest(new.lat, new.lng, 1) == ["D000"]
+
+    routes = {"D000": near, "D001": far}
+    assert _insert(routes, (new,), tails, candidate_k=1) is far
+    assert far.stops[-1] is new and near.stops[-1] is busy
+    assert tails.nearest(new.lat, new.lng, 1) == ["D001"]  # the tail moved to the new order
+
+    # No courier at all can serve it: nothing changes
+    impossible = Stop(stop.location_id, stop.lat, stop.lng, "ecommerce_delivery", order_id="x", packages=1, latest=-1)
+    assert _insert(routes, (impossible,), tails, candidate_k=1) is None
+    assert [len(route.stops) for route in routes.values()] == [2, 2]
+
+
+def test_construction_with_candidates_places_each_order_once(instance):
+    random.seed(0)
+    np.random.seed(0)
+    routes = initial_solution(instance.sites, instance.ecommerce_stops, instance.o2o_stop_pairs,
+                              instance.couriers(6), candidate_k=2)
+    placed = [id(stop) for route in routes.values() for stop in route.stops[1:]]
+    assert len(placed) == len(set(placed)) and len(placed) > 0
+    for route in routes.values():
+        assert recalc_route_times(route)[1]
+        for pos, stop in enumerate(route.stops):
+            if stop.stop_type == "shop":
+                # A pair is appended at once, so its delivery follows its pickup directly
+                assert route.stops[pos + 1].order_id == stop.order_id
@@ -0,0 +1,36 @@
+import pytest
+
+from conftest import make_route
+from data_structures import StopTable
+
+# ================== Shared Stops ==================
+
+def test_overlapping_tables_keep_their_own_rows(instance):
+    (p1, d1), (p2, d2) = instance.o2o_stop_pairs[:2]
+    depot = instance.depots[0]
+    first = StopTable([depot, p1, d1, p2, d2])
+    second = StopTable([depot, d2, p2, d1, p1])  # same stops, other rows; built after `first`
+    route = make_route("D000", [depot, p1, p2, d1, d2])
+    assert first.indices(route).tolist() == [0, 1, 3, 2, 4]
+    assert second.indices(route).tolist() == [0, 4, 2, 3, 1]
+    assert first.pair.tolist() == [-1, 2, 1, 4, 3]
+    assert second.pair.tolist() == [-1, 2, 1, 4, 3]
+
+
+def test_stops_are_not_written_by_tables(instance):
+    stop = instance.ecommerce_stops[0]
+    StopTable([instance.depots[0], stop])
+    with pytest.raises(AttributeError):
+        stop.idx
+    with pytest.raises(KeyError):
+        StopTable([instance.depots[0]]).row(stop)
+
+
+def test_route_copy_shares_stops_but_not_the_schedule(instance):
+    route = instance.random_route("D000", 4, 2)
+    copy = route.copy()
+    copy.stops.pop()
+    copy.departure[-1] = -1
+    assert len(route.stops) == len(copy.stops) + 1
+    assert route.departure[-1] != -1
+    assert all(a is b for a, b in zip(route.stops, copy.stops))
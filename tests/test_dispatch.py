@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from dispatch import DispatchEngine
+from solution import initial_solution, recalc_route_times
+
+# ================== Online Dispatch Invariants ==================
+
+def _engine(instance, k=10):
+    random.seed(0)
+    np.random.seed(0)
+    routes = initial_solution(instance.sites, instance.ecommerce_stops, [], instance.couriers(4))
+    return DispatchEngine(routes, k)
+
+
+def _o2o_positions(route, order_id):
+    return [(pos, stop.stop_type) for pos, stop in enumerate(route.stops) if stop.order_id == order_id]
+
+
+def test_submitted_orders_are_inserted_after_the_started_part(instance, travel_times):
+    engine = _engine(instance)
+    ecommerce = sorted(id(stop) for route in engine.routes.values() for stop in route.stops[1:])
+    for pickup, delivery in sorted(instance.o2o_stop_pairs, key=lambda pair: pair[0].earliest):
+        release = max(engine.now, pickup.earliest - 60)
+        engine.advance(release)
+        # Stops a courier has left by now cannot change
+        started = {courier_id: [id(stop) for stop, departure in zip(route.stops, route.departure)
+                                if departure <= engine.now]
+                   for courier_id, route in engine.routes.items()}
+        courier_id = engine.submit(pickup, delivery)
+        for cid, route in engine.routes.items():
+            assert [id(stop) for stop in route.stops[:len(started[cid])]] == started[cid]
+        if courier_id is None:
+            assert delivery.order_id in engine.rejected
+            continue
+        route = engine.routes[courier_id]
+        positions = _o2o_positions(route, delivery.order_id)
+        assert [stop_type for _, stop_type in positions] == ["shop", "delivery"]
+        pickup_pos = positions[0][0]
+        assert route.stops[pickup_pos].location_id == pickup.location_id
+        assert pickup_pos >= len(started[courier_id])
+
+    assert len(engine.assigned) + len(engine.rejected) == len(instance.o2o_stop_pairs)
+    assert len(engine.assigned) > 0
+    remaining = sorted(id(stop) for route in engine.routes.values() for stop in route.stops[1:]
+                       if stop.stop_type == "ecommerce_delivery")
+    assert remaining == ecommerce
+    for courier_id, route in engine.routes.items():
+        _, feasible, _ = recalc_route_times(route)
+        assert feasible
+        for order_id, cid in engine.assigned.items():
+            if cid == courier_id:
+                assert [t for _, t in _o2o_positions(route, order_id)] == ["shop", "delivery"]
+
+
+def test_replay_reports_every_order(instance, travel_times):
+    engine = _engine(instance)
+    stats = engine.replay(instance.o2o_stop_pairs, lead=30)
+    assert stats["orders"] == len(instance.o2o_stop_pairs)
+    assert stats["assigned"] + stats["rejected"] == stats["orders"]
+    assert stats["infeasible_routes"] == 0
+    assert stats["total_time"] == pytest.approx(sum(recalc_route_times(r)[0] for r in engine.routes.values()))
+
+
+def test_clock_cannot_go_back(instance):
+    engine = _engine(instance)
+    engine.advance(100)
+    with pytest.raises(ValueError):
+        engine.advance(50)
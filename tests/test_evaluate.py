@@ -0,0 +1,138 @@
+import pandas as pd
+import pytest
+
+import evaluate
+from conftest import make_route
+from data_structures import Stop
+from evaluate import EvalInstance, SCHEDULE_COLUMNS, cal_proctime, read_schedule, time2min, validate
+from solution import save_schedule_to_csv
+
+# ================== Hand-built Instance and Schedule ==================
+
+@pytest.fixture
+def eval_instance():
+    return EvalInstance(
+        site_df=pd.DataFrame({"Site_id": ["A001"], "Lng": [121.40], "Lat": [31.20]}),
+        spot_df=pd.DataFrame({"Spot_id": ["B0001", "B0002"], "Lng": [121.41, 121.42], "Lat": [31.21, 31.19]}),
+        shop_df=pd.DataFrame({"Shop_id": ["S001"], "Lng": [121.43], "Lat": [31.20]}),
+        ds_order_df=pd.DataFrame({"Order_id": ["E1"], "Spot_id": ["B0001"], "Site_id": ["A001"], "Num": [5]}),
+        o2o_order_df=pd.DataFrame({"Order_id": ["F1"], "Spot_id": ["B0002"], "Shop_id": ["S001"],
+                                   "Pickup_time": ["09:00"], "Delivery_time": ["10:00"], "Num": [10]}),
+        courier_df=pd.DataFrame({"Courier_id": ["D001"]}),
+    )
+
+
+def timed_schedule(instance, visits):
+    """Schedule rows for (addr, order_id, amount) visits of courier D001, timed by evaluate.py's rules."""
+    rows = []
+    departure = 0.0
+    prev = None
+    for addr, order_id, amount in visits:
+        arrival = departure if prev is None else departure + float(instance.cost(
+            instance.node_index.get_loc(prev), instance.node_index.get_loc(addr)))
+        if addr.startswith("A"):
+            departure = arrival
+        elif addr.startswith("S"):
+            departure = max(arrival, float(time2min("09:00")))
+        else:
+            departure = arrival + float(cal_proctime(abs(amount)))
+        rows.append(["D001", addr, arrival, departure, amount, order_id])
+        prev = addr
+    return pd.DataFrame(rows, columns=SCHEDULE_COLUMNS)
+
+
+@pytest.fixture
+def schedule(eval_instance):
+    return timed_schedule(eval_instance, [("A001", "E1", 5), ("B0001", "E1", -5),
+                                          ("S001", "F1", 10), ("B0002", "F1", -10)])
+
+
+def test_valid_schedule_passes(eval_instance, schedule):
+    report = validate(schedule, eval_instance)
+    assert report.passed, report.summary()
+    assert report.cost == schedule.Departure.iloc[-1]
+
+# ================== One Violation per Rule ==================
+
+def _retimed(visits):
+    return lambda instance, schedule: timed_schedule(instance, visits)
+
+
+def _set(row, **values):
+    def change(instance, schedule):
+        for column, value in values.items():
+            schedule.loc[row, column] = value
+        return schedule
+    return change
+
+
+def _drop(rows):
+    return lambda instance, schedule: schedule.drop(index=rows).reset_index(drop=True)
+
+
+def _shift_pickup_early(instance, schedule):
+    schedule.loc[2, ["Arrival_time", "Departure"]] = [schedule.Arrival_time[2], schedule.Arrival_time[2]]
+    return schedule
+
+
+VIOLATIONS = {
+    "v2": _set(1, Arrival_time=-1.0),
+    "v3": _set(1, Departure=5.0),
+    "v4": lambda instance, schedule: pd.concat([schedule, schedule.iloc[[3]]], ignore_index=True),
+    "v5": _retimed([("A001", "E1", 5), ("B0002", "E1", -5), ("S001", "F1", 10), ("B0002", "F1", -10)]),
+    "v6": _shift_pickup_early,
+    "v7": _retimed([("A001", "E1", 5), ("B0001", "E1", -4), ("S001", "F1", 10), ("B0002", "F1", -10)]),
+    "v8": _drop([0, 1]),
+    "v9": _set(3, Arrival_time=1000.0, Departure=1100.0),
+    "v10": _retimed([("A001", "E1", 5), ("B0001", "E1", -5), ("S001", "F1", 150), ("B0002", "F1", -150)]),
+    "v11": _retimed([("B0002", "E1", 5), ("B0001", "E1", -5), ("S001", "F1", 10), ("B0002", "F1", -10)]),
+}
+
+
+@pytest.mark.parametrize("rule", sorted(VIOLATIONS, key=lambda rule: int(rule[1:])))
+def test_each_rule_flags_its_violation(eval_instance, schedule, rule):
+    broken = VIOLATIONS[rule](eval_instance, schedule.copy())
+    report = validate(broken, eval_instance)
+    assert report.counts()[rule] > 0, report.summary()
+    assert not report.passed
+    assert set(report.violations.rule) <= set(evaluate.RULES)
+
+
+def test_unknown_courier_rows_fail_the_report(eval_instance, schedule):
+    schedule.loc[:, "Courier_id"] = "D999"
+    report = validate(schedule, eval_instance)
+    assert report.unknown_couriers == 4
+    assert not report.passed
+
+
+def test_parallel_validation_matches_serial(eval_instance, schedule):
+    broken = VIOLATIONS["v9"](eval_instance, schedule.copy())
+    serial = validate(broken, eval_instance)
+    parallel = validate(broken, eval_instance, workers=2)
+    assert parallel.to_dict() == serial.to_dict()
+
+# ================== Solver Schedules ==================
+
+def test_solver_schedule_file_reads_by_column_name(eval_instance, tmp_path):
+    site, spots, shop = eval_instance.site_df.iloc[0], eval_instance.spot_df, eval_instance.shop_df.iloc[0]
+    route = make_route("D001", [
+        Stop("A001", site.Lat, site.Lng, "site"),
+        Stop("B0001", spots.Lat[0], spots.Lng[0], "ecommerce_delivery", order_id="E1", packages=5, latest=720),
+        Stop("S001", shop.Lat, shop.Lng, "shop", order_id="F1", packages=10, earliest=60, latest=720,
+             paired_order_id="F1"),
+        Stop("B0002", spots.Lat[1], spots.Lng[1], "delivery", order_id="F1", packages=10, latest=120,
+             paired_order_id="F1"),
+    ])
+    path = str(tmp_path / "schedule.csv")
+    save_schedule_to_csv({"D001": route}, path)
+
+    schedule = read_schedule(path)
+    assert list(schedule.columns) == SCHEDULE_COLUMNS
+    assert schedule.Addr.tolist() == ["A001", "B0001", "S001", "B0002"]
+    assert schedule.Departure.tolist() == [int(round(d)) for d in route.departure]
+    report = validate(schedule, eval_instance)
+    assert report.unknown_couriers == 0
+    assert report.cost == int(round(route.departure[-1]))
+    headerless = tmp_path / "headerless.csv"
+    schedule.to_csv(headerless, header=False, index=False)
+    pd.testing.assert_frame_equal(read_schedule(str(headerless)), schedule)
@@ -0,0 +1,265 @@
+import os
+
+import numpy as np
+import pytest
+
+from ga import FitnessCache, Generation, IslandModel, attach_shared_array, share_array
+
+# ================== Permutation Operators ==================
+
+N = 12
+CHROMOSOME = 1 + 3 * N  # courier count, order permutation, arrivals, departures
+
+
+def permutation_aim(pop):
+    """Deterministic fitness of an extended-encoding chromosome."""
+    order = pop[1:1 + N] if len(pop) == CHROMOSOME else pop[1:]
+    return float(sum((i + 1) * v for i, v in enumerate(order))), order, {}
+
+
+def _is_permutation(rows, n):
+    return (np.sort(rows, axis=1) == np.arange(1, n + 1)).all()
+
+
+@pytest.mark.parametrize("op", ["_ox", "_pmx"])
+def test_ox_pmx_children_are_permutations_keeping_the_segment(op):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        p1, p2 = rng.permutation(np.arange(1, N + 1)), rng.permutation(np.arange(1, N + 1))
+        cut1, cut2 = np.sort(rng.choice(N + 1, size=2, replace=False))
+        child = getattr(Generation, op)(p1, p2, cut1, cut2, N)
+        assert _is_permutation(child[None, :], N)
+        assert (child[cut1:cut2] == p1[cut1:cut2]).all()
+
+
+def test_repair_keeps_first_occurrences_and_fills_the_rest():
+    g = Generation(permutation_aim, groupnum=2, var_num=CHROMOSOME, seed=0)
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        perm = rng.integers(0, N + 3, size=N)
+        repaired = g.repair_permutation(perm, N)
+        assert _is_permutation(repaired[None, :], N)
+        seen = set()
+        for value, fixed in zip(perm.tolist(), repaired.tolist()):
+            if 1 <= value <= N and value not in seen:
+                assert fixed == value
+            seen.add(value)
+
+
+@pytest.mark.parametrize("crossover", ["onepoint", "ox", "pmx"])
+@pytest.mark.parametrize("extended", [True, False])
+def test_population_stays_valid_over_generations(crossover, extended):
+    # var_num - 1 not divisible by 3: plain encoding, a permutation of 1..var_num-1 after the courier gene
+    var_num = CHROMOSOME if extended else N + 2
+    n = N if extended else var_num - 1
+    g = Generation(permutation_aim, groupnum=10, generation=1, var_num=var_num, crossover=crossover,
+                   crossrate=0.9, variationrate=0.9, var_minrange=[1], var_maxrange=[10], seed=3, elite=2)
+    for _ in range(15):
+        g.geneRevolution()
+        pop = g.population
+        assert pop.shape == (10, var_num)
+        assert ((pop[:, 0] >= 1) & (pop[:, 0] <= 10)).all()
+        assert _is_permutation(pop[:, 1:n + 1], n)
+        if extended:
+            arrival, departure = pop[:, 1 + N:1 + 2 * N], pop[:, 1 + 2 * N:]
+            assert ((arrival >= 0) & (arrival <= 720)).all()
+            assert ((departure >= 0) & (departure <= 720)).all()
+    assert g.best[-1][0] == max(fitness for fitness, _, _ in g.best)
+
+# ================== Selection and History ==================
+
+def courier_aim(pop):
+    """Only chromosomes with 5 couriers have any fitness."""
+    return float(pop[0] == 5), pop[1:1 + N], {}
+
+
+def test_roulette_only_picks_individuals_with_fitness():
+    g = Generation(courier_aim, groupnum=12, var_num=CHROMOSOME, seed=0)
+    g.population[:, 0] = 1
+    g.population[3, 0] = 5
+    chosen = g.choosePopulation()
+    assert (chosen == g.population[3]).all()
+
+
+@pytest.mark.parametrize("selection", ["roulette", "tournament"])
+def test_elites_keep_the_best_fitness_from_dropping(selection):
+    g = Generation(permutation_aim, groupnum=12, generation=30, var_num=CHROMOSOME, seed=2, selection=selection,
+                   tournament_size=3, elite=1, crossrate=0.9, variationrate=0.9)
+    g.geneEvolve()
+    best = [row["best"] for row in g.stats.history]
+    assert best == sorted(best)
+
+
+def test_history_and_hall_of_fame_are_bounded():
+    g = Generation(permutation_aim, groupnum=12, generation=20, var_num=CHROMOSOME, seed=2,
+                   hall_of_fame=3, history_size=5)
+    g.geneEvolve()
+    assert [row["generation"] for row in g.stats.history] == list(range(16, 21))
+    assert (g.stats.generations, g.stats.evaluations) == (20, 20 * 12)
+    fitness = [entry[0] for entry in g.best]
+    assert len(g.best) == 3 and fitness == sorted(fitness)
+    assert len({tuple(entry[1]) for entry in g.best}) == 3
+    assert g.best[-1][0] == g.stats.best
+
+# ================== Batched Evaluation ==================
+
+def batch_permutation_aim(pop_array):
+    """permutation_aim over a whole population at once: (fitness vector, payloads)."""
+    return pop_array[:, 1:1 + N] @ np.arange(1, N + 1), [{} for _ in range(len(pop_array))]
+
+
+def _run(aim, **kwargs):
+    g = Generation(aim, groupnum=12, generation=10, var_num=CHROMOSOME, seed=4, **kwargs)
+    best = g.geneEvolve()
+    return best[0], best[1], list(g.stats.history)
+
+
+def test_batch_evaluation_matches_per_individual():
+    calls = []
+
+    def counting_batch_aim(pop_array):
+        calls.append(pop_array.shape)
+        return batch_permutation_aim(pop_array)
+
+    assert _run(counting_batch_aim, batch=True) == _run(permutation_aim)
+    assert calls == [(12, CHROMOSOME)] * 10  # one call per generation with the whole population
+
+# ================== Process Pool ==================
+
+_weights = None
+
+
+def load_weights(spec):
+    """worker_init: map the position weights from shared memory."""
+    global _weights
+    _weights = attach_shared_array(spec)
+
+
+def weighted_aim(pop):
+    order = pop[1:1 + N]
+    return float(np.dot(_weights, order)), order, {"pid": os.getpid()}
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_pool_evaluation_matches_serial(batch):
+    aim = batch_permutation_aim if batch else permutation_aim
+    assert _run(aim, batch=batch, workers=2) == _run(aim, batch=batch)
+
+
+def test_pool_workers_load_shared_data_once():
+    global _weights
+    weights = np.arange(N, 0, -1, dtype=np.float64)
+    shm, spec = share_array(weights)
+    try:
+        with Generation(weighted_aim, groupnum=12, generation=5, var_num=CHROMOSOME, seed=4, workers=2,
+                        worker_init=load_weights, worker_initargs=(spec,)) as g:
+            pools = []
+            for _ in range(5):
+                g.geneRevolution()
+                pools.append(g._pool)
+            pids = {info["pid"] for _, _, info in g.best}
+        assert pools[0] is not None and all(pool is pools[0] for pool in pools)  # one pool for every generation
+        assert g._pool is None
+        assert os.getpid() not in pids
+        _weights = weights
+        best = g.best[-1]
+        assert best[0] == weighted_aim(best[1])[0]
+    finally:
+        _weights = None
+        shm.close()
+        shm.unlink()
+
+# ================== Fitness Cache ==================
+
+def test_fitness_cache_evicts_least_recently_used():
+    cache = FitnessCache(maxsize=2)
+    a, b, c = (FitnessCache.key(np.array(row)) for row in ([1, 2], [2, 1], [3, 3]))
+    cache.put(a, (1.0, "a"))
+    cache.put(b, (2.0, "b"))
+    assert cache.get(a) == (1.0, "a")  # a is now more recent than b
+    cache.put(c, (3.0, "c"))
+    assert cache.get(b) is None
+    assert cache.get(a) == (1.0, "a") and cache.get(c) == (3.0, "c")
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2, "hit_rate": 0.75}
+
+
+def test_cached_evaluation_matches_uncached_with_fewer_aim_calls():
+    calls = []
+
+    def counting_aim(pop):
+        calls.append(1)
+        return permutation_aim(pop)
+
+    runs = {}
+    for cache_size in (0, 1000):
+        calls.clear()
+        g = Generation(counting_aim, groupnum=20, generation=25, var_num=CHROMOSOME, seed=5,
+                       cache_size=cache_size, elite=2)
+        best = g.geneEvolve()
+        runs[cache_size] = (best[0], best[1], list(g.stats.history), len(calls))
+    assert runs[1000][:3] == runs[0][:3]
+    assert runs[1000][3] < runs[0][3]
+
+# ================== Island Model ==================
+
+def failing_aim(pop):
+    if pop[0] == 7:
+        raise ValueError("aim failed")
+    return permutation_aim(pop)
+
+
+def exiting_aim(pop):
+    if pop[0] == 7:
+        os._exit(3)
+    return permutation_aim(pop)
+
+
+ISLAND_KWARGS = dict(islands=3, migration_interval=3, migrants=2, seed=1, poll_interval=0.2,
+                     groupnum=10, generation=9, var_num=CHROMOSOME, var_minrange=[1], var_maxrange=[10])
+
+
+def test_immigrants_replace_the_worst_without_evaluation():
+    calls = []
+
+    def counting_aim(pop):
+        calls.append(tuple(pop))
+        return permutation_aim(pop)
+
+    g = Generation(counting_aim, groupnum=6, var_num=CHROMOSOME, seed=2)
+    chromosome = g.population[0].copy()
+    chromosome[0] = 10
+    worst = int(np.argmin([permutation_aim(row.tolist())[0] for row in g.population]))
+    g.immigrate([(1e9, chromosome.tolist(), {"immigrant": True})])
+    g.calcSufficiency()
+    assert len(calls) == 6  # the population as it was; the immigrant's fitness came with it
+    assert g.population[worst].tolist() == chromosome.tolist()
+    assert g.fitness[worst] == 1e9
+    assert g.best[-1][0] == 1e9 and g.best[-1][2] == {"immigrant": True}
+
+
+@pytest.mark.parametrize("topology", ["ring", "random"])
+def test_island_model_returns_the_best_island(topology):
+    model = IslandModel(permutation_aim, topology=topology, **ISLAND_KWARGS)
+    best = model.run()
+    assert len(model.island_results) == 3
+    assert best[0] == max(result[0] for result in model.island_results.values())
+
+
+def test_islands_run_exactly_the_requested_generations():
+    kwargs = dict(ISLAND_KWARGS, generation=10, migration_interval=4)
+    model = IslandModel(permutation_aim, **kwargs)
+    model.run()
+    assert sorted(model.island_stats) == [0, 1, 2]
+    for stats in model.island_stats.values():
+        assert stats.generations == 10
+        assert [row["generation"] for row in stats.history] == list(range(1, 11))
+
+
+def test_island_error_is_raised_in_the_parent():
+    with pytest.raises(ValueError, match="aim failed"):
+        IslandModel(failing_aim, **ISLAND_KWARGS).run()
+
+
+def test_island_that_dies_without_a_result_is_reported():
+    with pytest.raises(RuntimeError, match="exitcode=3"):
+        IslandModel(exiting_aim, **ISLAND_KWARGS).run()
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import make_route
+from granular_search import granular_search, neighbor_lists
+from helper_functions import compute_distance, travel_time
+from order_index import OrderIndex
+from solution import initial_solution, local_search, recalc_route_times
+
+# ================== Granular Search Invariants ==================
+
+def _routes(instance, n_couriers=4):
+    random.seed(0)
+    np.random.seed(0)  # initial_solution samples the depots from NumPy's global generator
+    routes = initial_solution(instance.sites, instance.ecommerce_stops, instance.o2o_stop_pairs,
+                              instance.couriers(n_couriers))
+    return local_search(routes)
+
+
+def _assert_pairs_in_order(routes):
+    for route in routes.values():
+        position = {id(stop): pos for pos, stop in enumerate(route.stops)}
+        for pos, stop in enumerate(route.stops):
+            if stop.stop_type == "delivery":
+                pickups = [p for p in route.stops[:pos] if p.stop_type == "shop" and p.order_id == stop.order_id]
+                assert len(pickups) == 1, f"{stop.order_id}: pickup missing before its delivery"
+            elif stop.stop_type == "shop":
+                assert any(d.stop_type == "delivery" and d.order_id == stop.order_id and position[id(d)] > pos
+                           for d in route.stops), f"{stop.order_id}: delivery missing after its pickup"
+
+
+def test_neighbor_lists_are_the_nearest_stops(instance, travel_times):
+    stops = instance.ecommerce_stops + [stop for pair in instance.o2o_stop_pairs for stop in pair]
+    k = 5
+    for matrix in (None, travel_times):
+        neighbors = neighbor_lists(stops, k, matrix, block=7)
+        for u, row in enumerate(neighbors.tolist()):
+            if matrix is None:
+                dist = [travel_time(compute_distance(stops[u].lat, stops[u].lng, v.lat, v.lng)) for v in stops]
+            else:
+                dist = [matrix.get(stops[u].loc_idx, v.loc_idx) for v in stops]
+            dist[u] = np.inf
+            assert u not in row
+            assert [dist[v] for v in row] == pytest.approx(sorted(dist)[:k], rel=1e-5)
+
+
+@pytest.mark.parametrize("use_order_index", [False, True])
+def test_granular_search_keeps_stops_pairs_and_feasibility(instance, travel_times, use_order_index):
+    routes = _routes(instance)
+    order_index = OrderIndex(instance.ecommerce_stops, instance.o2o_stop_pairs) if use_order_index else None
+    before = {courier_id: recalc_route_times(route) for courier_id, route in routes.items()}
+    improved = granular_search(routes, 8, travel_times, order_index=order_index)
+
+    assert improved.keys() == routes.keys()
+    visited = sorted(id(stop) for route in improved.values() for stop in route.stops[1:])
+    assert visited == sorted(id(stop) for route in routes.values() for stop in route.stops[1:])
+    assert len(set(visited)) == len(visited)
+    _assert_pairs_in_order(improved)
+    total = 0.0
+    for courier_id, route in improved.items():
+        assert route.stops[0] is routes[courier_id].stops[0]
+        fresh = make_route(courier_id, route.stops)
+        assert route.departure == pytest.approx(fresh.departure)
+        total_time, feasible, _ = recalc_route_times(route)
+        assert feasible or not before[courier_id][1]
+        total += total_time
+    assert total < sum(result[0] for result in before.values())  # moves were applied
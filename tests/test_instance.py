@@ -0,0 +1,59 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from instance import DATASET_FILES, ProblemInstance
+from travel_matrix import LocationIndex
+
+# ================== Problem Instance ==================
+
+def _tables():
+    """A dataset in which spot "X1" and shop "X1" share an id but not a location."""
+    sites = pd.DataFrame({"Site_id": ["A001"], "Lng": [121.40], "Lat": [31.20]})
+    spots = pd.DataFrame({"Spot_id": ["B0001", "X1"], "Lng": [121.41, 121.42], "Lat": [31.21, 31.19]})
+    shops = pd.DataFrame({"Shop_id": ["X1", "S002"], "Lng": [121.43, 121.44], "Lat": [31.22, 31.18]})
+    ecommerce_orders = pd.DataFrame({"Order_id": ["E1", "E2"], "Spot_id": ["X1", "B0001"],
+                                     "Site_id": ["A001", "A001"], "Num": [3, 4]})
+    o2o_orders = pd.DataFrame({"Order_id": ["F1"], "Spot_id": ["X1"], "Shop_id": ["X1"],
+                               "Pickup_time": ["09:30"], "Delivery_time": ["11:00"], "Num": [2]})
+    couriers = pd.DataFrame({"Courier_id": ["D001", "D002"]})
+    return sites, spots, shops, ecommerce_orders, o2o_orders, couriers
+
+
+def test_stops_keep_shared_ids_apart():
+    instance = ProblemInstance.from_tables(*_tables())
+    ecommerce_stops, ((pickup, delivery),) = instance.build_stops()
+    assert [stop.loc_idx for stop in ecommerce_stops] == [2, 1]
+    assert pickup.location_id == delivery.location_id == "X1"
+    assert (pickup.loc_idx, delivery.loc_idx) == (3, 2)
+    assert (pickup.lat, pickup.lng, delivery.lat, delivery.lng) == (31.22, 121.43, 31.19, 121.42)
+    assert (pickup.earliest, delivery.latest) == (90, 180)
+    for stop in [pickup, delivery] + ecommerce_stops:
+        assert (instance.lat[stop.loc_idx], instance.lng[stop.loc_idx]) == (stop.lat, stop.lng)
+
+
+def test_location_index_must_match_the_instance():
+    instance = ProblemInstance.from_tables(*_tables())
+    instance.build_stops(instance.location_index())
+    shuffled = LocationIndex(instance.location_ids[::-1], instance.lat[::-1], instance.lng[::-1])
+    with pytest.raises(ValueError):
+        instance.build_stops(shuffled)
+
+
+def test_load_writes_one_snapshot_and_reads_it_back(tmp_path):
+    data_dir, cache_dir = tmp_path / "Dataset", tmp_path / "cache"
+    data_dir.mkdir()
+    for name, table in zip(DATASET_FILES, _tables()):
+        table.to_csv(data_dir / name, index=False)
+    compiled = ProblemInstance.load(str(data_dir), str(cache_dir))
+    assert os.listdir(cache_dir) == [os.path.basename(compiled.path)]
+    again = ProblemInstance.load(str(data_dir), str(cache_dir))
+    for name in ProblemInstance.ARRAYS:
+        assert np.array_equal(getattr(again, name), getattr(compiled, name))
+    restored = pickle.loads(pickle.dumps(again))
+    assert restored.path == again.path
+    for table, original in zip(restored.tables(), _tables()):
+        pd.testing.assert_frame_equal(table[original.columns], original, check_dtype=False)
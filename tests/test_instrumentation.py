@@ -0,0 +1,82 @@
+import json
+import tracemalloc
+
+import pytest
+
+import instrumentation
+from instrumentation import Profiler
+
+# ================== Opt-in Instrumentation ==================
+
+@pytest.fixture
+def profiler():
+    profiler = Profiler().start()
+    previous = instrumentation.activate(profiler)
+    yield profiler
+    instrumentation.activate(previous)
+    profiler.stop()
+
+
+def test_phases_and_counters_are_recorded(profiler):
+    with instrumentation.phase("outer"):
+        kept = [0] * 100_000
+        with instrumentation.phase("inner"):
+            scratch = bytearray(1_000_000)
+            del scratch
+        instrumentation.count("moves")
+    with instrumentation.phase("inner"):
+        instrumentation.count("moves", 2)
+    del kept
+    report = profiler.report()
+    assert report["counters"] == {"moves": 3}
+    outer, inner = report["phases"]["outer"], report["phases"]["inner"]
+    assert (outer["calls"], inner["calls"]) == (1, 2)
+    assert outer["seconds"] > 0 and inner["seconds"] > 0
+    # Peaks are of all traced memory: the inner one includes what the outer phase holds, and counts toward it
+    assert inner["peak_bytes"] >= 1_000_000 + 800_000
+    assert outer["peak_bytes"] >= inner["peak_bytes"]
+    assert "worker_phases" not in report
+    profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_nothing_is_recorded_without_an_active_profiler():
+    assert instrumentation.active() is None
+    idle = Profiler(trace_memory=False)
+    with instrumentation.phase("solve"):
+        instrumentation.count("moves")
+    assert idle.report()["phases"] == {} and idle.report()["counters"] == {}
+
+    previous = instrumentation.activate(idle)
+    with instrumentation.phase("solve"):
+        pass
+    assert instrumentation.activate(previous) is idle
+    assert idle.report()["phases"]["solve"]["peak_bytes"] is None
+
+
+def test_merge_keeps_worker_phases_apart(profiler, tmp_path):
+    workers = []
+    for seconds in (0.5, 2.0):
+        worker = Profiler(trace_memory=False)
+        worker.seconds["cluster"], worker.calls["cluster"] = seconds, 1
+        worker.count("moves", 5)
+        workers.append(worker.report())
+    nested = Profiler(trace_memory=False)
+    nested.merge(workers[1])
+    with profiler.phase("cluster"):
+        pass
+    profiler.merge(workers[0])
+    profiler.merge(nested.report())
+
+    report = profiler.report()
+    assert report["merged_reports"] == 2 + 1
+    assert report["phases"]["cluster"]["calls"] == 1  # this process's own phase
+    assert report["worker_phases"]["cluster"] == {"worker_seconds": 2.5, "max_seconds": 2.0, "calls": 2,
+                                                  "peak_bytes": None}
+    assert report["counters"] == {"moves": 10}
+
+    path = tmp_path / "profile.json"
+    profiler.save(str(path))
+    saved = json.loads(path.read_text())
+    assert saved["worker_phases"] == report["worker_phases"]
+    assert saved["counters"] == report["counters"]
@@ -0,0 +1,126 @@
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import main as solver
+from conftest import RandomInstance
+from instance import DATASET_FILES
+from order_index import OrderIndex
+from solution import initial_solution, route_cost
+from travel_matrix import TravelTimes
+
+# ================== Per-Cluster Solve ==================
+
+def _solve_cluster(instance, deadline):
+    """Routes of the whole instance as one cluster, and the phases the solve went through."""
+    courier_ids = instance.couriers(3).Courier_id.tolist()
+    _, routes, report = solver.solve_cluster(0, instance.sites, instance.ecommerce_stops, instance.o2o_stop_pairs,
+                                             courier_ids, 7, TravelTimes.lazy(instance.index), deadline=deadline,
+                                             profile=True, granular_k=5)
+    return routes, set(report["phases"])
+
+
+def _sequences(routes):
+    return {courier_id: [(stop.location_id, stop.order_id) for stop in route.stops] for courier_id, route in routes.items()}
+
+
+def test_cluster_past_the_deadline_returns_the_constructed_routes(instance):
+    random.seed(7)
+    np.random.seed(7)
+    constructed = initial_solution(instance.sites, instance.ecommerce_stops, instance.o2o_stop_pairs,
+                                   instance.couriers(3))
+    late, phases = _solve_cluster(instance, time.monotonic() - 1)
+    assert _sequences(late) == _sequences(constructed)
+    assert phases == {"construction"}
+    improved, phases = _solve_cluster(instance, time.monotonic() + 60)
+    assert phases == {"construction", "local_search", "granular_search"}
+    assert sum(map(route_cost, improved.values())) < sum(map(route_cost, late.values()))
+
+def test_granular_search_gets_the_cluster_order_index(instance, monkeypatch):
+    indexes = []
+    granular_search = solver.granular_search
+
+    def spy(routes, k, travel_times, order_index=None, deadline=None):
+        indexes.append(order_index)
+        return granular_search(routes, k, travel_times, order_index=order_index, deadline=deadline)
+
+    monkeypatch.setattr(solver, "granular_search", spy)
+    _solve_cluster(instance, time.monotonic() + 60)
+    (order_index,) = indexes
+    assert isinstance(order_index, OrderIndex)
+    assert order_index.pairs() == instance.o2o_stop_pairs
+    assert len(order_index) == len(instance.ecommerce_stops) + len(instance.o2o_stop_pairs)
+
+# ================== Time Budget ==================
+
+def _write_dataset(data_dir, instance, n_couriers):
+    """The six dataset CSVs (DATASET_FILES) of `instance`; e-commerce orders take turns over the sites."""
+    os.makedirs(data_dir)
+    index = instance.index
+    kinds = np.array([loc[0] for loc in index.location_ids])
+    ids = np.asarray(index.location_ids)
+    locations = [pd.DataFrame({column: ids[kinds == kind], "Lng": index.lng[kinds == kind], "Lat": index.lat[kinds == kind]})
+                 for kind, column in zip("ABS", ("Site_id", "Spot_id", "Shop_id"))]
+    site_ids = locations[0].Site_id.tolist()
+    ecommerce_orders = pd.DataFrame({
+        "Order_id": [stop.order_id for stop in instance.ecommerce_stops],
+        "Spot_id": [stop.location_id for stop in instance.ecommerce_stops],
+        "Site_id": [site_ids[k % len(site_ids)] for k in range(len(instance.ecommerce_stops))],
+        "Num": [stop.packages for stop in instance.ecommerce_stops],
+    })
+    hhmm = lambda minutes: f"{8 + minutes // 60:02d}:{minutes % 60:02d}"
+    o2o_orders = pd.DataFrame({
+        "Order_id": [d.order_id for _, d in instance.o2o_stop_pairs],
+        "Spot_id": [d.location_id for _, d in instance.o2o_stop_pairs],
+        "Shop_id": [p.location_id for p, _ in instance.o2o_stop_pairs],
+        "Pickup_time": [hhmm(p.earliest) for p, _ in instance.o2o_stop_pairs],
+        "Delivery_time": [hhmm(d.latest) for _, d in instance.o2o_stop_pairs],
+        "Num": [d.packages for _, d in instance.o2o_stop_pairs],
+    })
+    for name, table in zip(DATASET_FILES, locations + [ecommerce_orders, o2o_orders, instance.couriers(n_couriers)]):
+        table.to_csv(os.path.join(data_dir, name), index=False)
+
+
+def test_time_budget_bounds_the_parallel_solve(tmp_path, monkeypatch):
+    # Without a budget local and granular search take about 10 s on this instance
+    _write_dataset(str(tmp_path / "Dataset"), RandomInstance(0, n_spots=300, n_shops=20, n_ecommerce=800, n_o2o=20), 16)
+    monkeypatch.chdir(tmp_path)
+    budget = 0.05
+    start = time.monotonic()
+    routes = solver.main(full_matrix=False, workers=2, headless=True, time_budget=budget, granular_k=30)
+    assert time.monotonic() - start < budget + 1.5
+    assert len(routes) == 16
+
+# ================== Parallel Solve ==================
+
+def test_parallel_solve_matches_serial(tmp_path, monkeypatch):
+    _write_dataset(str(tmp_path / "Dataset"), RandomInstance(3, n_ecommerce=120, n_o2o=16), 8)
+    monkeypatch.chdir(tmp_path)
+    serial = solver.main(full_matrix=False, workers=1, headless=True)
+    parallel = solver.main(full_matrix=False, workers=2, headless=True)
+    assert _sequences(parallel) == _sequences(serial)
+    assert sum(map(route_cost, parallel.values())) == sum(map(route_cost, serial.values()))
+
+# ================== Headless Mode ==================
+
+HEADLESS_RUN = """
+import sys
+import main
+main.main(full_matrix=False, headless=True)
+print([name for name in ("matplotlib", "cartopy", "contextily", "visualization") if name in sys.modules])
+"""
+
+
+def test_headless_run_never_imports_plotting(tmp_path):
+    _write_dataset(str(tmp_path / "Dataset"), RandomInstance(4, n_ecommerce=60, n_o2o=8), 8)
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(solver.__file__))
+    run = subprocess.run([sys.executable, "-c", HEADLESS_RUN], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.strip().splitlines()[-1] == "[]"
+    assert os.path.exists(tmp_path / "heuristic+localsearch_schedule.csv")
+    assert not os.path.exists(tmp_path / "cluster_map.png")
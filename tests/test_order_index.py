@@ -0,0 +1,34 @@
+from clustering import cluster_stops
+from order_index import OrderIndex
+
+# ================== Order Index ==================
+
+def test_lookups_match_a_scan_of_the_stop_lists(instance):
+    site_ids = [instance.index.location_ids[k % 3] for k in range(len(instance.ecommerce_stops))]
+    index = OrderIndex(instance.ecommerce_stops, instance.o2o_stop_pairs, site_ids)
+    assert len(index) == len(instance.ecommerce_stops) + len(instance.o2o_stop_pairs)
+    for stop in instance.ecommerce_stops:
+        assert index.stops(stop.order_id) == (stop,)
+        assert index.delivery(stop.order_id) is stop
+        assert index.pickup_of(stop) is None
+    for pickup, delivery in instance.o2o_stop_pairs:
+        assert index.stops(delivery.order_id) == (pickup, delivery)
+        assert index.pickup_of(delivery) is pickup and index.pickup_of(pickup) is pickup
+        assert index.delivery_of(pickup) is delivery
+    assert index.pairs() == instance.o2o_stop_pairs
+    assert "missing" not in index and index.delivery_of(instance.depots[0]) is None
+    for site_id in set(site_ids):
+        assert index.orders_by_site[site_id] == [stop.order_id for stop, s in zip(instance.ecommerce_stops, site_ids)
+                                                 if s == site_id]
+    for shop_id, order_ids in index.orders_by_shop.items():
+        assert order_ids == [d.order_id for p, d in instance.o2o_stop_pairs if p.location_id == shop_id]
+
+
+def test_clustering_puts_both_halves_of_an_order_together(instance):
+    index = OrderIndex(instance.ecommerce_stops, instance.o2o_stop_pairs)
+    stops = instance.ecommerce_stops + [stop for pair in instance.o2o_stop_pairs for stop in pair]
+    for method in ("kmeans", "balanced"):
+        cluster_stops(stops, n_clusters=3, order_index=index, method=method, max_stops=20)
+        for pickup, delivery in instance.o2o_stop_pairs:
+            assert pickup.cluster_id == delivery.cluster_id
+        assert all(stop.cluster_id is not None for stop in stops)
@@ -0,0 +1,164 @@
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import RandomInstance, make_route
+from data_structures import Stop
+from solution import (RouteSchedule, intra_route_swap, local_search, recalc_route_times, route_cost,
+                      save_schedule_to_csv, set_travel_times, two_opt)
+from travel_matrix import TravelTimes
+
+# ================== Delta Evaluation vs recalc_route_times ==================
+
+def _recalc(courier_id, stops):
+    total_time, feasible, _ = recalc_route_times(make_route(courier_id, stops))
+    return feasible, total_time
+
+
+@pytest.mark.parametrize("matrix", [False, True])
+def test_splice_matches_recalc(instance, request, matrix):
+    if matrix:
+        request.getfixturevalue("travel_times")
+    rng = instance.rng
+    checked = feasible = 0
+    for _ in range(20):
+        stops = instance.random_sequence(8, 4)
+        sched = RouteSchedule(stops)
+        n = len(stops)
+        for _ in range(30):
+            i = int(rng.integers(0, n - 1))
+            j = int(rng.integers(i + 1, n + 1))
+            # Reversing or shuffling stops[i+1:j] keeps the load entering stops[j]
+            segment = stops[i+1:j]
+            middle = segment[::-1] if rng.random() < 0.5 else [segment[k] for k in rng.permutation(len(segment))]
+            ok, total = sched.splice(i, middle, j)
+            expected_ok, expected_total = _recalc("D000", stops[:i+1] + middle + stops[j:])
+            assert ok == expected_ok
+            if ok:
+                assert total == pytest.approx(expected_total, abs=1e-9)
+                feasible += 1
+            checked += 1
+    assert feasible > 0 and feasible < checked
+
+
+def test_join_matches_recalc(instance, travel_times):
+    rng = instance.rng
+    checked = 0
+    for _ in range(30):
+        a = RouteSchedule(instance.random_sequence(6, 3))
+        b = RouteSchedule(instance.random_sequence(6, 3))
+        for i in range(len(a.stops)):
+            for j in range(1, len(b.stops) + 1):
+                if a.load[i] != b.load[j-1]:
+                    continue  # join requires the same load on board at the cut
+                ok, total = a.join(i, b, j)
+                expected_ok, expected_total = _recalc("D000", a.stops[:i+1] + b.stops[j:])
+                assert ok == expected_ok
+                if ok:
+                    assert total == pytest.approx(expected_total, abs=1e-9)
+                checked += 1
+    assert checked > 0
+
+
+def _assert_timed(route):
+    """route.arrival/departure and the cached state equal a fresh recalc_route_times."""
+    fresh = make_route(route.courier_id, route.stops)
+    assert route.arrival == pytest.approx(fresh.arrival)
+    assert route.departure == pytest.approx(fresh.departure)
+    assert (route.load, route.feasible) == (fresh.load, fresh.feasible)
+    assert route.penalty == pytest.approx(fresh.penalty)
+
+
+@pytest.mark.parametrize("strategy", ["first", "best"])
+def test_two_opt_batch_matches_serial_best(instance, travel_times, strategy):
+    for k in range(5):
+        route = instance.random_route(f"D{k:03d}", 10, 4)
+        serial = two_opt(route, strategy)
+        batch = two_opt(route, strategy, batch=True)
+        _assert_timed(serial)
+        _assert_timed(batch)
+        assert route_cost(batch) <= route_cost(route) + 1e-9
+        if strategy == "best":
+            assert [id(s) for s in batch.stops] == [id(s) for s in serial.stops]
+
+
+@pytest.mark.parametrize("matrix", [False, True])
+def test_batch_search_reaches_the_serial_cost(matrix):
+    instance = RandomInstance(5, n_ecommerce=120, n_o2o=20)
+    if matrix:
+        set_travel_times(TravelTimes.lazy(instance.index))
+    routes = {f"D{k:03d}": instance.random_route(f"D{k:03d}", 12, 3) for k in range(6)}
+    for route in routes.values():
+        serial, batch = two_opt(route, "best"), two_opt(route, "best", batch=True)
+        assert route_cost(batch) == pytest.approx(route_cost(serial), abs=1e-9)
+    serial = local_search(routes, "best")
+    batch = local_search(routes, "best", batch=True)
+    assert sum(map(route_cost, batch.values())) == pytest.approx(sum(map(route_cost, serial.values())), abs=1e-9)
+    assert sum(map(route_cost, batch.values())) < sum(map(route_cost, routes.values()))
+
+
+def test_moves_never_put_a_delivery_before_its_pickup():
+    # F1 is on board from S001, so delivering F2 before picking it up keeps the load non-negative
+    depot = Stop("A001", 31.200, 121.400, "site", latest=720)
+    s1 = Stop("S001", 31.2005, 121.4005, "shop", order_id="F1", packages=10, latest=720, paired_order_id="F1")
+    s2 = Stop("S002", 31.230, 121.430, "shop", order_id="F2", packages=5, latest=720, paired_order_id="F2")
+    b2 = Stop("B0002", 31.201, 121.401, "delivery", order_id="F2", packages=5, latest=720, paired_order_id="F2")
+    b1 = Stop("B0001", 31.215, 121.415, "delivery", order_id="F1", packages=10, latest=720, paired_order_id="F1")
+    route = make_route("D000", [depot, s1, s2, b2, b1])
+    # Reversing [S002, B0002] is cheaper and passes the load check, but breaks precedence
+    reversed_route = make_route("D000", [depot, s1, b2, s2, b1])
+    assert reversed_route.feasible and route_cost(reversed_route) < route_cost(route)
+    assert RouteSchedule(route.stops).pickup_pos[3] == 2
+    for improved in (two_opt(route), two_opt(route, "best"), two_opt(route, batch=True), intra_route_swap(route),
+                     local_search({"D000": route})["D000"]):
+        position = {stop.location_id: pos for pos, stop in enumerate(improved.stops)}
+        assert position["S002"] < position["B0002"] and position["S001"] < position["B0001"]
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_local_search_keeps_stops_and_timings(instance, travel_times, batch):
+    routes = {f"D{k:03d}": instance.random_route(f"D{k:03d}", 8, 3) for k in range(4)}
+    before = {courier_id: route_cost(route) for courier_id, route in routes.items()}
+    improved = local_search(routes, batch=batch)
+    assert improved.keys() == routes.keys()
+    for courier_id, route in improved.items():
+        _assert_timed(route)
+        assert route.stops[0] is routes[courier_id].stops[0]
+        assert sorted(map(id, route.stops)) == sorted(map(id, routes[courier_id].stops))
+        assert route_cost(route) <= before[courier_id] + 1e-9
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_local_search_stops_at_its_time_budget(seed):
+    instance = RandomInstance(seed, n_ecommerce=300)
+    routes = {f"D{k:03d}": instance.random_route(f"D{k:03d}", 100, 0) for k in range(3)}
+    before = {courier_id: route_cost(route) for courier_id, route in routes.items()}
+    # An unbounded search of these routes takes about 0.6 s
+    start = time.monotonic()
+    improved = local_search(routes, time_budget=0.05)
+    assert time.monotonic() - start < 0.05 + 0.1
+    for courier_id, route in improved.items():
+        assert sorted(map(id, route.stops)) == sorted(map(id, routes[courier_id].stops))
+        assert route_cost(route) <= before[courier_id] + 1e-9
+
+    untouched = local_search(routes, time_budget=0)
+    assert all(untouched[courier_id] is route for courier_id, route in routes.items())
+
+# ================== Schedule CSV ==================
+
+def test_schedule_csv_has_one_row_per_stop_in_arrival_order(instance, tmp_path):
+    routes = {f"D{k:03d}": instance.random_route(f"D{k:03d}", 5, 2) for k in range(3)}
+    path = tmp_path / "schedule.csv"
+    save_schedule_to_csv(routes, str(path))
+    schedule = pd.read_csv(path)
+    assert list(schedule.columns) == ["Courier_id", "Location_id", "Stop_Type", "Arrival_time", "Departure_time",
+                                      "Amount", "Order_id"]
+    for courier_id, route in routes.items():
+        rows = schedule[schedule.Courier_id == courier_id]
+        order = sorted(range(len(route.stops)), key=lambda k: route.arrival[k])
+        assert rows.Location_id.tolist() == [route.stops[k].location_id for k in order]
+        assert rows.Stop_Type.tolist() == [route.stops[k].stop_type for k in order]
+        assert rows.Arrival_time.tolist() == [int(round(route.arrival[k])) for k in order]
+        assert rows.Departure_time.tolist() == [int(round(route.departure[k])) for k in order]
+        assert rows.Amount.tolist() == [route.stops[k].packages for k in order]
+        assert rows.Order_id.fillna("").tolist() == [route.stops[k].order_id or "" for k in order]
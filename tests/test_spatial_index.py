@@ -0,0 +1,36 @@
+import math
+
+import numpy as np
+
+from spatial_index import TailGrid
+
+# ================== Route Tail Grid ==================
+
+def _brute_force(points, lat, lng, k, scale):
+    dist = sorted(((plat - lat)**2 + (plng * scale - lng * scale)**2, key) for key, (plat, plng) in points.items())
+    return [key for _, key in dist[:k]]
+
+
+def test_nearest_matches_a_full_scan():
+    rng = np.random.default_rng(0)
+    grid = TailGrid(cell_size=0.004)
+    scale = math.cos(math.radians(31.2))
+    points = {}
+    for step in range(600):
+        key = f"D{int(rng.integers(80)):03d}"
+        if rng.random() < 0.1:
+            grid.remove(key)
+            points.pop(key, None)
+        else:
+            lat, lng = 31.2 + rng.normal(0, 0.02), 121.4 + rng.normal(0, 0.02)
+            grid.update(key, lat, lng)
+            points[key] = (lat, lng)
+        assert len(grid) == len(points)
+        if step % 5 == 0:
+            # Queries inside the cloud and far outside it (where the ring search gives up for a scan)
+            spread = 0.03 if step % 2 else 0.3
+            lat, lng = 31.2 + rng.uniform(-spread, spread), 121.4 + rng.uniform(-spread, spread)
+            for k in (1, 4, len(points) + 2):
+                assert grid.nearest(lat, lng, k) == _brute_force(points, lat, lng, k, scale)
+    assert grid.nearest(31.2, 121.4, 0) == []
+    assert TailGrid().nearest(31.2, 121.4, 3) == []
@@ -0,0 +1,74 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_route
+from helper_functions import compute_distance, travel_time
+from solution import recalc_route_times, set_travel_times
+from travel_matrix import LOCATION_FILES, TravelTimes, build_location_index, haversine_matrix
+
+# ================== Travel-Time Matrix ==================
+
+def test_haversine_matrix_matches_compute_distance(instance):
+    index = instance.index
+    rows = np.arange(0, len(index), 5)
+    dist = haversine_matrix(index.lat[rows], index.lng[rows], index.lat, index.lng)
+    for r, i in enumerate(rows.tolist()):
+        for j in range(len(index)):
+            assert dist[r, j] == pytest.approx(compute_distance(index.lat[i], index.lng[i], index.lat[j], index.lng[j]),
+                                               abs=1e-9)
+
+
+def test_lazy_rows_and_submatrix(instance):
+    travel_times = TravelTimes.lazy(instance.index)
+    locs = [4, 0, 17, 4]
+    block = travel_times.submatrix(locs)
+    for a, i in enumerate(locs):
+        for b, j in enumerate(locs):
+            expected = travel_time(compute_distance(instance.index.lat[i], instance.index.lng[i],
+                                                    instance.index.lat[j], instance.index.lng[j]))
+            assert block[a, b] == pytest.approx(expected, abs=1e-9)
+            assert travel_times.get(i, j) == pytest.approx(expected, abs=1e-9)
+
+
+def test_routes_time_the_same_with_and_without_the_matrix(instance):
+    sequences = [instance.random_sequence(6, 3) for _ in range(10)]
+    haversine = [recalc_route_times(make_route("D000", seq)) for seq in sequences]
+    set_travel_times(TravelTimes.lazy(instance.index))
+    with_matrix = [recalc_route_times(make_route("D000", seq)) for seq in sequences]
+    assert [r[1] for r in with_matrix] == [r[1] for r in haversine]
+    assert [r[0] for r in with_matrix] == pytest.approx([r[0] for r in haversine], abs=1e-9)
+
+
+def _write_locations(data_dir, instance):
+    """The site, spot and shop CSVs of `instance` (the files the matrix cache is keyed on)."""
+    os.makedirs(data_dir)
+    ids = np.asarray(instance.index.location_ids)
+    kinds = np.array([loc[0] for loc in ids])
+    for name, kind, column in zip(LOCATION_FILES, "ABS", ("Site_id", "Spot_id", "Shop_id")):
+        rows = kinds == kind
+        pd.DataFrame({column: ids[rows], "Lng": instance.index.lng[rows], "Lat": instance.index.lat[rows]}).to_csv(
+            os.path.join(data_dir, name), index=False)
+
+
+def test_cached_matrix_is_built_once_and_reopened(instance, tmp_path):
+    data_dir, cache_dir = str(tmp_path / "Dataset"), str(tmp_path / "cache")
+    _write_locations(data_dir, instance)
+    index = build_location_index(*(pd.read_csv(os.path.join(data_dir, name)) for name in LOCATION_FILES))
+    assert index.location_ids == list(instance.index.location_ids)
+
+    cached = TravelTimes.cached(index, data_dir=data_dir, cache_dir=cache_dir, dtype=np.float64, block=7)
+    assert os.listdir(cache_dir) == [os.path.basename(cached.path)]
+    lazy = TravelTimes.lazy(index)
+    expected = np.stack([lazy.row(i) for i in range(len(index))])
+    assert np.asarray(cached.matrix) == pytest.approx(expected)
+
+    mtime = os.path.getmtime(cached.path)
+    again = TravelTimes.cached(index, data_dir=data_dir, cache_dir=cache_dir, dtype=np.float64)
+    assert again.path == cached.path and os.path.getmtime(again.path) == mtime
+    restored = pickle.loads(pickle.dumps(again))
+    assert isinstance(restored.matrix, np.memmap)
+    assert restored.get(3, 11) == pytest.approx(expected[3, 11])